@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Achievement screens for CraveBreaker
+Progress and earned badges (with timestamps) in one query, the static badge
+catalog rendered once, and rendered user screens cached by progress version
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import aiosqlite
+
+from badge_rules import BADGES, BOT_BADGE_IDS
+from level_curve import level_curve
+from metrics import registry
+from progress_cache import PROGRESS_CACHE_TTL
+
+ACHIEVEMENT_SCREEN_CACHE_SIZE = int(os.getenv("ACHIEVEMENT_SCREEN_CACHE_SIZE", "10000"))
+
+screen_requests = registry.counter("achievement_screen_requests_total", "Achievement screens by cache result")
+
+CATALOG_GROUPS = (("streak", "🔥 СЕРИИ"), ("milestone", "🎯 РУБЕЖИ"), ("technique", "🛠️ МАСТЕРСТВО"),
+                  ("special", "⭐ ОСОБЫЕ"))
+
+
+def render_catalog(badge_ids=BOT_BADGE_IDS) -> str:
+    """Badges the user can earn, grouped by type (registry order within a group)"""
+    text = "🎯 **ДОСТУПНЫЕ ДОСТИЖЕНИЯ**"
+    for badge_type, title in CATALOG_GROUPS:
+        rules = [BADGES[badge_id] for badge_id in badge_ids if BADGES[badge_id].badge_type == badge_type]
+        if not rules:
+            continue
+        text += f"\n\n**{title}:**"
+        for rule in sorted(rules, key=lambda rule: rule.xp_reward):
+            text += f"\n• {rule.name} - {rule.description} (+{rule.xp_reward} XP)"
+    return text + "\n\n**💡 Совет:** Используйте техники регулярно, чтобы заработать больше достижений!"
+
+
+# The catalog never changes while the bot runs
+BOT_CATALOG_TEXT = render_catalog()
+
+
+class EarnedBadge(NamedTuple):
+    badge_id: str
+    earned_at: Optional[str]  # user_badges.earned_at (UTC); None if only in badges_earned
+
+
+class AchievementView(NamedTuple):
+    """Everything the achievements screen shows, read in one query"""
+    level: int
+    xp: int
+    total_interventions: int
+    current_streak: int
+    longest_streak: int
+    badges: Tuple[EarnedBadge, ...]  # in the order they were earned
+
+
+async def load_view(db, user_id: int) -> AchievementView:
+    """user_progress joined with user_badges; zeros for users without a row"""
+    cursor = await db.execute(
+        """SELECT p.level, p.xp, p.total_interventions, p.current_streak, p.longest_streak,
+           p.badges_earned, b.badge_id, b.earned_at
+           FROM user_progress p LEFT JOIN user_badges b ON b.user_id = p.user_id
+           WHERE p.user_id = ? ORDER BY b.earned_at, b.id""",
+        (user_id,)
+    )
+    rows = await cursor.fetchall()
+    if not rows:
+        return AchievementView(1, 0, 0, 0, 0, ())
+    badges: List[EarnedBadge] = [EarnedBadge(row[6], row[7]) for row in rows if row[6] is not None]
+    # Badges recorded only in the progress row (older data) go last, undated
+    dated = {badge.badge_id for badge in badges}
+    badges.extend(EarnedBadge(badge_id, None) for badge_id in json.loads(rows[0][5] or "[]")
+                  if badge_id not in dated)
+    return AchievementView(*rows[0][:5], tuple(badges))
+
+
+def render_view(view: AchievementView) -> str:
+    text = f"""🏆 **МОИ ДОСТИЖЕНИЯ**
+
+🌟 **Уровень:** {view.level}
+💎 **Опыт:** {view.xp} XP
+📈 **Интервенций:** {view.total_interventions}
+🔥 **Текущая серия:** {view.current_streak} дней
+🎯 **Лучшая серия:** {view.longest_streak} дней
+🏅 **Достижений:** {len(view.badges)}
+
+**🏆 ЗАРАБОТАННЫЕ ЗНАЧКИ:**"""
+
+    shown = [badge for badge in view.badges if badge.badge_id in BADGES]
+    for badge in shown:
+        text += f"\n• {BADGES[badge.badge_id].name}"
+        if badge.earned_at:
+            year, month, day = badge.earned_at[:10].split("-")
+            text += f" ({day}.{month}.{year})"
+    if not shown:
+        text += "\nПока нет достижений. Начни использовать техники!"
+
+    level_info = level_curve.info(view.xp)
+    if not level_info.is_max:
+        text += f"\n\n⬆️ **До следующего уровня:** {level_info.xp_to_next} XP"
+    else:
+        text += "\n\n👑 **МАКСИМАЛЬНЫЙ УРОВЕНЬ ДОСТИГНУТ!**"
+    return text
+
+
+class AchievementScreens:
+    """user_id -> (progress version, rendered screen, expires_at), least recently used first
+
+    `version` is ProgressCache.version: it changes on every progress write
+    that goes through the cache, so a stored screen is reused only while
+    the user's progress is unchanged. Version 0 means the progress cache
+    is not tracking the user, and then nothing is stored. Writes made by
+    other processes (reevaluate_job.py, the sweep CLI) do not change the
+    version, so screens also expire after `ttl`, the progress cache TTL
+    by default: a screen is never older than a cached progress row. Parts
+    that change without the user's progress changing (leaderboard rank)
+    are left to the caller.
+    """
+
+    def __init__(self, db_path: str, version, max_users: int = ACHIEVEMENT_SCREEN_CACHE_SIZE,
+                 ttl: float = PROGRESS_CACHE_TTL):
+        self.db_path = db_path
+        self.version = version
+        self.max_users = max_users
+        self.ttl = ttl
+        self._screens: "OrderedDict[int, Tuple[int, str, float]]" = OrderedDict()
+
+    async def render(self, user_id: int) -> str:
+        version = self.version(user_id)
+        entry = self._screens.get(user_id)
+        if entry is not None and version and entry[0] == version and entry[2] > time.monotonic():
+            self._screens.move_to_end(user_id)
+            screen_requests.inc(result="hit")
+            return entry[1]
+
+        screen_requests.inc(result="miss")
+        read_at = time.monotonic()
+        async with aiosqlite.connect(self.db_path) as db:
+            text = render_view(await load_view(db, user_id))
+        # Store only if no write landed while the query ran
+        if version and self.version(user_id) == version:
+            self._screens[user_id] = (version, text, read_at + self.ttl)
+            self._screens.move_to_end(user_id)
+            while len(self._screens) > self.max_users:
+                self._screens.popitem(last=False)
+        else:
+            self._screens.pop(user_id, None)
+        return text
+
+    def invalidate(self, user_id: int):
+        self._screens.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        return {"users": len(self._screens), "max_users": self.max_users, "ttl": self.ttl,
+                "hits": screen_requests.value(result="hit"), "misses": screen_requests.value(result="miss")}
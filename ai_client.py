@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Async OpenAI client for CraveBreaker
+Time-boxed chat completions with a concurrency limit; callers fall back to
+curated text whenever None is returned
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from metrics import registry
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+# Point at a local stub (ai_stub_server.py) or a proxy; None means api.openai.com
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+AI_MODEL = os.environ.get("AI_MODEL", "gpt-4o")
+# Whole-request budget, including time spent waiting for a concurrency slot
+AI_LATENCY_BUDGET = float(os.environ.get("AI_LATENCY_BUDGET", "3.0"))
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4"))
+# Streams are shown to the user as they arrive, so they may run longer
+AI_STREAM_BUDGET = float(os.environ.get("AI_STREAM_BUDGET", "10.0"))
+
+ai_requests = registry.counter("ai_requests_total", "AI completion requests by outcome")
+ai_latency = registry.histogram("ai_request_seconds", "AI completion latency",
+                                (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0))
+ai_in_flight = registry.gauge("ai_requests_in_flight", "AI completions currently running")
+ai_first_token = registry.histogram("ai_stream_first_token_seconds", "Time to the first streamed token",
+                                    (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0))
+
+
+class AIClient:
+    """Shared AsyncOpenAI client with a latency budget and a concurrency limit
+
+    complete() never raises: a timeout, an API error or a missing key all
+    return None so the caller can use its curated fallback immediately.
+    Concurrent identical requests are coalesced into one API call; each
+    caller still gets its own budget.
+    """
+
+    def __init__(self, api_key: Optional[str] = OPENAI_API_KEY,
+                 base_url: Optional[str] = OPENAI_BASE_URL,
+                 budget: float = AI_LATENCY_BUDGET,
+                 max_concurrency: int = AI_MAX_CONCURRENCY,
+                 model: str = AI_MODEL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.budget = budget
+        self.model = model
+        self.limiter = asyncio.Semaphore(max_concurrency)
+        # Identical prompts in flight at the same time share one request
+        self.flights = SingleFlight("ai")
+        self._client = None
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def get_client(self):
+        """Create the SDK client on first use (the openai import is heavy)"""
+        if self._client is None and self.api_key:
+            try:
+                from openai import AsyncOpenAI
+            except ImportError:
+                logger.warning("openai package is not installed, AI quotes disabled")
+                self.api_key = None
+                return None
+            # Retries would blow the budget; a miss falls back to curated text
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                       timeout=self.budget, max_retries=0)
+        return self._client
+
+    async def _create(self, client, messages: List[Dict], max_tokens: int,
+                      temperature: float, timeout: float, options: Dict) -> Optional[str]:
+        async with self.limiter:
+            ai_in_flight.inc()
+            try:
+                response = await client.chat.completions.create(
+                    model=self.model, messages=messages,
+                    max_tokens=max_tokens, temperature=temperature,
+                    timeout=timeout, **options,
+                )
+            finally:
+                ai_in_flight.dec()
+        content = response.choices[0].message.content
+        return content.strip() if content else None
+
+    async def complete(self, messages: List[Dict], max_tokens: int = 100,
+                       temperature: float = 0.8, budget: Optional[float] = None,
+                       **options) -> Optional[str]:
+        """Chat completion text, or None if it is unavailable within the budget
+
+        Extra keyword arguments (e.g. response_format) go to the API as is.
+        """
+        client = self.get_client()
+        if client is None:
+            return None
+
+        budget = self.budget if budget is None else budget
+        started = time.monotonic()
+        try:
+            key = json.dumps([messages, max_tokens, temperature, options], ensure_ascii=False, sort_keys=True)
+            text = await asyncio.wait_for(self.flights.do(
+                key, lambda: self._create(client, messages, max_tokens, temperature, budget, options)), budget)
+        except asyncio.TimeoutError:
+            ai_requests.inc(outcome="timeout")
+            logger.warning(f"AI completion exceeded {budget:.1f}s budget, using fallback")
+            return None
+        except Exception as e:
+            ai_requests.inc(outcome="error")
+            logger.warning(f"AI completion failed: {e}")
+            return None
+        finally:
+            ai_latency.observe(time.monotonic() - started)
+
+        ai_requests.inc(outcome="ok" if text else "empty")
+        return text
+
+    async def stream(self, messages: List[Dict], max_tokens: int = 100,
+                     temperature: float = 0.8, budget: float = AI_STREAM_BUDGET) -> AsyncIterator[str]:
+        """Yield completion text deltas as they arrive
+
+        Stops quietly (the caller keeps whatever it got) on a timeout or an
+        API error. The budget covers the whole stream and is enforced per
+        chunk, so the consumer's own awaits between chunks are never cancelled.
+        """
+        client = self.get_client()
+        if client is None:
+            return
+
+        started = time.monotonic()
+        deadline = started + budget
+        outcome = "ok"
+        response = None
+        try:
+            await asyncio.wait_for(self.limiter.acquire(), budget)
+        except asyncio.TimeoutError:
+            ai_requests.inc(outcome="timeout", mode="stream")
+            return
+
+        ai_in_flight.inc()
+        try:
+            response = await asyncio.wait_for(client.chat.completions.create(
+                model=self.model, messages=messages, max_tokens=max_tokens,
+                temperature=temperature, timeout=budget, stream=True,
+            ), deadline - time.monotonic())
+            chunks = response.__aiter__()
+            first = True
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if first:
+                        ai_first_token.observe(time.monotonic() - started)
+                        first = False
+                    yield delta
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning(f"AI stream exceeded {budget:.1f}s budget")
+        except Exception as e:
+            outcome = "error"
+            logger.warning(f"AI stream failed: {e}")
+        finally:
+            ai_in_flight.dec()
+            self.limiter.release()
+            ai_latency.observe(time.monotonic() - started)
+            ai_requests.inc(outcome=outcome, mode="stream")
+            if response is not None:
+                await response.close()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Global instance
+ai_client = AIClient()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Local stand-in for the OpenAI chat completions API
+Answers slowly or fails on purpose so the AI budget and fallbacks can be exercised
+
+Usage: python ai_stub_server.py [--port 8089] [--delay 0.2] [--slow-rate 0.2]
+                                [--slow-delay 10] [--failure-rate 0.1]
+Then: OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python main.py
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+
+from async_server import AsyncHttpServer, HttpResponse, json_response
+
+logger = logging.getLogger(__name__)
+
+STUB_QUOTES = [
+    "🌟 Каждый осознанный выбор сегодня - кирпичик в фундаменте нового тебя!",
+    "🚀 Ты уже доказал, что импульс - это не приказ. Продолжай в том же духе!",
+    "💪 Сила не в том, чтобы не хотеть, а в том, чтобы выбирать. И ты выбираешь!",
+    "🔥 Каждое спокойное 'нет' привычке делает следующее ещё легче!",
+    "🌱 Маленькие победы складываются в большую перемену - и она уже началась!",
+    "🎯 Ты не борешься с собой, ты учишься понимать себя. Это и есть сила!",
+    "⚡ Пауза перед действием - твоя суперспособность. Пользуйся ей смело!",
+    "🏆 Дисциплина - это забота о себе завтрашнем. Сегодня ты о нём позаботился!",
+]
+BATCH_PATTERN = re.compile(r"Создай (\d+) разных")
+
+
+def sse_chunks(completion_id: str, model: str, text: str, token_delay: float):
+    """Server-sent events in the chat.completion.chunk format, one word per event"""
+    def event(delta: dict, finish_reason=None) -> bytes:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+    async def chunks():
+        yield event({"role": "assistant", "content": ""})
+        for i, word in enumerate(text.split(" ")):
+            await asyncio.sleep(token_delay)
+            yield event({"content": word if i == 0 else " " + word})
+        yield event({}, "stop")
+        yield b"data: [DONE]\n\n"
+
+    return chunks()
+
+
+def create_stub_app(delay: float = 0.2, slow_rate: float = 0.0, slow_delay: float = 10.0,
+                    failure_rate: float = 0.0, per_quote_delay: float = 0.0,
+                    token_delay: float = 0.05) -> AsyncHttpServer:
+    """Server with a /v1/chat/completions route; rates are probabilities 0..1
+
+    `delay` is the fixed per-request overhead, `per_quote_delay` the extra
+    generation time per quote. Batch prompts ("Создай N разных") with a
+    json_object response_format get {"quotes": [...]} back; stream=True
+    requests get SSE chunks, one word every `token_delay` seconds.
+    """
+    server = AsyncHttpServer()
+    stats = {"requests": 0, "slow": 0, "failed": 0}
+
+    @server.route("/v1/chat/completions", methods=("POST",))
+    async def chat_completions(request):
+        stats["requests"] += 1
+        body = request.json() or {}
+
+        if random.random() < failure_rate:
+            stats["failed"] += 1
+            await asyncio.sleep(delay)
+            return json_response({"error": {"message": "stub failure", "type": "server_error"}}, 500)
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        match = BATCH_PATTERN.search(prompt)
+        count = int(match.group(1)) if match else 1
+
+        if random.random() < slow_rate:
+            stats["slow"] += 1
+            await asyncio.sleep(slow_delay)
+        else:
+            await asyncio.sleep(delay + per_quote_delay * count)
+
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps({"quotes": random.sample(STUB_QUOTES, min(count, len(STUB_QUOTES)))},
+                                 ensure_ascii=False)
+        else:
+            content = random.choice(STUB_QUOTES)
+
+        completion_id = f"chatcmpl-stub-{stats['requests']}"
+        if body.get("stream"):
+            return HttpResponse(200, content_type="text/event-stream",
+                                stream=sse_chunks(completion_id, body.get("model", "stub"), content, token_delay))
+
+        return json_response({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    @server.route("/stats")
+    async def stub_stats(request):
+        return json_response(stats)
+
+    return server
+
+
+async def serve(args):
+    server = create_stub_app(args.delay, args.slow_rate, args.slow_delay, args.failure_rate,
+                             args.per_quote_delay, args.token_delay)
+    await server.start(args.host, args.port)
+    logger.info(f"AI stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.2, help="normal response time, seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of slow responses")
+    parser.add_argument("--slow-delay", type=float, default=10.0, help="slow response time, seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of HTTP 500 responses")
+    parser.add_argument("--per-quote-delay", type=float, default=0.0,
+                        help="extra generation time per quote, seconds")
+    parser.add_argument("--token-delay", type=float, default=0.05,
+                        help="time between streamed words, seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Minimal asyncio HTTP server for CraveBreaker
+Serves health, status, metrics and webhook routes on the bot's event loop
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+READ_TIMEOUT = 10
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+@dataclass
+class HttpRequest:
+    """Parsed HTTP request"""
+    method: str
+    path: str
+    query: Dict[str, list]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8")) if self.body else None
+
+
+@dataclass
+class HttpResponse:
+    """HTTP response to be written back
+
+    With `stream` set the body is written chunk by chunk as the iterator
+    yields and the end of the body is marked by closing the connection.
+    """
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+    stream: Optional[AsyncIterator[bytes]] = None
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+    return HttpResponse(status, body, "application/json")
+
+
+def text_response(text: str, status: int = 200,
+                  content_type: str = "text/plain; charset=utf-8") -> HttpResponse:
+    return HttpResponse(status, text.encode("utf-8"), content_type)
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class AsyncHttpServer:
+    """Tiny HTTP/1.1 server (one request per connection) built on asyncio streams"""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    def route(self, path: str, methods: Tuple[str, ...] = ("GET",)):
+        """Decorator registering a coroutine handler for a path"""
+        def decorator(handler: Handler) -> Handler:
+            for method in methods:
+                self.routes[(method.upper(), path)] = handler
+            return handler
+        return decorator
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(f"HTTP server listening on {host}:{port}")
+
+    async def stop(self):
+        """Stop accepting connections"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    @property
+    def is_serving(self) -> bool:
+        return self._server is not None and self._server.is_serving()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+        except asyncio.LimitOverrunError:
+            raise ValueError(413)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return None
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError(413)
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            raise ValueError(400)
+
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(413)
+        body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b""
+
+        url = urlsplit(target)
+        return HttpRequest(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+    async def dispatch(self, request: HttpRequest) -> HttpResponse:
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            allowed = any(path == request.path for _, path in self.routes)
+            return json_response({"error": "method not allowed" if allowed else "not found"},
+                                 405 if allowed else 404)
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"Error handling {request.method} {request.path}: {e}")
+            return json_response({"status": "error", "error": str(e)}, 500)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await self._read_request(reader)
+                if request is None:
+                    return
+                response = await self.dispatch(request)
+            except ValueError as e:
+                status = e.args[0] if e.args and isinstance(e.args[0], int) else 400
+                response = json_response({"error": REASONS.get(status, "error")}, status)
+
+            head = [
+                f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'OK')}",
+                f"Content-Type: {response.content_type}",
+                "Connection: close",
+            ]
+            if response.stream is None:
+                head.insert(2, f"Content-Length: {len(response.body)}")
+            head.extend(f"{name}: {value}" for name, value in response.headers.items())
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+            await writer.drain()
+            if response.stream is not None:
+                async for chunk in response.stream:
+                    writer.write(chunk)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
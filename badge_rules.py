@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Declarative badge rules for CraveBreaker
+One rule set for the bot and GamificationSystem, compiled into sorted
+thresholds per metric so a check only looks at the metrics that changed
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # optional: vectorizes evaluate_many() for bulk jobs
+    numpy = None
+
+
+@dataclass(frozen=True)
+class BadgeRule:
+    """Badge earned once `metric` reaches `threshold`"""
+    id: str
+    name: str
+    description: str
+    badge_type: str
+    rarity: str
+    metric: str
+    threshold: int
+    xp_reward: int
+
+
+# Boolean conditions are metrics too: 1 when the condition holds
+BADGE_RULES: Tuple[BadgeRule, ...] = (
+    # Streak badges
+    BadgeRule("first_intervention", "🌱 Первый шаг", "Провел первую интервенцию", "streak", "common", "total_interventions", 1, 25),
+    BadgeRule("streak_3", "🔥 Тепло", "3 дня подряд", "streak", "common", "current_streak", 3, 50),
+    BadgeRule("streak_7", "⚡ Неделя силы", "7 дней подряд", "streak", "uncommon", "current_streak", 7, 100),
+    BadgeRule("streak_14", "💪 Двухнедельный воин", "14 дней подряд", "streak", "rare", "current_streak", 14, 200),
+    BadgeRule("streak_30", "🏆 Чемпион месяца", "30 дней подряд", "streak", "epic", "current_streak", 30, 500),
+    BadgeRule("streak_100", "👑 Легенда дисциплины", "100 дней подряд", "streak", "legendary", "current_streak", 100, 1000),
+    # Technique mastery badges
+    BadgeRule("breathing_master", "🫁 Мастер дыхания", "Использовал 10 разных дыхательных техник", "technique", "uncommon", "breathing_techniques", 10, 150),
+    BadgeRule("meditation_guru", "🧘 Гуру медитации", "Использовал 15 разных медитативных практик", "technique", "rare", "meditation_techniques", 15, 200),
+    BadgeRule("game_champion", "🎮 Чемпион игр", "Попробовал 20 разных отвлекающих игр", "technique", "rare", "game_techniques", 20, 200),
+    BadgeRule("technique_explorer", "🗺️ Исследователь техник", "Использовал все 125 техник", "technique", "legendary", "total_unique_techniques", 125, 1500),
+    # Milestone badges
+    BadgeRule("interventions_10", "🎯 Новичок", "10 интервенций", "milestone", "common", "total_interventions", 10, 75),
+    BadgeRule("interventions_50", "🚀 Энтузиаст", "50 интервенций", "milestone", "uncommon", "total_interventions", 50, 150),
+    BadgeRule("interventions_100", "💎 Эксперт", "100 интервенций", "milestone", "rare", "total_interventions", 100, 300),
+    BadgeRule("interventions_500", "🌟 Мастер", "500 интервенций", "milestone", "epic", "total_interventions", 500, 750),
+    BadgeRule("interventions_1000", "🔮 Гранд-мастер", "1000 интервенций", "milestone", "legendary", "total_interventions", 1000, 1500),
+    # Special achievement badges
+    BadgeRule("night_owl", "🦉 Сова", "Интервенция после полуночи", "special", "uncommon", "late_night_intervention", 1, 100),
+    BadgeRule("early_bird", "🐦 Жаворонок", "Интервенция до 6 утра", "special", "uncommon", "early_morning_intervention", 1, 100),
+    BadgeRule("weekend_warrior", "⚔️ Воин выходных", "10 интервенций в выходные", "special", "rare", "weekend_interventions", 10, 200),
+    BadgeRule("comeback_kid", "🔄 Возвращение", "Вернулся после 7+ дней перерыва", "special", "uncommon", "comeback", 1, 150),
+    BadgeRule("coaching_seeker", "💬 Ищущий совета", "Обратился к персональному коучу", "special", "common", "used_coaching", 1, 50),
+)
+
+BADGES: Dict[str, BadgeRule] = {rule.id: rule for rule in BADGE_RULES}
+
+# Badges the Telegram bot (simple_bot) awards and shows
+BOT_BADGE_IDS = ("first_intervention", "interventions_10", "interventions_50", "interventions_100",
+                 "streak_3", "streak_7", "streak_14")
+
+TECHNIQUE_PREFIXES = {"breathing_": "breathing_techniques", "meditation_": "meditation_techniques",
+                      "game_": "game_techniques"}
+
+
+def technique_metrics(technique_counts: Dict[str, int]) -> Dict[str, int]:
+    """Distinct techniques used, per family and in total, in one pass"""
+    metrics = {metric: 0 for metric in TECHNIQUE_PREFIXES.values()}
+    metrics["total_unique_techniques"] = 0
+    for technique, count in technique_counts.items():
+        if count <= 0:
+            continue
+        metrics["total_unique_techniques"] += 1
+        for prefix, metric in TECHNIQUE_PREFIXES.items():
+            if technique.startswith(prefix):
+                metrics[metric] += 1
+                break
+    return metrics
+
+
+def time_of_day_metrics(now: Optional[datetime] = None) -> Dict[str, int]:
+    hour = (now or datetime.now()).hour
+    return {"late_night_intervention": int(0 <= hour < 6), "early_morning_intervention": int(5 <= hour < 8)}
+
+
+class BadgeEngine:
+    """Rules compiled into per-metric threshold indexes
+
+    For every metric the rules are sorted by threshold. Each user has a
+    cursor per metric pointing at their next unearned threshold, so a check
+    is one comparison per changed metric unless a threshold was crossed;
+    the cost does not grow with the number of badges. Cursors only move in
+    commit(), after the awards are stored, so a failed write never hides a
+    badge. Cursors are kept for the `max_users` most recent users and
+    rebuilt from the earned set after eviction.
+    """
+
+    def __init__(self, rules: Iterable[BadgeRule], max_users: int = 10000):
+        self.rules = tuple(rules)
+        self.max_users = max_users
+        self._rules: Dict[str, List[BadgeRule]] = {}
+        for rule in sorted(self.rules, key=lambda r: (r.metric, r.threshold)):
+            self._rules.setdefault(rule.metric, []).append(rule)
+        self._thresholds = {metric: [rule.threshold for rule in rules]
+                            for metric, rules in self._rules.items()}
+        self._cursors: "OrderedDict[object, Dict[str, int]]" = OrderedDict()
+
+    @property
+    def metrics(self) -> Collection[str]:
+        return self._rules.keys()
+
+    def _cursor(self, user_id, earned: Collection[str]) -> Dict[str, int]:
+        cursor = self._cursors.get(user_id)
+        if cursor is None:
+            cursor = {}
+            for metric, rules in self._rules.items():
+                position = 0
+                while position < len(rules) and rules[position].id in earned:
+                    position += 1
+                cursor[metric] = position
+            self._cursors[user_id] = cursor
+            while len(self._cursors) > self.max_users:
+                self._cursors.popitem(last=False)
+        self._cursors.move_to_end(user_id)
+        return cursor
+
+    def evaluate(self, user_id, changed: Dict[str, int], earned: Collection[str]) -> List[BadgeRule]:
+        """Rules newly satisfied by the changed metric values
+
+        Only metrics present in `changed` are looked at; the caller marks
+        the returned badges as earned. Nothing is recorded here: once the
+        awards are persisted the caller calls commit(), and until then the
+        same thresholds are offered again.
+        """
+        cursor = self._cursor(user_id, earned)
+        newly_earned = []
+        for metric, value in changed.items():
+            rules = self._rules.get(metric)
+            if rules is None:
+                continue
+            position = cursor[metric]
+            if position >= len(rules) or value < rules[position].threshold:
+                continue  # the common case: next threshold not reached
+            reached = bisect_right(self._thresholds[metric], value)
+            for rule in rules[position:reached]:
+                if rule.id not in earned:
+                    newly_earned.append(rule)
+        return newly_earned
+
+    def commit(self, user_id, changed: Dict[str, int]):
+        """Move the user's cursors past every threshold `changed` reaches
+
+        Call after the badges evaluate() returned for these values have
+        been persisted (every threshold they reach is then earned).
+        """
+        cursor = self._cursors.get(user_id)
+        if cursor is None:
+            return  # rebuilt from the earned set on the next evaluate()
+        for metric, value in changed.items():
+            thresholds = self._thresholds.get(metric)
+            if thresholds is not None:
+                cursor[metric] = max(cursor[metric], bisect_right(thresholds, value))
+
+    def evaluate_many(self, columns: Dict[str, Sequence[int]],
+                      earned: Sequence[Collection[str]]) -> List[List[BadgeRule]]:
+        """Unearned badges reached by each row of a chunk of users
+
+        `columns` maps metric -> one value per row, aligned with `earned`.
+        Each metric is resolved for the whole chunk with one sorted search
+        over its thresholds (numpy.searchsorted when NumPy is installed).
+        Per-user cursors are not used or changed.
+        """
+        reached_by_row: List[List[BadgeRule]] = [[] for _ in earned]
+        for metric, values in columns.items():
+            rules = self._rules.get(metric)
+            if rules is None:
+                continue
+            thresholds = self._thresholds[metric]
+            if numpy is not None:
+                reached = numpy.searchsorted(numpy.asarray(thresholds, dtype=numpy.int64),
+                                             numpy.asarray(values, dtype=numpy.int64), side="right").tolist()
+            else:
+                reached = [bisect_right(thresholds, value) for value in values]
+            for row, count in enumerate(reached):
+                for rule in rules[:count]:
+                    if rule.id not in earned[row]:
+                        reached_by_row[row].append(rule)
+        return reached_by_row
+
+    def next_threshold(self, user_id, metric: str, earned: Collection[str]) -> Optional[BadgeRule]:
+        """Next badge the user can earn on this metric, if any"""
+        rules = self._rules.get(metric, [])
+        position = self._cursor(user_id, earned)[metric] if metric in self._rules else 0
+        while position < len(rules) and rules[position].id in earned:
+            position += 1
+        return rules[position] if position < len(rules) else None
+
+    def forget(self, user_id):
+        self._cursors.pop(user_id, None)
+
+
+# Global instances: everything for GamificationSystem, the bot's subset for simple_bot
+badge_engine = BadgeEngine(BADGE_RULES)
+bot_badge_engine = BadgeEngine(BADGES[badge_id] for badge_id in BOT_BADGE_IDS)
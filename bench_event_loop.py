@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Event loop benchmark for CraveBreaker
+Pushes synthetic Telegram updates through the async HTTP server's webhook
+route and reports throughput and latency for each event loop policy
+
+Usage: python bench_event_loop.py [--updates 5000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from async_server import AsyncHttpServer, json_response
+from loop_policy import install_loop_policy, uvloop_available
+
+CALLBACKS = ["emergency_help", "my_impulses", "impulse_sweets", "technique_sweets_2",
+             "achievements", "daily_motivation", "back_to_menu"]
+
+
+def make_update(update_id: int) -> bytes:
+    """Callback-query update shaped like the ones Telegram sends"""
+    user_id = random.randint(1, 10000)
+    return json.dumps({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": {"id": user_id, "username": f"user{user_id}"},
+            "message": {"message_id": update_id, "chat": {"id": user_id}},
+            "data": random.choice(CALLBACKS),
+        },
+    }).encode()
+
+
+async def handle_update(update: dict, io_delay: float):
+    """Synthetic handler: routing, keyboard building and two simulated I/O waits"""
+    data = update["callback_query"]["data"]
+    keyboard = {"inline_keyboard": [[{"text": f"{data} {i}", "callback_data": f"{data}_{i}"}]
+                                    for i in range(6)]}
+    await asyncio.sleep(io_delay)  # database
+    text = json.dumps({"chat_id": update["callback_query"]["message"]["chat"]["id"],
+                       "text": f"**{data}**", "reply_markup": keyboard})
+    await asyncio.sleep(io_delay)  # Telegram API
+    return len(text)
+
+
+async def run_workload(updates: int, concurrency: int, io_delay: float, port: int) -> dict:
+    server = AsyncHttpServer()
+
+    @server.route("/webhook", methods=("POST",))
+    async def webhook(request):
+        await handle_update(request.json(), io_delay)
+        return json_response({"ok": True})
+
+    await server.start("127.0.0.1", port)
+    latencies = []
+    counter = iter(range(updates))
+
+    async def client():
+        for update_id in counter:
+            body = make_update(update_id)
+            started = time.perf_counter()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /webhook HTTP/1.1\r\nHost: bench\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            await reader.read()
+            writer.close()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await server.stop()
+
+    latencies.sort()
+    return {
+        "updates_per_second": round(updates / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def run_one(policy: str, args) -> dict:
+    """Benchmark one policy in a fresh interpreter so policies don't mix"""
+    result = subprocess.run(
+        [sys.executable, __file__, "--worker", policy, "--updates", str(args.updates),
+         "--concurrency", str(args.concurrency), "--io-delay", str(args.io_delay),
+         "--port", str(args.port)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--io-delay", type=float, default=0.001)
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument("--worker", choices=["asyncio", "uvloop"])
+    args = parser.parse_args()
+
+    if args.worker:
+        install_loop_policy(args.worker)
+        print(json.dumps(asyncio.run(run_workload(args.updates, args.concurrency,
+                                                  args.io_delay, args.port))))
+        return
+
+    policies = ["asyncio"] + (["uvloop"] if uvloop_available() else [])
+    print(f"{args.updates} updates, concurrency {args.concurrency}, io delay {args.io_delay * 1000:g} ms")
+    print(f"{'loop':<10}{'updates/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for policy in policies:
+        stats = run_one(policy, args)
+        print(f"{policy:<10}{stats['updates_per_second']:>12}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
+    if len(policies) == 1:
+        print("uvloop is not installed (pip install uvloop) - only the default loop was measured")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,26 @@
 
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 from database import Database
 from interventions import InterventionManager
+from timer_wheel import timer_wheel
 from utils import MessageTemplates
-import asyncio
 import random
 
 logger = logging.getLogger(__name__)
 
+BREATHING_PHASES = ["Вдох... 💨", "Задержка... ⏸️", "Выдох... 🌬️", "Пауза... ⏸️"]
+BREATHING_PHASE_SECONDS = 4
+
 class BotHandlers:
     def __init__(self, database: Database):
         self.db = database
         self.interventions = InterventionManager()
         self.templates = MessageTemplates()
+        # chat_id -> токен идущего дыхательного упражнения
+        self.breathing_sessions = {}
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
@@ -76,6 +82,9 @@ class BotHandlers:
         
         logger.info(f"Получен callback: {data} от пользователя {user_id}")
         
+        # Любое нажатие уводит с экрана упражнения - останавливаем таймер
+        self.stop_breathing_timer(update.effective_chat.id)
+        
         # Маршрутизация callback'ов
         if data == "onboarding_complete":
             await self.show_main_menu(update, context)
@@ -152,24 +161,52 @@ class BotHandlers:
         
         await query.edit_message_text(text, reply_markup=reply_markup)
         
-        # Запускаем таймер дыхательного упражнения
-        await self.run_breathing_timer(update, context, exercise['duration'])
+        # Таймер ведет общее колесо таймеров, обработчик не ждет конца упражнения
+        self.run_breathing_timer(update, context, exercise['duration'], text, reply_markup)
+    
+    def run_breathing_timer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, duration: int,
+                            text: str, reply_markup: InlineKeyboardMarkup):
+        """Таймер для дыхательного упражнения: фазы в том же сообщении каждые 4 секунды"""
+        chat_id = update.effective_chat.id
+        self.stop_breathing_timer(chat_id)
+        session = self.breathing_sessions[chat_id] = object()
+        steps = max(1, duration // BREATHING_PHASE_SECONDS)
+        timer_wheel.schedule(
+            0, self._breathing_step, context.bot, chat_id, update.callback_query.message.message_id,
+            text, reply_markup, session, 0, steps, key=("breathing", chat_id)
+        )
     
-    async def run_breathing_timer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, duration: int):
-        """Таймер для дыхательного упражнения"""
-        phases = ["Вдох... 💨", "Задержка... ⏸️", "Выдох... 🌬️", "Пауза... ⏸️"]
-        
-        for i in range(duration // 4):  # Каждый цикл 16 секунд
-            for phase in phases:
-                if i == 0:  # Только в первый раз показываем фазы
-                    try:
-                        await context.bot.send_message(
-                            chat_id=update.effective_chat.id,
-                            text=f"🫁 {phase}"
-                        )
-                        await asyncio.sleep(4)
-                    except:
-                        break
+    def stop_breathing_timer(self, chat_id: int):
+        """Остановка упражнения, если пользователь ушел с его экрана"""
+        if self.breathing_sessions.pop(chat_id, None) is not None:
+            timer_wheel.cancel_key(("breathing", chat_id))
+    
+    async def _breathing_step(self, bot, chat_id, message_id, text, reply_markup, session, step, steps):
+        if self.breathing_sessions.get(chat_id) is not session:
+            return  # упражнение уже остановлено
+        
+        if step < steps:
+            phase = BREATHING_PHASES[step % len(BREATHING_PHASES)]
+            status = f"🫁 {phase}  ({step + 1}/{steps})"
+            # Следующая фаза планируется до отправки, чтобы задержки сети не сдвигали ритм
+            timer_wheel.schedule(
+                BREATHING_PHASE_SECONDS, self._breathing_step, bot, chat_id, message_id,
+                text, reply_markup, session, step + 1, steps, key=("breathing", chat_id)
+            )
+        else:
+            del self.breathing_sessions[chat_id]
+            status = "✅ Время вышло. Как вы себя чувствуете?"
+        
+        try:
+            await bot.edit_message_text(
+                chat_id=chat_id, message_id=message_id,
+                text=f"{text}\n\n{status}", reply_markup=reply_markup
+            )
+        except TelegramError as e:
+            # Сообщение удалено или недоступно - дальше не продолжаем
+            logger.warning(f"Дыхательное упражнение в чате {chat_id} остановлено: {e}")
+            if self.breathing_sessions.get(chat_id) is session:
+                self.stop_breathing_timer(chat_id)
     
     async def show_coaching_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показ коучингового вопроса"""
@@ -10,7 +10,6 @@ import sys
 import json
 import time
 import subprocess
-from flask import Flask
 import aiosqlite
 import httpx
 
@@ -131,29 +130,27 @@ class DeploymentValidator:
         except Exception as e:
             self.test_result("database_init", False, f"Database initialization failed: {e}")
     
-    def test_flask_app_creation(self):
-        """Test Flask app can be created"""
-        print("\n🌐 Testing Flask App...")
+    def test_http_server_routes(self):
+        """Test the asyncio HTTP server (main.server) has its routes"""
+        print("\n🌐 Testing HTTP Server...")
         
         try:
-            from main import app
-            if app and isinstance(app, Flask):
-                self.test_result("flask_app", True, "Flask app created successfully")
-                
-                # Test routes exist
-                routes = [rule.rule for rule in app.url_map.iter_rules()]
-                expected_routes = ["/", "/health", "/status", "/restart"]
-                
-                missing_routes = [route for route in expected_routes if route not in routes]
-                if not missing_routes:
-                    self.test_result("flask_routes", True, f"All routes available: {routes}")
-                else:
-                    self.test_result("flask_routes", False, f"Missing routes: {missing_routes}")
+            from main import server, WEBHOOK_PATH
+            routes = sorted({path for _, path in server.routes})
+            self.test_result("http_server", True, "HTTP server created successfully")
+            
+            # Test routes exist
+            expected_routes = ["/", "/health", "/status", "/metrics", "/diagnostics", "/restart"]
+            missing_routes = [route for route in expected_routes if route not in routes]
+            if ("POST", WEBHOOK_PATH) not in server.routes:
+                missing_routes.append(f"POST {WEBHOOK_PATH}")
+            if not missing_routes:
+                self.test_result("http_routes", True, f"All routes available: {routes}")
             else:
-                self.test_result("flask_app", False, "Flask app not created properly")
+                self.test_result("http_routes", False, f"Missing routes: {missing_routes}")
                 
         except Exception as e:
-            self.test_result("flask_app", False, f"Flask app creation failed: {e}")
+            self.test_result("http_server", False, f"HTTP server creation failed: {e}")
     
     def test_deployment_configs(self):
         """Test deployment configuration files"""
@@ -233,7 +230,7 @@ async def main():
     validator.test_file_structure()
     validator.test_python_imports()
     await validator.test_database_initialization()
-    validator.test_flask_app_creation()
+    validator.test_http_server_routes()
     validator.test_deployment_configs()
     
     # Print summary
@@ -9,9 +9,13 @@ Implements achievement badges, streaks, levels, and rewards
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from enum import Enum
 
+from badge_rules import BADGE_RULES, badge_engine, technique_metrics, time_of_day_metrics
+from level_curve import level_curve
+from progress_record import ProgressRecord
+
 class BadgeType(Enum):
     """Types of achievement badges"""
     STREAK = "streak"
@@ -41,176 +45,76 @@ class Badge:
     xp_reward: int
     unlocked_at: Optional[datetime] = None
 
-@dataclass
-class UserProgress:
-    """User gamification progress"""
-    user_id: int
-    level: int = 1
-    xp: int = 0
-    total_interventions: int = 0
-    current_streak: int = 0
-    longest_streak: int = 0
-    last_intervention_date: Optional[str] = None
-    badges_earned: Optional[List[str]] = None
-    technique_counts: Optional[Dict[str, int]] = None
-    
-    def __post_init__(self):
-        if self.badges_earned is None:
-            self.badges_earned = []
-        if self.technique_counts is None:
-            self.technique_counts = {}
+# Marker shown next to a badge for its rarity
+RARITY_EMOJI = {
+    BadgeRarity.COMMON: "⚪",
+    BadgeRarity.UNCOMMON: "🟢",
+    BadgeRarity.RARE: "🔵",
+    BadgeRarity.EPIC: "🟣",
+    BadgeRarity.LEGENDARY: "🟡"
+}
+
+# User gamification progress: slots record with a badge bitmask (progress_record)
+UserProgress = ProgressRecord
 
 class GamificationSystem:
     """Main gamification system manager"""
     
     def __init__(self):
         self.badges = self._initialize_badges()
-        self.level_thresholds = [0, 100, 250, 500, 1000, 1750, 2750, 4000, 5500, 7500, 10000]
+        self.level_curve = level_curve
+        self.level_thresholds = list(level_curve.thresholds)
+        # The badge set is fixed, so the catalog is rendered once
+        self._available_badges_message = self._render_available_badges()
         
     def _initialize_badges(self) -> Dict[str, Badge]:
-        """Initialize all available badges"""
-        badges = {}
-        
-        # Streak Badges
-        streak_badges = [
-            ("first_intervention", "🌱 Первый шаг", "Провел первую интервенцию", BadgeRarity.COMMON, {"interventions": 1}, 25),
-            ("streak_3", "🔥 Тепло", "3 дня подряд", BadgeRarity.COMMON, {"streak": 3}, 50),
-            ("streak_7", "⚡ Неделя силы", "7 дней подряд", BadgeRarity.UNCOMMON, {"streak": 7}, 100),
-            ("streak_14", "💪 Двухнедельный воин", "14 дней подряд", BadgeRarity.RARE, {"streak": 14}, 200),
-            ("streak_30", "🏆 Чемпион месяца", "30 дней подряд", BadgeRarity.EPIC, {"streak": 30}, 500),
-            ("streak_100", "👑 Легенда дисциплины", "100 дней подряд", BadgeRarity.LEGENDARY, {"streak": 100}, 1000),
-        ]
-        
-        for badge_id, name, desc, rarity, req, xp in streak_badges:
-            badges[badge_id] = Badge(badge_id, name, desc, name.split()[0], BadgeType.STREAK, rarity, req, xp)
-        
-        # Technique Mastery Badges
-        technique_badges = [
-            ("breathing_master", "🫁 Мастер дыхания", "Использовал 10 разных дыхательных техник", BadgeRarity.UNCOMMON, {"breathing_techniques": 10}, 150),
-            ("meditation_guru", "🧘 Гуру медитации", "Использовал 15 разных медитативных практик", BadgeRarity.RARE, {"meditation_techniques": 15}, 200),
-            ("game_champion", "🎮 Чемпион игр", "Попробовал 20 разных отвлекающих игр", BadgeRarity.RARE, {"game_techniques": 20}, 200),
-            ("technique_explorer", "🗺️ Исследователь техник", "Использовал все 125 техник", BadgeRarity.LEGENDARY, {"total_unique_techniques": 125}, 1500),
-        ]
-        
-        for badge_id, name, desc, rarity, req, xp in technique_badges:
-            badges[badge_id] = Badge(badge_id, name, desc, name.split()[0], BadgeType.TECHNIQUE, rarity, req, xp)
-        
-        # Milestone Badges
-        milestone_badges = [
-            ("interventions_10", "🎯 Новичок", "10 интервенций", BadgeRarity.COMMON, {"total_interventions": 10}, 75),
-            ("interventions_50", "🚀 Энтузиаст", "50 интервенций", BadgeRarity.UNCOMMON, {"total_interventions": 50}, 150),
-            ("interventions_100", "💎 Эксперт", "100 интервенций", BadgeRarity.RARE, {"total_interventions": 100}, 300),
-            ("interventions_500", "🌟 Мастер", "500 интервенций", BadgeRarity.EPIC, {"total_interventions": 500}, 750),
-            ("interventions_1000", "🔮 Гранд-мастер", "1000 интервенций", BadgeRarity.LEGENDARY, {"total_interventions": 1000}, 1500),
-        ]
-        
-        for badge_id, name, desc, rarity, req, xp in milestone_badges:
-            badges[badge_id] = Badge(badge_id, name, desc, name.split()[0], BadgeType.MILESTONE, rarity, req, xp)
-        
-        # Special Achievement Badges
-        special_badges = [
-            ("night_owl", "🦉 Сова", "Интервенция после полуночи", BadgeRarity.UNCOMMON, {"late_night_intervention": True}, 100),
-            ("early_bird", "🐦 Жаворонок", "Интервенция до 6 утра", BadgeRarity.UNCOMMON, {"early_morning_intervention": True}, 100),
-            ("weekend_warrior", "⚔️ Воин выходных", "10 интервенций в выходные", BadgeRarity.RARE, {"weekend_interventions": 10}, 200),
-            ("comeback_kid", "🔄 Возвращение", "Вернулся после 7+ дней перерыва", BadgeRarity.UNCOMMON, {"comeback": True}, 150),
-            ("coaching_seeker", "💬 Ищущий совета", "Обратился к персональному коучу", BadgeRarity.COMMON, {"used_coaching": True}, 50),
-        ]
-        
-        for badge_id, name, desc, rarity, req, xp in special_badges:
-            badges[badge_id] = Badge(badge_id, name, desc, name.split()[0], BadgeType.SPECIAL, rarity, req, xp)
-        
-        return badges
+        """Initialize all available badges from the shared rule set"""
+        return {
+            rule.id: Badge(rule.id, rule.name, rule.description, rule.name.split()[0],
+                           BadgeType(rule.badge_type), BadgeRarity(rule.rarity),
+                           {rule.metric: rule.threshold}, rule.xp_reward)
+            for rule in BADGE_RULES
+        }
+    
+    def _collect_metrics(self, progress: UserProgress, intervention_data: Dict) -> Dict[str, int]:
+        """Current value of every metric the badge rules use"""
+        metrics = {
+            "total_interventions": progress.total_interventions,
+            "current_streak": progress.current_streak,
+            "weekend_interventions": intervention_data.get("weekend_count", 0),
+            "comeback": int(bool(intervention_data.get("is_comeback", False))),
+            "used_coaching": int(bool(intervention_data.get("used_coaching", False))),
+        }
+        metrics.update(technique_metrics(progress.technique_counts))
+        metrics.update(time_of_day_metrics())
+        return metrics
     
     def check_and_award_badges(self, user_progress: UserProgress, intervention_data: Dict) -> List[Badge]:
         """Check for new badge achievements and award them"""
         newly_earned = []
         
-        for badge_id, badge in self.badges.items():
-            if badge_id in user_progress.badges_earned:
-                continue
-                
-            if self._check_badge_requirement(badge, user_progress, intervention_data):
-                user_progress.badges_earned.append(badge_id)
-                user_progress.xp += badge.xp_reward
-                badge.unlocked_at = datetime.now()
-                newly_earned.append(badge)
+        changed = self._collect_metrics(user_progress, intervention_data)
+        for rule in badge_engine.evaluate(user_progress.user_id, changed, user_progress.badges_earned):
+            badge = self.badges[rule.id]
+            user_progress.badges_earned.append(rule.id)
+            user_progress.xp += badge.xp_reward
+            badge.unlocked_at = datetime.now()
+            newly_earned.append(badge)
         
+        # The awards live on the record now
+        badge_engine.commit(user_progress.user_id, changed)
         return newly_earned
     
-    def _check_badge_requirement(self, badge: Badge, progress: UserProgress, intervention_data: Dict) -> bool:
-        """Check if badge requirements are met"""
-        req = badge.requirement
-        
-        if "interventions" in req:
-            return progress.total_interventions >= req["interventions"]
-        
-        if "streak" in req:
-            return progress.current_streak >= req["streak"]
-        
-        if "total_interventions" in req:
-            return progress.total_interventions >= req["total_interventions"]
-        
-        if "breathing_techniques" in req:
-            breathing_count = sum(1 for technique, count in progress.technique_counts.items() 
-                               if technique.startswith("breathing_") and count > 0)
-            return breathing_count >= req["breathing_techniques"]
-        
-        if "meditation_techniques" in req:
-            meditation_count = sum(1 for technique, count in progress.technique_counts.items() 
-                                if technique.startswith("meditation_") and count > 0)
-            return meditation_count >= req["meditation_techniques"]
-        
-        if "game_techniques" in req:
-            game_count = sum(1 for technique, count in progress.technique_counts.items() 
-                           if technique.startswith("game_") and count > 0)
-            return game_count >= req["game_techniques"]
-        
-        if "total_unique_techniques" in req:
-            unique_count = sum(1 for count in progress.technique_counts.values() if count > 0)
-            return unique_count >= req["total_unique_techniques"]
-        
-        # Special badge checks
-        if "late_night_intervention" in req:
-            current_hour = datetime.now().hour
-            return current_hour >= 0 and current_hour < 6
-        
-        if "early_morning_intervention" in req:
-            current_hour = datetime.now().hour
-            return current_hour >= 5 and current_hour < 8
-        
-        if "weekend_interventions" in req:
-            weekend_count = intervention_data.get("weekend_count", 0)
-            return weekend_count >= req["weekend_interventions"]
-        
-        if "comeback" in req:
-            return intervention_data.get("is_comeback", False)
-        
-        if "used_coaching" in req:
-            return intervention_data.get("used_coaching", False)
-        
-        return False
-    
     def calculate_level(self, xp: int) -> int:
         """Calculate user level based on XP"""
-        for level, threshold in enumerate(self.level_thresholds):
-            if xp < threshold:
-                return level
-        return len(self.level_thresholds)
+        return self.level_curve.level(xp)
     
     def get_xp_for_next_level(self, current_xp: int) -> Tuple[int, int]:
         """Get XP needed for next level and current level progress"""
-        current_level = self.calculate_level(current_xp)
-        
-        if current_level >= len(self.level_thresholds):
+        info = self.level_curve.info(current_xp)
+        if info.is_max:
             return 0, 0  # Max level reached
-        
-        current_threshold = self.level_thresholds[current_level - 1] if current_level > 0 else 0
-        next_threshold = self.level_thresholds[current_level]
-        
-        xp_for_next = next_threshold - current_xp
-        progress_in_level = current_xp - current_threshold
-        
-        return xp_for_next, progress_in_level
+        return info.xp_to_next, info.xp_in_level
     
     def update_streak(self, user_progress: UserProgress) -> bool:
         """Update user streak based on intervention date"""
@@ -251,15 +155,7 @@ class GamificationSystem:
         message = "🎉 **НОВЫЕ ДОСТИЖЕНИЯ!**\n\n"
         
         for badge in badges:
-            rarity_emoji = {
-                BadgeRarity.COMMON: "⚪",
-                BadgeRarity.UNCOMMON: "🟢", 
-                BadgeRarity.RARE: "🔵",
-                BadgeRarity.EPIC: "🟣",
-                BadgeRarity.LEGENDARY: "🟡"
-            }
-            
-            message += f"{badge.emoji} **{badge.name}** {rarity_emoji[badge.rarity]}\n"
+            message += f"{badge.emoji} **{badge.name}** {RARITY_EMOJI[badge.rarity]}\n"
             message += f"*{badge.description}*\n"
             message += f"💎 +{badge.xp_reward} XP\n\n"
         
@@ -284,19 +180,20 @@ class GamificationSystem:
         message += f"🎯 **Лучшая серия:** {user_progress.longest_streak} дней\n"
         message += f"🏅 **Достижений:** {len(user_progress.badges_earned)}\n\n"
         
-        # Show recent badges
-        if user_progress.badges_earned:
-            message += "🏆 **ПОСЛЕДНИЕ ДОСТИЖЕНИЯ:**\n"
-            recent_badges = user_progress.badges_earned[-3:]  # Show last 3
-            for badge_id in recent_badges:
-                if badge_id in self.badges:
-                    badge = self.badges[badge_id]
-                    message += f"{badge.emoji} {badge.name}\n"
+        # Show top badges (the bitmask keeps registry order, not the order earned)
+        earned = [self.badges[badge_id] for badge_id in user_progress.badges_earned if badge_id in self.badges]
+        if earned:
+            message += "🏆 **ГЛАВНЫЕ ДОСТИЖЕНИЯ:**\n"
+            for badge in sorted(earned, key=lambda badge: badge.xp_reward, reverse=True)[:3]:
+                message += f"{badge.emoji} {badge.name}\n"
         
         return message
     
     def get_available_badges_message(self) -> str:
         """Get message showing available badges to earn"""
+        return self._available_badges_message
+    
+    def _render_available_badges(self) -> str:
         message = "🎯 **ДОСТУПНЫЕ ДОСТИЖЕНИЯ**\n\n"
         
         # Group badges by type
@@ -314,14 +211,7 @@ class GamificationSystem:
                 
             message += f"{title}\n"
             for badge in sorted(type_badges, key=lambda x: x.xp_reward):
-                rarity_emoji = {
-                    BadgeRarity.COMMON: "⚪",
-                    BadgeRarity.UNCOMMON: "🟢", 
-                    BadgeRarity.RARE: "🔵",
-                    BadgeRarity.EPIC: "🟣",
-                    BadgeRarity.LEGENDARY: "🟡"
-                }
-                message += f"{badge.emoji} {badge.name} {rarity_emoji[badge.rarity]} (+{badge.xp_reward} XP)\n"
+                message += f"{badge.emoji} {badge.name} {RARITY_EMOJI[badge.rarity]} (+{badge.xp_reward} XP)\n"
                 message += f"   *{badge.description}*\n"
             message += "\n"
         
@@ -1,4 +1,8 @@
 # Gunicorn configuration for production deployment
+#
+# Gunicorn serves wsgi:application, which only answers health checks (see
+# wsgi.py). The bot itself runs on the asyncio server: `python main.py`,
+# as every Procfile starts it.
 import os
 
 # Server socket
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Leaderboards for CraveBreaker
+XP, weekly XP, streak and intervention rankings kept in memory: a Fenwick
+tree over scores answers a user's rank in O(log n), a top-N list is updated
+incrementally, and indexed SQL serves pages beyond it
+"""
+
+import heapq
+import logging
+import os
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_TOP_N = int(os.getenv("LEADERBOARD_TOP_N", "50"))
+
+# All-time board name -> user_progress column (indexed in create_tables)
+PROGRESS_BOARDS = {
+    "xp": "xp",
+    "streak": "current_streak",
+    "interventions": "total_interventions",
+}
+WEEKLY_BOARD = "weekly_xp"
+
+rank_lookups = registry.counter("leaderboard_rank_lookups_total", "User rank lookups by board")
+top_rebuilds = registry.counter("leaderboard_top_rebuilds_total",
+                                "Top-N lists rebuilt after a member dropped out")
+
+
+def week_key(now: Optional[datetime] = None) -> str:
+    year, week, _ = (now or datetime.now()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+async def add_weekly_xp(db, week: str, gains: Iterable[Tuple[int, int]]):
+    """Add (user_id, xp gained) pairs to the week's rollup (caller commits)"""
+    await db.executemany(
+        """INSERT INTO weekly_xp (week, user_id, xp) VALUES (?, ?, ?)
+           ON CONFLICT(week, user_id) DO UPDATE SET xp = xp + excluded.xp""",
+        [(week, user_id, gained) for user_id, gained in gains]
+    )
+
+
+class FenwickTree:
+    """Number of users per score with O(log n) prefix counts
+
+    Indexed by score (non-negative ints); the array doubles when a score
+    beyond its size shows up.
+    """
+
+    def __init__(self, size: int = 1024):
+        self._tree = [0] * (size + 1)
+        self.total = 0
+
+    def _build(self, counts: List[int]):
+        """Tree from per-position counts (counts[0] unused) in O(size)"""
+        self._tree = counts
+        for position in range(1, len(counts)):
+            parent = position + (position & -position)
+            if parent < len(counts):
+                counts[parent] += counts[position]
+
+    def _point_counts(self, highest: int) -> List[int]:
+        """Per-position counts, in an array doubled until `highest` fits"""
+        size = len(self._tree) - 1
+        while size <= highest:
+            size *= 2
+        counts = [0] * (size + 1)
+        for position in range(1, len(self._tree)):
+            counts[position] = self.count_le(position - 1) - self.count_le(position - 2)
+        return counts
+
+    def _grow(self, score: int):
+        self._build(self._point_counts(score))
+
+    def load(self, scores: Iterable[int]):
+        """Add many scores at once, rebuilding the tree in linear time"""
+        scores = list(scores)
+        counts = self._point_counts(max(scores, default=0) + 1)
+        for score in scores:
+            counts[score + 1] += 1
+        self.total += len(scores)
+        self._build(counts)
+
+    def _add(self, position: int, delta: int):
+        while position < len(self._tree):
+            self._tree[position] += delta
+            position += position & -position
+
+    def add(self, score: int, delta: int = 1):
+        if score + 1 >= len(self._tree):
+            self._grow(score + 1)
+        self._add(score + 1, delta)
+        self.total += delta
+
+    def count_le(self, score: int) -> int:
+        """Users with a score <= `score`"""
+        position = min(score + 1, len(self._tree) - 1)
+        count = 0
+        while position > 0:
+            count += self._tree[position]
+            position -= position & -position
+        return count
+
+
+class Board:
+    """One ranking: a score per user, score counts and a cached top-N
+
+    The top list holds (-score, user_id) sorted, so ties rank by user id.
+    A raised score is inserted in place; when a member's score drops, a
+    user outside the list may now belong in it, so the list is marked
+    stale and rebuilt from the in-memory scores on the next read.
+    """
+
+    def __init__(self, name: str, top_n: int = LEADERBOARD_TOP_N):
+        self.name = name
+        self.top_n = top_n
+        self.scores: Dict[int, int] = {}
+        self.counts = FenwickTree()
+        self._top: List[Tuple[int, int]] = []
+        self._top_stale = False
+
+    def set(self, user_id: int, score: int):
+        score = max(int(score or 0), 0)
+        previous = self.scores.get(user_id)
+        if previous == score:
+            return
+        if previous is not None:
+            self.counts.add(previous, -1)
+        self.scores[user_id] = score
+        self.counts.add(score)
+
+        if self._top_stale:
+            return
+        if previous is not None:
+            position = bisect_left(self._top, (-previous, user_id))
+            if position < len(self._top) and self._top[position] == (-previous, user_id):
+                del self._top[position]
+                if score < previous and len(self.scores) > len(self._top) + 1:
+                    self._top_stale = True
+                    return
+        entry = (-score, user_id)
+        if len(self._top) < self.top_n or entry < self._top[-1]:
+            insort(self._top, entry)
+            del self._top[self.top_n:]
+
+    def load(self, rows: Iterable[Tuple[int, int]]):
+        added = []
+        for user_id, score in rows:
+            score = max(int(score or 0), 0)
+            previous = self.scores.get(user_id)
+            if previous is not None:
+                self.counts.add(previous, -1)
+            self.scores[user_id] = score
+            added.append(score)
+        self.counts.load(added)
+        self._top_stale = True
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1 + number of users with a strictly higher score"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.counts.total - self.counts.count_le(score) + 1
+
+    def top(self, limit: int) -> List[Tuple[int, int]]:
+        if self._top_stale:
+            self._top = heapq.nsmallest(self.top_n, ((-score, user_id) for user_id, score in self.scores.items()))
+            self._top_stale = False
+            top_rebuilds.inc(board=self.name)
+        return [(user_id, -negative) for negative, user_id in self._top[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+class Leaderboard:
+    """All boards for one database, fed from the bot's progress writes
+
+    load() reads every score once at startup; afterwards record() is called
+    with each progress row the bot writes (inside that write's
+    transaction, so the weekly rollup stays in step with the XP), and
+    the boards are updated in memory. observe() is called with each row
+    the bot reads from the database, which is how changes made by other
+    processes (reevaluate_job.py, the sweep CLI) reach the all-time
+    boards; their weekly XP is in weekly_xp and shows after a restart.
+    """
+
+    def __init__(self, db_path: str, top_n: int = LEADERBOARD_TOP_N):
+        self.db_path = db_path
+        self.top_n = top_n
+        self.boards = {name: Board(name, top_n) for name in PROGRESS_BOARDS}
+        self.week = week_key()
+        self.boards[WEEKLY_BOARD] = Board(WEEKLY_BOARD, top_n)
+        self.loaded = False
+
+    @staticmethod
+    async def create_tables(db):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS weekly_xp (
+                week TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                xp INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (week, user_id)
+            )
+        """)
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_weekly_xp_rank ON weekly_xp (week, xp DESC, user_id)")
+        for column in PROGRESS_BOARDS.values():
+            await db.execute(f"CREATE INDEX IF NOT EXISTS idx_user_progress_{column} "
+                             f"ON user_progress ({column} DESC, user_id)")
+
+    async def load(self):
+        """Fill the boards from the database (one scan per table)"""
+        columns = list(PROGRESS_BOARDS.items())
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                f"SELECT user_id, {', '.join(column for _, column in columns)} FROM user_progress"
+            )
+            rows = await cursor.fetchall()
+            for position, (name, _) in enumerate(columns, start=1):
+                self.boards[name].load((row[0], row[position]) for row in rows)
+            cursor = await db.execute("SELECT user_id, xp FROM weekly_xp WHERE week = ?", (self.week,))
+            self.boards[WEEKLY_BOARD].load(await cursor.fetchall())
+        self.loaded = True
+        logger.info(f"Leaderboards loaded for {len(rows)} users")
+
+    def _roll_week(self):
+        week = week_key()
+        if week != self.week:
+            self.week = week
+            self.boards[WEEKLY_BOARD] = Board(WEEKLY_BOARD, self.top_n)
+
+    async def record(self, db, user_id: int, progress: Dict):
+        """Apply a progress row being written on `db` (caller commits)"""
+        self._roll_week()
+        previous_xp = self.boards["xp"].scores.get(user_id, 0)
+        gained = progress.get("xp", 0) - previous_xp
+        if gained > 0:
+            await add_weekly_xp(db, self.week, [(user_id, gained)])
+            weekly = self.boards[WEEKLY_BOARD]
+            weekly.set(user_id, weekly.scores.get(user_id, 0) + gained)
+        self.observe(user_id, progress)
+
+    def observe(self, user_id: int, progress: Dict):
+        """Set the all-time scores to a progress row as stored in the database
+
+        Keeps record() from crediting XP another process added to this
+        week's rollup a second time.
+        """
+        for name, column in PROGRESS_BOARDS.items():
+            self.boards[name].set(user_id, progress.get(column, 0))
+
+    async def streaks_broken(self, broken):
+        """StreakSweep callback: reset streak scores it zeroed in the DB"""
+        board = self.boards["streak"]
+        for streak in broken:
+            if streak.user_id in board.scores:
+                board.set(streak.user_id, 0)
+
+    def rank(self, board: str, user_id: int) -> Optional[int]:
+        self._roll_week()
+        rank_lookups.inc(board=board)
+        return self.boards[board].rank(user_id)
+
+    def size(self, board: str) -> int:
+        return len(self.boards[board])
+
+    async def top(self, board: str, limit: int = 10, offset: int = 0) -> List[Tuple[int, int]]:
+        """(user_id, score) best first; beyond the cached top-N from indexed SQL"""
+        self._roll_week()
+        if offset + limit <= self.top_n:
+            return self.boards[board].top(offset + limit)[offset:]
+        async with aiosqlite.connect(self.db_path) as db:
+            if board == WEEKLY_BOARD:
+                cursor = await db.execute(
+                    """SELECT user_id, xp FROM weekly_xp WHERE week = ?
+                       ORDER BY xp DESC, user_id LIMIT ? OFFSET ?""",
+                    (self.week, limit, offset)
+                )
+            else:
+                column = PROGRESS_BOARDS[board]
+                cursor = await db.execute(
+                    f"SELECT user_id, {column} FROM user_progress ORDER BY {column} DESC, user_id LIMIT ? OFFSET ?",
+                    (limit, offset)
+                )
+            return [tuple(row) for row in await cursor.fetchall()]
+
+    def get_stats(self) -> Dict:
+        return {"loaded": self.loaded, "week": self.week,
+                "users": {name: len(board) for name, board in self.boards.items()}}
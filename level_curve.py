@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+XP level curve for CraveBreaker
+Level lookups by bisect over precomputed thresholds, with a batch variant
+(NumPy when installed) for recomputing every user's level after a change
+"""
+
+import os
+from bisect import bisect_right
+from typing import List, NamedTuple, Sequence
+
+try:
+    import numpy
+except ImportError:  # optional: pip install numpy (batch recomputes only)
+    numpy = None
+
+DEFAULT_THRESHOLDS = (0, 100, 250, 500, 1000, 1750, 2750, 4000, 5500, 7500, 10000)
+
+
+class LevelInfo(NamedTuple):
+    level: int
+    xp_in_level: int      # XP earned since the current level started
+    xp_to_next: int       # 0 at the maximum level
+    level_span: int       # XP between this level and the next (0 at max)
+    is_max: bool
+
+
+class LevelCurve:
+    """Levels from sorted XP thresholds
+
+    Level = number of thresholds <= xp, i.e. bisect_right, which matches the
+    original linear scan: 0 XP is level 1, 10000 XP is level 11 (the max).
+    `extra_levels` appends thresholds past the last one, each gap `growth`
+    times the previous, so the curve can be extended from configuration.
+    """
+
+    def __init__(self, thresholds: Sequence[int] = DEFAULT_THRESHOLDS,
+                 extra_levels: int = 0, growth: float = 1.25):
+        values = [int(t) for t in thresholds]
+        if not values or values != sorted(values) or len(set(values)) != len(values):
+            raise ValueError("Level thresholds must be strictly increasing")
+        gap = values[-1] - values[-2] if len(values) > 1 else 100
+        for _ in range(extra_levels):
+            gap = int(round(gap * growth))
+            values.append(values[-1] + gap)
+        self.thresholds = tuple(values)
+        self.max_level = len(self.thresholds)
+        self._array = numpy.asarray(self.thresholds, dtype=numpy.int64) if numpy is not None else None
+
+    @classmethod
+    def from_env(cls) -> "LevelCurve":
+        """LEVEL_THRESHOLDS=0,100,...  LEVEL_EXTRA_LEVELS=N  LEVEL_GROWTH=1.25"""
+        spec = os.getenv("LEVEL_THRESHOLDS")
+        thresholds = [int(part) for part in spec.split(",")] if spec else DEFAULT_THRESHOLDS
+        return cls(thresholds, int(os.getenv("LEVEL_EXTRA_LEVELS", "0")),
+                   float(os.getenv("LEVEL_GROWTH", "1.25")))
+
+    def level(self, xp: int) -> int:
+        return bisect_right(self.thresholds, xp)
+
+    def info(self, xp: int) -> LevelInfo:
+        """Level, progress in it and XP to the next level in one lookup"""
+        level = bisect_right(self.thresholds, xp)
+        if level >= self.max_level:
+            return LevelInfo(level, xp - self.thresholds[-1], 0, 0, True)
+        start = self.thresholds[level - 1] if level > 0 else 0
+        end = self.thresholds[level]
+        return LevelInfo(level, xp - start, end - xp, end - start, False)
+
+    def levels(self, xps: Sequence[int]) -> List[int]:
+        """Levels for many XP values at once (vectorized when NumPy is there)"""
+        if self._array is not None:
+            return numpy.searchsorted(self._array, numpy.asarray(xps, dtype=numpy.int64),
+                                      side="right").tolist()
+        return [bisect_right(self.thresholds, xp) for xp in xps]
+
+
+# Global instance
+level_curve = LevelCurve.from_env()
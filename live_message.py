@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Progressively edited Telegram messages for CraveBreaker
+Text that grows while it streams in is pushed with editMessageText, at most
+one edit per interval
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from metrics import registry
+
+# AI_STREAMING=1 streams AI celebrations into the achievement screen
+STREAMING_ENABLED = os.getenv("AI_STREAMING", "").lower() in ("1", "true", "yes")
+# Telegram allows roughly one message edit per second per chat
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+
+MARKDOWN_SPECIAL = str.maketrans("", "", "*_`[]")
+
+stream_edits = registry.counter("live_message_edits_total", "Edits sent for streamed messages")
+stream_coalesced = registry.counter("live_message_updates_coalesced_total",
+                                    "Streamed text updates folded into a later edit")
+
+
+def markdown_safe(text: str) -> str:
+    """Drop Markdown control characters so partial text never breaks parsing"""
+    return text.translate(MARKDOWN_SPECIAL)
+
+
+class LiveMessage:
+    """A sent message whose text is replaced as it grows
+
+    update() only records the newest text and makes sure a flush is
+    scheduled; the flush waits until `interval` has passed since the last
+    edit and then sends whatever is newest. Intermediate versions that
+    arrive in between are never sent. finish() sends the final text.
+    """
+
+    def __init__(self, bot, chat_id, message_id, reply_markup=None,
+                 interval: float = STREAM_EDIT_INTERVAL):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.reply_markup = reply_markup
+        self.interval = interval
+        self.edits = 0
+        self._pending: Optional[str] = None
+        self._sent: Optional[str] = None
+        self._last_edit = 0.0
+        self._flusher: Optional[asyncio.Task] = None
+
+    def update(self, text: str):
+        if self._pending is not None:
+            stream_coalesced.inc()
+        self._pending = text
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending is not None:
+            delay = self._last_edit + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text, self._pending = self._pending, None
+            if text == self._sent:
+                continue
+            self._last_edit = time.monotonic()
+            self._sent = text
+            self.edits += 1
+            stream_edits.inc()
+            await self.bot.edit_message(self.chat_id, self.message_id, text, self.reply_markup)
+
+    async def finish(self, text: str):
+        """Send the final text (still respecting the interval) and wait for it"""
+        self.update(text)
+        await self._flusher
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Non-blocking logging pipeline for CraveBreaker
+Records are queued by the caller and formatted/written by a listener thread
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Dict, Optional
+
+from metrics import registry
+
+# Default sampling for hot-path debug lines (logger name -> kept fraction)
+DEFAULT_SAMPLE_RATES = "simple_bot.trace=0.05"
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+records_dropped = registry.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+records_sampled_out = registry.counter(
+    "log_records_sampled_out_total", "Hot-path log records skipped by sampling"
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DropCountingQueueHandler"] = None
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse 'logger=rate,logger=rate' into a dict"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the extra= fields kept as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records from the configured loggers
+
+    The longest matching logger prefix wins. Warnings and errors are
+    never sampled out.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = dict(sorted(rates.items(), key=lambda item: len(item[0]), reverse=True))
+
+    def rate_for(self, logger_name: str) -> float:
+        for prefix, rate in self.rates.items():
+            if logger_name == prefix or logger_name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        records_sampled_out.inc(logger=record.name)
+        return False
+
+
+class DropCountingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller
+
+    Records are put on a bounded queue as-is: the message is rendered by the
+    listener thread, so a record that is dropped or filtered is never
+    formatted. When the queue is full the record is dropped and counted.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc(level=record.levelname)
+
+
+class _BlockingSentinelListener(logging.handlers.QueueListener):
+    """QueueListener whose stop() waits for room on a full queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(level: Optional[str] = None,
+                  json_format: Optional[bool] = None,
+                  queue_size: Optional[int] = None,
+                  sample_rates: Optional[Dict[str, float]] = None) -> logging.Logger:
+    """Route the root logger through a bounded queue and a listener thread
+
+    Settings default to the LOG_LEVEL, LOG_FORMAT (text|json),
+    LOG_QUEUE_SIZE and LOG_SAMPLE_RATES environment variables.
+    Calling it again replaces the previous pipeline.
+    """
+    global _listener, _queue_handler
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if json_format is None:
+        json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    if queue_size is None:
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", DEFAULT_SAMPLE_RATES))
+
+    shutdown_logging()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = DropCountingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    # Sampled loggers carry debug lines; open them up so the sampler decides
+    for name in sample_rates:
+        logging.getLogger(name).setLevel(logging.DEBUG)
+
+    _listener = _BlockingSentinelListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return root
+
+
+def shutdown_logging():
+    """Stop the listener thread after writing out queued records"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats() -> Dict[str, object]:
+    """Queue depth and drop/sampling counters for status endpoints"""
+    return {
+        "queue_depth": _listener.queue.qsize() if _listener else 0,
+        "dropped": records_dropped.total(),
+        "sampled_out": records_sampled_out.total(),
+    }
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Event loop health monitoring for CraveBreaker
+Loop-lag sampling into a histogram and a watchdog thread that captures the
+route, handler and stack of any step blocking the loop past a threshold
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Frames from files under this directory are the application's own code
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = registry.histogram("event_loop_lag_seconds", "Event loop scheduling lag", LAG_BUCKETS)
+slow_steps_total = registry.counter("event_loop_slow_steps_total", "Steps that blocked the event loop")
+
+
+class LoopMonitor:
+    """Samples loop lag and detects steps that block the loop
+
+    A heartbeat callback re-arms itself every `heartbeat` seconds on the
+    loop. A watchdog thread notices when the heartbeat stops for longer
+    than `slow_threshold` and records what the loop thread is doing: the
+    current task, the route and handler registered for it with step(),
+    the innermost application frame (where the loop is actually stuck)
+    and the stack.
+    """
+
+    def __init__(self, interval: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.5")),
+                 slow_threshold: float = float(os.getenv("SLOW_STEP_THRESHOLD_MS", "100")) / 1000,
+                 heartbeat: float = 0.02, history: int = 50):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.heartbeat = heartbeat
+        self.slow_steps: deque = deque(maxlen=history)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._routes: Dict[asyncio.Task, Tuple[str, Optional[str]]] = {}
+        self._sampler: Optional[asyncio.Task] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None and not self._sampler.done()
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat()
+        self._sampler = asyncio.create_task(self._sample_lag(), name="loop-lag-sampler")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._handle is not None:
+            self._handle.cancel()
+        if self._sampler is not None:
+            self._sampler.cancel()
+            await asyncio.gather(self._sampler, return_exceptions=True)
+            self._sampler = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self.heartbeat, self._beat)
+
+    async def _sample_lag(self):
+        while True:
+            scheduled = self._loop.time()
+            await asyncio.sleep(self.interval)
+            loop_lag.observe(max(self._loop.time() - scheduled - self.interval, 0.0))
+
+    @contextmanager
+    def step(self, route: str, handler: Optional[str] = None):
+        """Label the current task so a stall inside it is attributed to `route`
+
+        `handler` names the code serving the route; without it the task's
+        coroutine is reported, which for a generic dispatcher says little.
+        """
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+        self._routes[task] = (route, handler)
+        try:
+            yield
+        finally:
+            self._routes.pop(task, None)
+
+    def _watch(self):
+        stall: Optional[dict] = None
+        poll = max(self.slow_threshold / 4, 0.005)
+        while not self._stopped.wait(poll):
+            blocked_for = time.monotonic() - self._last_beat - self.heartbeat
+            if blocked_for > self.slow_threshold:
+                if stall is None:
+                    stall = self._capture(blocked_for)
+                else:
+                    stall["blocked_ms"] = round(blocked_for * 1000, 1)
+            elif stall is not None:
+                slow_steps_total.inc(route=stall["route"])
+                logger.warning(f"Event loop blocked for {stall['blocked_ms']} ms "
+                               f"in {stall['handler']} at {stall['frame']} (route {stall['route']})")
+                stall = None
+
+    def _capture(self, blocked_for: float) -> dict:
+        """Snapshot the loop thread; runs on the watchdog thread"""
+        task = asyncio.current_task(self._loop)
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=15) if frame is not None else []
+        route, handler = self._routes.get(task, ("-", None)) if task is not None else ("-", None)
+        if handler is None:
+            if task is not None:
+                handler = getattr(task.get_coro(), "__qualname__", task.get_name())
+            elif frame is not None:
+                handler = f"{frame.f_code.co_filename}:{frame.f_code.co_name}"
+            else:
+                handler = "unknown"
+
+        stall = {
+            "at": time.time(),
+            "blocked_ms": round(blocked_for * 1000, 1),
+            "route": route,
+            "handler": handler,
+            "frame": self._app_frame(frame),
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.slow_steps.append(stall)
+        return stall
+
+    @staticmethod
+    def _app_frame(frame) -> str:
+        """file:function:line of the innermost frame in application code"""
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(APP_DIR) and filename != __file__:
+                return f"{os.path.basename(filename)}:{frame.f_code.co_name}:{frame.f_lineno}"
+            frame = frame.f_back
+        return "-"
+
+    def get_diagnostics(self) -> dict:
+        return {
+            "loop_lag_seconds": loop_lag.snapshot(),
+            "slow_step_threshold_ms": self.slow_threshold * 1000,
+            "slow_steps_total": slow_steps_total.total(),
+            "recent_slow_steps": list(self.slow_steps)[-10:],
+        }
+
+
+# Global instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Event loop policy selection for CraveBreaker
+EVENT_LOOP=auto|uvloop|asyncio; auto uses uvloop when it is installed
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_CHOICES = ("auto", "uvloop", "asyncio")
+
+# Name of the policy installed by install_loop_policy(), shown in /status
+selected_loop_policy = "asyncio"
+
+
+def uvloop_available() -> bool:
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def install_loop_policy(name: Optional[str] = None) -> str:
+    """Install the configured event loop policy and return its name"""
+    global selected_loop_policy
+
+    name = (name or os.getenv("EVENT_LOOP", "auto")).lower()
+    if name not in LOOP_CHOICES:
+        logger.warning(f"Unknown EVENT_LOOP={name!r}, using the default asyncio loop")
+        name = "asyncio"
+
+    if name in ("auto", "uvloop"):
+        if uvloop_available():
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            selected_loop_policy = "uvloop"
+            logger.info("Using uvloop event loop")
+            return selected_loop_policy
+        if name == "uvloop":
+            logger.warning("EVENT_LOOP=uvloop but uvloop is not installed, using asyncio")
+
+    asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
+    selected_loop_policy = "asyncio"
+    return selected_loop_policy
+
+
+def describe_running_loop() -> str:
+    """Class of the loop actually running (for diagnostics)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return "none"
+    return f"{type(loop).__module__}.{type(loop).__name__}"
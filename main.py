@@ -3,195 +3,261 @@
 
 """
 CraveBreaker Telegram Bot - Production Entry Point
-Enhanced version with better error handling and Cloud Run compatibility
+Single asyncio process: HTTP server (health, status, metrics, webhook)
+and the bot run as tasks on the same event loop
 """
 
 import asyncio
+import hmac
+import importlib
 import logging
 import os
 import signal
 import sys
-import threading
 import time
-from flask import Flask, jsonify
-from simple_bot import SimpleCraveBreakerBot
-
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+from contextlib import asynccontextmanager
+
+from ai_client import ai_client
+from async_server import AsyncHttpServer, json_response, text_response
+from logging_setup import get_logging_stats, setup_logging
+from loop_monitor import loop_monitor
+import loop_policy
+from metrics import registry
+from shutdown import CHECKPOINT, CLOSE, DRAIN, FLUSH, STOP_INTAKE, shutdown_coordinator
+from startup import heavy_modules_ready, preload_heavy_modules
+from supervisor import BotSupervisor
+from timer_wheel import timer_wheel
+
+# simple_bot (and with it httpx, aiosqlite and the quote base) is imported
+# lazily off the event loop so the health endpoints can answer right away
+
+# Configure logging (queued, written by a background thread)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# Create Flask app for health checks
-app = Flask(__name__)
+# HTTP server for health checks, metrics and the Telegram webhook
+server = AsyncHttpServer()
 
-# Global bot instance and control variables
+# Global bot instance and the supervisor that owns its single runtime
 bot_instance = None
-bot_task = None
-running = True
+supervisor = None
+started_at = time.time()
+
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "5"))
+
+webhook_updates = registry.counter("webhook_updates_total", "Updates received through the webhook")
+
+
+def use_webhook() -> bool:
+    """Webhook mode is enabled with USE_WEBHOOK=true and a WEBHOOK_URL"""
+    return os.getenv("USE_WEBHOOK", "false").lower() == "true" and bool(os.getenv("WEBHOOK_URL"))
+
 
-@app.route('/')
-def health_check():
+def bot_is_running() -> bool:
+    return supervisor is not None and supervisor.state == "running"
+
+
+def health_payload():
+    return {
+        'status': 'healthy',
+        'service': 'CraveBreaker Telegram Bot',
+        'version': '1.0.0',
+        'bot_running': bot_is_running(),
+        'timestamp': time.time(),
+        'port': os.getenv('PORT', '5000')
+    }
+
+
+def status_payload():
+    return {
+        'bot_status': supervisor.state if supervisor else 'not_started',
+        'bot_token_configured': bool(os.getenv('TELEGRAM_BOT_TOKEN')),
+        'environment': 'production',
+        'modules_loaded': heavy_modules_ready(),
+        'mode': 'webhook' if use_webhook() else 'polling',
+        'event_loop': {
+            'policy': loop_policy.selected_loop_policy,
+            'loop_class': loop_policy.describe_running_loop()
+        },
+        'uptime_seconds': round(time.time() - started_at, 1),
+        'bot': bot_instance.get_runtime_stats() if bot_instance else None,
+        'supervisor': supervisor.get_stats() if supervisor else None,
+        'logging': get_logging_stats(),
+        'port': os.getenv('PORT', '5000'),
+        'host': '0.0.0.0'
+    }
+
+
+@server.route('/')
+async def health_check(request):
     """Health check endpoint for Cloud Run deployment"""
-    try:
-        return jsonify({
-            'status': 'healthy',
-            'service': 'CraveBreaker Telegram Bot',
-            'version': '1.0.0',
-            'bot_running': bot_instance is not None,
-            'timestamp': time.time(),
-            'port': os.getenv('PORT', '5000')
-        }), 200
-    except Exception as e:
-        logger.error(f"Health check error: {e}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
-
-@app.route('/health')
-def health():
+    return json_response(health_payload())
+
+
+@server.route('/health')
+async def health(request):
     """Alternative health check endpoint"""
-    return jsonify({
+    return json_response({
         'status': 'ok',
         'timestamp': time.time(),
         'bot_token_configured': bool(os.getenv('TELEGRAM_BOT_TOKEN'))
-    }), 200
+    })
+
 
-@app.route('/status')
-def status():
+@server.route('/status')
+async def status(request):
     """Detailed bot status endpoint"""
-    global bot_instance
-    return jsonify({
-        'bot_status': 'running' if bot_instance else 'not_started',
-        'bot_token_configured': bool(os.getenv('TELEGRAM_BOT_TOKEN')),
-        'environment': 'production',
-        'port': os.getenv('PORT', '5000'),
-        'host': '0.0.0.0'
-    }), 200
+    return json_response(status_payload())
+
 
-@app.route('/restart')
-def restart_bot():
+@server.route('/metrics')
+async def metrics(request):
+    """Prometheus metrics"""
+    return text_response(registry.render_prometheus(), content_type="text/plain; version=0.0.4")
+
+
+@server.route('/diagnostics')
+async def diagnostics(request):
+    """Event loop lag and recent slow steps with their stacks"""
+    payload = loop_monitor.get_diagnostics()
+    payload['event_loop'] = {
+        'policy': loop_policy.selected_loop_policy,
+        'loop_class': loop_policy.describe_running_loop()
+    }
+    return json_response(payload)
+
+
+@server.route(WEBHOOK_PATH, methods=("POST",))
+async def webhook(request):
+    """Telegram webhook: updates are handled on this loop"""
+    if WEBHOOK_SECRET:
+        token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token, WEBHOOK_SECRET):
+            return json_response({'ok': False, 'error': 'unauthorized'}, 401)
+    if bot_instance is None or not bot_instance.running:
+        # Telegram retries the delivery later (or another replica takes it)
+        return json_response({'ok': False, 'error': 'bot not ready'}, 503)
+
+    update = request.json()
+    webhook_updates.inc()
+    bot_instance.dispatch(update)
+    return json_response({'ok': True})
+
+
+@server.route('/restart')
+async def restart_bot(request):
     """Restart bot endpoint for troubleshooting"""
-    global bot_instance
-    try:
-        if bot_instance:
-            logger.info("Restarting bot...")
-            start_bot_in_thread()
-            return jsonify({'status': 'restarted'}), 200
-        else:
-            start_bot_in_thread()
-            return jsonify({'status': 'started'}), 200
-    except Exception as e:
-        logger.error(f"Error restarting bot: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    if supervisor is None:
+        return json_response({'status': 'error', 'message': 'bot not initialized'}, 503)
+    was_running = supervisor.is_running
+    if was_running:
+        logger.info("Restarting bot...")
+    await supervisor.restart()
+    return json_response({'status': 'restarted' if was_running else 'started'})
+
+
+async def run_bot_runtime():
+    """Run the Telegram bot until cancelled (restarts are up to the supervisor)"""
+    # Check if bot token is configured
+    if not bot_instance.bot_token:
+        logger.error("TELEGRAM_BOT_TOKEN is not configured!")
+        return
+
+    if use_webhook():
+        # Updates arrive through the HTTP server; nothing to poll
+        await bot_instance.set_webhook(os.environ["WEBHOOK_URL"], WEBHOOK_SECRET or None)
+        bot_instance.running = True
+        try:
+            await asyncio.Event().wait()  # until cancelled
+        finally:
+            bot_instance.running = False
+
+    logger.info("Starting CraveBreaker Telegram Bot polling...")
+
+    # Clear any existing webhooks before starting
+    await bot_instance.delete_webhook()
+    await asyncio.sleep(3)  # Wait a bit longer to ensure webhook is cleared
+
+    await bot_instance.run_bot()
 
-async def run_bot_with_enhanced_error_handling():
-    """Run the Telegram bot with enhanced error handling"""
-    global bot_instance, running
-    
+
+@asynccontextmanager
+async def lifespan():
+    """Start the bot's pools and supervisor; on exit run the shutdown phases"""
+    global bot_instance, supervisor
+
+    loop_monitor.start()
+    preload_heavy_modules()
+    simple_bot = await asyncio.to_thread(importlib.import_module, "simple_bot")
+    bot_instance = simple_bot.SimpleCraveBreakerBot()
+    await bot_instance.startup()
+    supervisor = BotSupervisor(bot_instance, run_bot_runtime)
+    # Loaded together with simple_bot; refills AI quotes in the background
+    from quote_pool import quote_pool
+
+    async def stop_intake():
+        bot_instance.stop()
+
+    shutdown_coordinator.register(STOP_INTAKE, "bot", stop_intake)
+    shutdown_coordinator.register(STOP_INTAKE, "quote_pool", quote_pool.stop)
+    shutdown_coordinator.register(STOP_INTAKE, "streak_sweep", bot_instance.streak_sweep.stop)
+    shutdown_coordinator.register(STOP_INTAKE, "timer_wheel", timer_wheel.stop)
+    shutdown_coordinator.register(DRAIN, "bot", lambda: supervisor.stop(DRAIN_TIMEOUT))
+    shutdown_coordinator.register(FLUSH, "user_states", bot_instance.state_store.stop)
+    shutdown_coordinator.register(FLUSH, "quote_decks", bot_instance.quote_decks.stop)
+    shutdown_coordinator.register(CHECKPOINT, "sqlite_wal", bot_instance.checkpoint_wal)
+    shutdown_coordinator.register(CLOSE, "http_pool", bot_instance.aclose)
+    shutdown_coordinator.register(CLOSE, "ai_client", ai_client.aclose)
+    shutdown_coordinator.register(CLOSE, "loop_monitor", loop_monitor.stop)
+
+    quote_pool.start()
+    bot_instance.streak_sweep.start()
+    supervisor.start()
     try:
-        bot_instance = SimpleCraveBreakerBot()
-        
-        # Check if bot token is configured
-        if not bot_instance.bot_token:
-            logger.error("TELEGRAM_BOT_TOKEN is not configured!")
-            return
-            
-        logger.info("Starting CraveBreaker Telegram Bot with enhanced error handling...")
-        
-        # Initialize database
-        await bot_instance.init_db()
-        
-        # Clear any existing webhooks before starting
-        await bot_instance.delete_webhook()
-        await asyncio.sleep(3)  # Wait a bit longer to ensure webhook is cleared
-        
-        # Start bot polling with retry logic
-        retry_count = 0
-        max_retries = 5
-        
-        while running and retry_count < max_retries:
-            try:
-                logger.info(f"Starting bot polling (attempt {retry_count + 1}/{max_retries})")
-                await bot_instance.run_bot()
-                break
-            except Exception as e:
-                retry_count += 1
-                if "409" in str(e) or "Conflict" in str(e):
-                    logger.warning(f"409 Conflict on attempt {retry_count}, clearing webhook and retrying...")
-                    await bot_instance.delete_webhook()
-                    await asyncio.sleep(5 * retry_count)  # Exponential backoff
-                else:
-                    logger.error(f"Bot error on attempt {retry_count}: {e}")
-                    if retry_count >= max_retries:
-                        logger.error("Max retries reached, bot stopping")
-                        break
-                    await asyncio.sleep(10)
-                    
-    except Exception as e:
-        logger.error(f"Critical error in bot: {e}")
+        yield
     finally:
-        bot_instance = None
-
-def run_bot_async():
-    """Run the Telegram bot in async context with better error handling"""
-    # Create new event loop for this thread
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
+        await shutdown_coordinator.run()
+
+
+async def serve():
+    """Run the HTTP server and the bot until SIGTERM/SIGINT"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def on_signal(signum):
+        if stop_event.is_set():
+            logger.warning(f"Received signal {signum} again, exiting immediately")
+            os._exit(1)
+        logger.info(f"Received signal {signum}, shutting down gracefully...")
+        stop_event.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, on_signal, sig)
+
+    port = int(os.environ.get('PORT', 5000))
+    host = '0.0.0.0'  # Always bind to all interfaces for Cloud Run
+
+    # The server starts first so health checks pass while the bot loads
+    await server.start(host, port)
     try:
-        task = loop.create_task(run_bot_with_enhanced_error_handling())
-        loop.run_until_complete(task)
-    except Exception as e:
-        logger.error(f"Error in bot thread: {e}")
+        async with lifespan():
+            await stop_event.wait()
     finally:
-        loop.close()
-
-def start_bot_in_thread():
-    """Start the bot in a separate thread"""
-    bot_thread = threading.Thread(target=run_bot_async, daemon=True)
-    bot_thread.start()
-    logger.info("Bot thread started with enhanced error handling")
-    return bot_thread
-
-def signal_handler(signum, frame):
-    """Handle shutdown signals gracefully"""
-    global running
-    logger.info(f"Received signal {signum}, shutting down gracefully...")
-    running = False
-    sys.exit(0)
+        await server.stop()
+
 
 def main():
     """Main function for deployment compatibility"""
     try:
-        # Register signal handlers for graceful shutdown
-        signal.signal(signal.SIGTERM, signal_handler)
-        signal.signal(signal.SIGINT, signal_handler)
-        
-        # Start the Telegram bot in a separate thread
-        start_bot_in_thread()
-        
-        # Start Flask server for health checks
-        port = int(os.environ.get('PORT', 5000))
-        host = '0.0.0.0'  # Always bind to all interfaces for Cloud Run
-        
-        logger.info(f"Starting CraveBreaker Flask health server on {host}:{port}")
         logger.info(f"Bot token configured: {bool(os.getenv('TELEGRAM_BOT_TOKEN'))}")
         logger.info(f"Environment: {'production' if not os.getenv('DEBUG') else 'development'}")
-        
-        # Start Flask with production settings
-        app.run(
-            host=host, 
-            port=port, 
-            debug=False, 
-            threaded=True,
-            use_reloader=False  # Prevent double startup in development
-        )
+        logger.info(f"Event loop policy: {loop_policy.install_loop_policy()}")
+        asyncio.run(serve())
     except Exception as e:
         logger.error(f"Failed to start application: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
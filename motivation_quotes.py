@@ -6,19 +6,55 @@ Personalized Daily Motivation Quotes Generator for CraveBreaker
 Generates contextual motivational quotes based on user progress and current state
 """
 
+import logging
 import random
 import json
 import os
+import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 
-# OpenAI integration for advanced personalization
-try:
-    from openai import OpenAI
-    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-    openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-except ImportError:
-    openai_client = None
+# OpenAI integration for advanced personalization (async, time-boxed)
+from ai_client import ai_client
+from metrics import registry
+from quote_cache import QuoteBucket, celebration_bucket, quote_bucket, quote_cache
+
+# Batch generation: several quotes per AI call for the background pool
+AI_BATCH_SIZE = int(os.environ.get("AI_BATCH_SIZE", "5"))
+AI_BATCH_BUDGET = float(os.environ.get("AI_BATCH_BUDGET", "15"))
+
+logger = logging.getLogger(__name__)
+
+batch_quotes = registry.counter("ai_batch_quotes_total", "Quotes returned by batch generation by result")
+
+
+def parse_quote_batch(content: Optional[str], count: int) -> List[str]:
+    """Validate a batch response and split it into at most `count` quotes
+    
+    Expects {"quotes": [...]} but also accepts a bare JSON list or, if the
+    model ignored the format, one quote per line.
+    """
+    if not content:
+        return []
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line) for line in content.splitlines()]
+    if isinstance(data, dict):
+        data = data.get("quotes", [])
+    if not isinstance(data, list):
+        return []
+    
+    quotes = []
+    for item in data:
+        quote = item.strip().strip('"«»').strip() if isinstance(item, str) else ""
+        words = len(quote.split())
+        if 5 <= words <= 60 and quote not in quotes:
+            quotes.append(quote)
+        elif quote:
+            batch_quotes.inc(result="rejected")
+    batch_quotes.inc(len(quotes[:count]), result="accepted")
+    return quotes[:count]
 
 class MotivationQuotesGenerator:
     """Generates personalized motivational quotes based on user context"""
@@ -376,27 +412,74 @@ class MotivationQuotesGenerator:
         
         return random.choice(challenges)
     
-    async def get_ai_personalized_quote(self, user_progress: Dict, context: str = "general") -> Optional[str]:
-        """Generate AI-powered personalized quote using OpenAI"""
-        if not openai_client:
+    async def generate_for_bucket(self, bucket: QuoteBucket) -> Optional[str]:
+        """Generate one AI quote for a bucket (no cache); None if unavailable"""
+        if not ai_client.available:
             return None
-            
+        
         try:
-            # Prepare user context for AI
-            level = user_progress.get("level", 1)
-            current_streak = user_progress.get("current_streak", 0)
-            total_interventions = user_progress.get("total_interventions", 0)
-            recent_badges = user_progress.get("recent_badges", [])
+            if bucket.context == "achievement":
+                prompt = self._celebration_prompt(bucket)
+                system = "Ты мотивационный коуч, который празднует достижения людей в борьбе с вредными привычками."
+                max_tokens, temperature = 80, 0.9
+            else:
+                prompt = self._personalized_prompt(bucket)
+                system = "Ты эксперт по мотивационному коучингу. Создаешь персонализированные цитаты для людей, борющихся с вредными привычками."
+                max_tokens, temperature = 100, 0.8
+            
+            return await ai_client.complete(
+                [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
             
-            # Create personalized prompt
-            prompt = f"""Создай мотивационную цитату на русском языке для пользователя приложения по борьбе с вредными привычками.
+        except Exception as e:
+            logger.warning(f"AI quote generation failed for bucket {bucket}: {e}")
+            return None
+    
+    async def generate_batch_for_bucket(self, bucket: QuoteBucket, count: int = AI_BATCH_SIZE) -> List[str]:
+        """Generate up to `count` different quotes for a bucket in one AI call"""
+        if not ai_client.available or count <= 0:
+            return []
+        
+        if bucket.context == "achievement":
+            prompt = self._celebration_prompt(bucket)
+            system = "Ты мотивационный коуч, который празднует достижения людей в борьбе с вредными привычками."
+            tokens_per_quote, temperature = 80, 0.9
+        else:
+            prompt = self._personalized_prompt(bucket)
+            system = "Ты эксперт по мотивационному коучингу. Создаешь персонализированные цитаты для людей, борющихся с вредными привычками."
+            tokens_per_quote, temperature = 100, 0.8
+        
+        # Replace the "create one" closing line with the batch instruction
+        prompt = prompt.rsplit("\n", 1)[0] + f"""
+Создай {count} разных вариантов, не похожих друг на друга.
+Ответ строго в формате JSON: {{"quotes": ["вариант 1", "вариант 2", ...]}}"""
+        
+        content = await ai_client.complete(
+            [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=tokens_per_quote * count + 20,
+            temperature=temperature,
+            budget=AI_BATCH_BUDGET,
+            response_format={"type": "json_object"}
+        )
+        return parse_quote_batch(content, count)
+    
+    def _personalized_prompt(self, bucket: QuoteBucket) -> str:
+        """Prompt for a quote shared by every user in the bucket"""
+        return f"""Создай мотивационную цитату на русском языке для пользователя приложения по борьбе с вредными привычками.
 
 Контекст пользователя:
-- Уровень: {level}
-- Текущая серия дней: {current_streak}
-- Всего успешных интервенций: {total_interventions}
-- Недавние достижения: {', '.join(recent_badges) if recent_badges else 'пока нет'}
-- Ситуация: {context}
+- Уровень: {bucket.level_band}
+- Текущая серия дней: {bucket.streak_band}
+- Последнее достижение: {bucket.badge or 'пока нет'}
+- Ситуация: {bucket.context}
 
 Требования к цитате:
 1. Длина: 20-40 слов
@@ -405,55 +488,20 @@ class MotivationQuotesGenerator:
 4. Формат: одно предложение с эмодзи в начале
 5. Избегай банальностей, будь оригинальным
 
+Не упоминай точные числа - цитата будет показана разным пользователям с похожим прогрессом.
+
 Примеры хороших цитат:
-"🌟 На уровне {level} ты уже не новичок - каждое твоё решение формирует нового себя!"
-"🚀 {current_streak} дней подряд - это не случайность, это твоя новая сила!"
+"🌟 Ты уже не новичок - каждое твоё решение формирует нового себя!"
+"🚀 Дни подряд без срывов - это не случайность, это твоя новая сила!"
 
 Создай уникальную цитату именно для этого пользователя:"""
-
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-                messages=[
-                    {"role": "system", "content": "Ты эксперт по мотивационному коучингу. Создаешь персонализированные цитаты для людей, борющихся с вредными привычками."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=100,
-                temperature=0.8
-            )
-            
-            ai_quote = response.choices[0].message.content
-            return ai_quote.strip() if ai_quote else None
-            
-        except Exception as e:
-            print(f"Error generating AI quote: {e}")
-            return None
-    
-    async def get_enhanced_personalized_quote(self, user_progress: Dict, context: str = "general") -> str:
-        """Get enhanced personalized quote with AI fallback to curated quotes"""
-        # Try AI-generated quote first
-        if openai_client:
-            ai_quote = await self.get_ai_personalized_quote(user_progress, context)
-            if ai_quote:
-                stats_addition = self._get_stats_addition(user_progress)
-                return f"{ai_quote}\n\n{stats_addition}"
-        
-        # Fallback to curated contextual quotes
-        return self.get_contextual_quote(user_progress, context)
     
-    async def get_ai_achievement_celebration(self, badge_name: str, user_progress: Dict) -> Optional[str]:
-        """Generate AI-powered achievement celebration message"""
-        if not openai_client:
-            return None
-            
-        try:
-            level = user_progress.get("level", 1)
-            total_interventions = user_progress.get("total_interventions", 0)
-            
-            prompt = f"""Создай поздравительное сообщение на русском языке для пользователя, который получил достижение в приложении по борьбе с вредными привычками.
+    def _celebration_prompt(self, bucket: QuoteBucket) -> str:
+        """Prompt for an achievement celebration"""
+        return f"""Создай поздравительное сообщение на русском языке для пользователя, который получил достижение в приложении по борьбе с вредными привычками.
 
-Достижение: {badge_name}
-Уровень пользователя: {level}
-Всего интервенций: {total_interventions}
+Достижение: {bucket.badge}
+Уровень пользователя: {bucket.level_band}
 
 Требования:
 1. Длина: 15-30 слов
@@ -467,23 +515,61 @@ class MotivationQuotesGenerator:
 "🏆 Неделя дисциплины! Ты доказал себе, что можешь всё!"
 
 Создай уникальное поздравление:"""
-
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",  # the newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-                messages=[
-                    {"role": "system", "content": "Ты мотивационный коуч, который празднует достижения людей в борьбе с вредными привычками."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=80,
-                temperature=0.9
-            )
-            
-            ai_message = response.choices[0].message.content
-            return ai_message.strip() if ai_message else None
-            
-        except Exception as e:
-            print(f"Error generating AI achievement message: {e}")
+    
+    async def _cached_generate(self, bucket: QuoteBucket, user_id=None) -> Optional[str]:
+        cached = quote_cache.get(bucket, user_id)
+        if cached:
+            return cached
+        quote = await self.generate_for_bucket(bucket)
+        if quote:
+            quote_cache.put(bucket, quote, user_id)
+        return quote
+    
+    async def get_ai_personalized_quote(self, user_progress: Dict, context: str = "general",
+                                        user_id=None) -> Optional[str]:
+        """Generate AI-powered personalized quote using OpenAI
+        
+        Quotes are shared by users in the same bucket (level band, streak band,
+        context, latest badge), so the prompt only sees the bands.
+        """
+        if not ai_client.available:
             return None
+        return await self._cached_generate(quote_bucket(user_progress, context), user_id)
+    
+    async def get_enhanced_personalized_quote(self, user_progress: Dict, context: str = "general",
+                                              user_id=None) -> str:
+        """Get enhanced personalized quote with AI fallback to curated quotes"""
+        # Try AI-generated quote first; None means no key, timeout or API error
+        if ai_client.available:
+            ai_quote = await self.get_ai_personalized_quote(user_progress, context, user_id)
+            if ai_quote:
+                stats_addition = self._get_stats_addition(user_progress)
+                return f"{ai_quote}\n\n{stats_addition}"
+        
+        # Fallback to curated contextual quotes
+        return self.get_contextual_quote(user_progress, context)
+    
+    async def get_ai_achievement_celebration(self, badge_name: str, user_progress: Dict,
+                                             user_id=None) -> Optional[str]:
+        """Generate AI-powered achievement celebration message"""
+        if not ai_client.available:
+            return None
+        return await self._cached_generate(celebration_bucket(user_progress, badge_name), user_id)
+    
+    async def stream_achievement_celebration(self, badge_name: str, user_progress: Dict) -> AsyncIterator[str]:
+        """Stream an AI celebration as text deltas; yields nothing if AI is unavailable"""
+        if not ai_client.available:
+            return
+        bucket = celebration_bucket(user_progress, badge_name)
+        async for delta in ai_client.stream(
+            [
+                {"role": "system", "content": "Ты мотивационный коуч, который празднует достижения людей в борьбе с вредными привычками."},
+                {"role": "user", "content": self._celebration_prompt(bucket)}
+            ],
+            max_tokens=80,
+            temperature=0.9
+        ):
+            yield delta
 
 # Global instance
-motivation_generator = MotivationQuotesGenerator()
\ No newline at end of file
+motivation_generator = MotivationQuotesGenerator()
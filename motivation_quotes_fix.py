@@ -10,6 +10,8 @@ import random
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from quote_decks import Permutations
+
 class MotivationGenerator:
     def __init__(self):
         # URD требование: минимум 100 утренних цитат
@@ -164,45 +166,25 @@ class MotivationGenerator:
             "🌊 Плавность: Двигайся сегодня на 20% медленнее, чем обычно."
         ]
         
-        # Последние показанные цитаты для избежания повторов
-        self.last_morning_quotes = []
-        self.last_evening_quotes = []
-        self.max_recent_quotes = 20  # URD: избегать повторов
+        # Общие колоды для вызовов без пользователя; у пользователей свои (quote_decks)
+        self.shared_permutations = Permutations(max_orders=2)
+        self.shared_decks = {
+            "morning": self.shared_permutations.shuffled(len(self.morning_quotes)),
+            "evening_reflection": self.shared_permutations.shuffled(len(self.evening_quotes)),
+        }
+        
+    def get_quote_pool(self, context: str = "morning") -> List[str]:
+        """Список цитат для контекста: вечерние для рефлексии, иначе утренние"""
+        return self.evening_quotes if context == "evening_reflection" else self.morning_quotes
         
     def get_enhanced_personalized_quote(self, progress: Dict, context: str = "morning") -> str:
         """
         ИСПРАВЛЕНО: Всегда возвращает цитаты из локальной базы без зависимости от OpenAI
         URD требование: разные цитаты для утра и вечера, без повторов
+        Выбор за O(1): перемешанная колода, повторов нет, пока колода не пройдена
         """
-        if context == "evening_reflection":
-            quotes_pool = [q for q in self.evening_quotes if q not in self.last_evening_quotes]
-            if not quotes_pool:  # Если все использованы, очищаем историю
-                self.last_evening_quotes.clear()
-                quotes_pool = self.evening_quotes
-                
-            quote = random.choice(quotes_pool)
-            self.last_evening_quotes.append(quote)
-            
-            # Ограничиваем размер истории
-            if len(self.last_evening_quotes) > self.max_recent_quotes:
-                self.last_evening_quotes.pop(0)
-                
-            return quote
-        else:
-            # Утренние цитаты
-            quotes_pool = [q for q in self.morning_quotes if q not in self.last_morning_quotes]
-            if not quotes_pool:  # Если все использованы, очищаем историю
-                self.last_morning_quotes.clear()
-                quotes_pool = self.morning_quotes
-                
-            quote = random.choice(quotes_pool)
-            self.last_morning_quotes.append(quote)
-            
-            # Ограничиваем размер истории
-            if len(self.last_morning_quotes) > self.max_recent_quotes:
-                self.last_morning_quotes.pop(0)
-                
-            return quote
+        deck = "evening_reflection" if context == "evening_reflection" else "morning"
+        return self.get_quote_pool(deck)[self.shared_permutations.draw(self.shared_decks[deck])]
     
     async def get_ai_achievement_celebration(self, badge_name: str, progress: Dict) -> Optional[str]:
         """
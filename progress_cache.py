@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Read-through cache of user progress for CraveBreaker
+Bounded LRU with TTL in front of user_progress; writes go through it and
+bump a per-user version so a slow read can never install stale data, and
+are compare-and-set on user_progress.row_version so they never overwrite a
+change made by another process
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Tuple
+
+from metrics import registry
+
+PROGRESS_CACHE_SIZE = int(os.getenv("PROGRESS_CACHE_SIZE", "10000"))
+PROGRESS_CACHE_TTL = float(os.getenv("PROGRESS_CACHE_TTL", "300"))
+# Read-modify-write attempts before a progress write gives up on conflicts
+PROGRESS_WRITE_ATTEMPTS = int(os.getenv("PROGRESS_WRITE_ATTEMPTS", "3"))
+
+cache_requests = registry.counter("progress_cache_requests_total", "Progress cache reads by result")
+cache_evictions = registry.counter("progress_cache_evictions_total", "Progress cache evictions by reason")
+write_conflicts = registry.counter("progress_write_conflicts_total",
+                                   "Progress writes retried because the row changed since it was read")
+
+# user_id -> progress dict, read from the database
+Loader = Callable[[int], Awaitable[Dict]]
+
+
+class ProgressConflict(Exception):
+    """user_progress.row_version moved on since the progress was read"""
+
+
+async def ensure_version_column(db):
+    """Add user_progress.row_version to databases created before it
+
+    Every writer of user_progress sets `row_version = row_version + 1`:
+    the bot (compare-and-set), the streak sweep, the re-evaluation job
+    and ProgressEventLog.rebuild.
+    """
+    cursor = await db.execute("PRAGMA table_info(user_progress)")
+    if "row_version" not in {row[1] for row in await cursor.fetchall()}:
+        await db.execute("ALTER TABLE user_progress ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+
+
+async def retry_on_conflict(operation: Callable[[], Awaitable], attempts: int = PROGRESS_WRITE_ATTEMPTS):
+    """Run a read-modify-write of progress again while it hits ProgressConflict
+
+    The writer invalidates the cached row before raising, so the next
+    attempt reads what the other process wrote.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await operation()
+        except ProgressConflict:
+            if attempt == attempts:
+                raise
+            write_conflicts.inc()
+
+
+class ProgressCache:
+    """user_id -> (progress, version, expires_at), most recently used last
+
+    get() returns a copy, so handlers can modify what they read. Misses
+    for the same user share one load. Versions come from one counter for
+    the whole cache, so a (user, version) pair is never reused, even
+    after eviction. Every put(), invalidate() and installed load takes a
+    new version. A load installs its result only if the user's version
+    is still the one it started with, so data read before a concurrent
+    write never replaces that write.
+    """
+
+    def __init__(self, loader: Loader, max_users: int = PROGRESS_CACHE_SIZE,
+                 ttl: float = PROGRESS_CACHE_TTL):
+        self.loader = loader
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Dict, int, float]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._clock = 0
+        self._loads: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        registry.gauge("progress_cache_users", "Users in the progress cache", callback=lambda: len(self._entries))
+        registry.gauge("progress_cache_hit_ratio", "Progress cache hit ratio", callback=self.hit_ratio)
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0.0
+
+    def version(self, user_id: int) -> int:
+        """Changes whenever the user's progress is written"""
+        return self._versions.get(user_id, 0)
+
+    def _next_version(self, user_id: int) -> int:
+        self._clock += 1
+        self._versions[user_id] = self._clock
+        return self._clock
+
+    def _install(self, user_id: int, progress: Dict, version: int):
+        self._entries[user_id] = (dict(progress), version, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            evicted, _ = self._entries.popitem(last=False)
+            if evicted not in self._loads:
+                self._versions.pop(evicted, None)
+            self.evictions += 1
+            cache_evictions.inc(reason="size")
+
+    async def get(self, user_id: int) -> Dict:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            progress, version, expires_at = entry
+            if expires_at > time.monotonic() and version == self.version(user_id):
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                cache_requests.inc(result="hit")
+                return dict(progress)
+            del self._entries[user_id]
+            cache_evictions.inc(reason="ttl")
+            self.evictions += 1
+
+        self.misses += 1
+        cache_requests.inc(result="miss")
+        load = self._loads.get(user_id)
+        if load is None:
+            load = asyncio.ensure_future(self._load(user_id))
+            self._loads[user_id] = load
+            load.add_done_callback(lambda _: self._loads.pop(user_id, None))
+        return dict(await asyncio.shield(load))
+
+    async def _load(self, user_id: int) -> Dict:
+        version = self.version(user_id)
+        progress = await self.loader(user_id)
+        if self.version(user_id) == version:
+            self._install(user_id, progress, self._next_version(user_id))
+        return progress
+
+    def put(self, user_id: int, progress: Dict):
+        """Write-through: call after the database write has committed"""
+        self._install(user_id, progress, self._next_version(user_id))
+
+    def invalidate(self, user_id: int):
+        """Drop a user changed outside put() (bulk jobs, sweeps)"""
+        if user_id in self._entries or user_id in self._loads:
+            self._next_version(user_id)
+            self._entries.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        return {"users": len(self._entries), "max_users": self.max_users, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "hit_ratio": self.hit_ratio(),
+                "evictions": self.evictions}
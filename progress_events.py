@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Append-only progress event log for CraveBreaker
+Every change to a user's progress is recorded as an event; periodic
+per-user snapshots let progress be rebuilt as snapshot + event tail
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from level_curve import level_curve
+from metrics import registry
+
+# A snapshot is written once this many events have piled up after the last one
+PROGRESS_SNAPSHOT_EVERY = int(os.getenv("PROGRESS_SNAPSHOT_EVERY", "50"))
+
+INTERVENTION = "intervention"   # one successful intervention (+technique, +XP)
+BADGE = "badge"                 # badge awarded (+XP)
+STREAK_RESET = "streak_reset"   # streak expired (nightly sweep)
+XP_ADJUST = "xp_adjust"         # XP corrected, e.g. a badge reward re-priced
+
+events_appended = registry.counter("progress_events_appended_total", "Progress events appended by type")
+snapshots_written = registry.counter("progress_snapshots_written_total", "Progress snapshots written")
+
+EMPTY_PROGRESS = {
+    "level": 1, "xp": 0, "total_interventions": 0, "current_streak": 0,
+    "longest_streak": 0, "last_intervention_date": None, "badges_earned": [],
+    "technique_counts": {}, "weekend_interventions": 0,
+    "late_night_interventions": 0, "early_morning_interventions": 0,
+    "coaching_used": False,
+}
+
+
+class ProgressEvent(NamedTuple):
+    event_type: str
+    technique: Optional[str] = None
+    xp_delta: int = 0
+    badge_id: Optional[str] = None
+    created_at: Optional[str] = None  # local ISO time, the bot's notion of "today"
+
+    @classmethod
+    def now(cls, event_type: str, **fields) -> "ProgressEvent":
+        return cls(event_type, created_at=datetime.now().isoformat(timespec="seconds"), **fields)
+
+
+def normalize(progress: Dict) -> Dict:
+    """Progress dict with badges_earned / technique_counts decoded from JSON"""
+    state = dict(EMPTY_PROGRESS)
+    state.update((key, progress[key]) for key in EMPTY_PROGRESS if key in progress)
+    if isinstance(state["badges_earned"], str):
+        state["badges_earned"] = json.loads(state["badges_earned"])
+    if isinstance(state["technique_counts"], str):
+        state["technique_counts"] = json.loads(state["technique_counts"])
+    state["coaching_used"] = bool(state["coaching_used"])
+    return state
+
+
+def apply_event(state: Dict, event: ProgressEvent) -> Dict:
+    """Fold one event into a normalized progress dict (same rules as the bot)"""
+    if event.event_type == INTERVENTION:
+        day = datetime.fromisoformat(event.created_at).date()
+        if state["last_intervention_date"] is None:
+            state["current_streak"] = 1
+            state["longest_streak"] = 1
+        else:
+            days_diff = (day - datetime.fromisoformat(state["last_intervention_date"]).date()).days
+            if days_diff == 1:
+                state["current_streak"] += 1
+                state["longest_streak"] = max(state["longest_streak"], state["current_streak"])
+            elif days_diff > 1:
+                state["current_streak"] = 1
+        state["last_intervention_date"] = day.isoformat()
+        state["total_interventions"] += 1
+        counts = state["technique_counts"]
+        counts[event.technique] = counts.get(event.technique, 0) + 1
+    elif event.event_type == BADGE:
+        if event.badge_id not in state["badges_earned"]:
+            state["badges_earned"].append(event.badge_id)
+    elif event.event_type == STREAK_RESET:
+        state["current_streak"] = 0
+    state["xp"] = max(state["xp"] + event.xp_delta, 0)
+    state["level"] = level_curve.level(state["xp"])
+    return state
+
+
+class ProgressEventLog:
+    """progress_events (append-only) plus progress_snapshots
+
+    The bot keeps writing user_progress as its read model and appends the
+    events behind each write in the same transaction. A user's first
+    append, and every `snapshot_every` events after that, stores the
+    progress row being written as a snapshot. materialize() folds the
+    events after the snapshot into it, so rebuilding a user costs at most
+    `snapshot_every` events no matter how long their history is.
+    """
+
+    def __init__(self, snapshot_every: int = PROGRESS_SNAPSHOT_EVERY):
+        self.snapshot_every = snapshot_every
+
+    @staticmethod
+    async def create_tables(db):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS progress_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                technique TEXT,
+                xp_delta INTEGER NOT NULL DEFAULT 0,
+                badge_id TEXT,
+                created_at TEXT NOT NULL
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_progress_events_user ON progress_events (user_id, id)"
+        )
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS progress_snapshots (
+                user_id INTEGER PRIMARY KEY,
+                last_event_id INTEGER NOT NULL,
+                tail_length INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    async def _insert(self, db, user_id: int, event: ProgressEvent) -> int:
+        cursor = await db.execute(
+            """INSERT INTO progress_events (user_id, event_type, technique, xp_delta, badge_id, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (user_id, event.event_type, event.technique, event.xp_delta, event.badge_id,
+             event.created_at or datetime.now().isoformat(timespec="seconds"))
+        )
+        events_appended.inc(type=event.event_type)
+        return cursor.lastrowid
+
+    async def append(self, db, user_id: int, events: Sequence[ProgressEvent], progress: Dict):
+        """Record `events` that produced `progress` (caller commits)"""
+        if not events:
+            return
+        last_event_id = 0
+        for event in events:
+            last_event_id = await self._insert(db, user_id, event)
+
+        cursor = await db.execute("SELECT tail_length FROM progress_snapshots WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        if row is None or row[0] + len(events) >= self.snapshot_every:
+            await db.execute(
+                """INSERT INTO progress_snapshots (user_id, last_event_id, tail_length, state)
+                   VALUES (?, ?, 0, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET last_event_id = excluded.last_event_id,
+                   tail_length = 0, state = excluded.state, created_at = CURRENT_TIMESTAMP""",
+                (user_id, last_event_id, json.dumps(normalize(progress), ensure_ascii=False))
+            )
+            snapshots_written.inc()
+        else:
+            await db.execute(
+                "UPDATE progress_snapshots SET tail_length = tail_length + ? WHERE user_id = ?",
+                (len(events), user_id)
+            )
+
+    async def append_many(self, db, events: Iterable[Tuple[int, ProgressEvent]]):
+        """Bulk append for sweeps and jobs; snapshots are left to later writes"""
+        rows, tails = [], {}
+        for user_id, event in events:
+            rows.append((user_id, event.event_type, event.technique, event.xp_delta, event.badge_id,
+                         event.created_at or datetime.now().isoformat(timespec="seconds")))
+            tails[user_id] = tails.get(user_id, 0) + 1
+            events_appended.inc(type=event.event_type)
+        if not rows:
+            return
+        await db.executemany(
+            """INSERT INTO progress_events (user_id, event_type, technique, xp_delta, badge_id, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            rows
+        )
+        await db.executemany(
+            "UPDATE progress_snapshots SET tail_length = tail_length + ? WHERE user_id = ?",
+            [(count, user_id) for user_id, count in tails.items()]
+        )
+
+    async def events(self, db, user_id: int, after_id: int = 0) -> List[ProgressEvent]:
+        cursor = await db.execute(
+            """SELECT event_type, technique, xp_delta, badge_id, created_at FROM progress_events
+               WHERE user_id = ? AND id > ? ORDER BY id""",
+            (user_id, after_id)
+        )
+        return [ProgressEvent(*row) for row in await cursor.fetchall()]
+
+    async def materialize(self, db, user_id: int) -> Optional[Dict]:
+        """Snapshot + event tail; None for users with no snapshot yet"""
+        cursor = await db.execute(
+            "SELECT last_event_id, state FROM progress_snapshots WHERE user_id = ?", (user_id,)
+        )
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        state = normalize(json.loads(row[1]))
+        for event in await self.events(db, user_id, row[0]):
+            apply_event(state, event)
+        return state
+
+    async def rebuild(self, db, user_id: int) -> Optional[Dict]:
+        """Rewrite the user's user_progress row from the log (caller commits)"""
+        state = await self.materialize(db, user_id)
+        if state is None:
+            return None
+        await db.execute(
+            """UPDATE user_progress SET level = ?, xp = ?, total_interventions = ?, current_streak = ?,
+               longest_streak = ?, last_intervention_date = ?, badges_earned = ?, technique_counts = ?,
+               row_version = row_version + 1, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?""",
+            (state["level"], state["xp"], state["total_interventions"], state["current_streak"],
+             state["longest_streak"], state["last_intervention_date"], json.dumps(state["badges_earned"]),
+             json.dumps(state["technique_counts"]), user_id)
+        )
+        return state
+
+
+# Global instance
+progress_log = ProgressEventLog()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compact per-user progress record for CraveBreaker
+Badges as a bitmask over the fixed badge registry, technique counts in a
+small fixed array, and a compact binary form (to_blob / from_blob)
+
+Usage: python progress_record.py [--users 10000]  (memory per cached user)
+"""
+
+import argparse
+import json
+import struct
+import tracemalloc
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, Optional
+
+from badge_rules import BADGE_RULES
+from level_curve import level_curve
+
+# Bit i is BADGE_RULES[i]: the registry is append-only, never reorder it
+BADGE_IDS = tuple(rule.id for rule in BADGE_RULES)
+BADGE_BITS = {badge_id: 1 << bit for bit, badge_id in enumerate(BADGE_IDS)}
+
+# Technique keys the bot records (process_intervention_success); anything
+# else goes to a rarely used overflow dict
+TECHNIQUE_KEYS = ("general", "impulse", "emergency", "breathing", "meditation", "game", "coaching")
+TECHNIQUE_SLOTS = {key: slot for slot, key in enumerate(TECHNIQUE_KEYS)}
+
+BLOB_VERSION = 1
+# version, xp, total_interventions, current_streak, longest_streak, last day
+# (date ordinal, 0 = never), badge mask length, technique slot count
+BLOB_HEADER = struct.Struct("<BIIIIIBB")
+# Counters are stored unsigned 32-bit; values outside are clamped, never an error
+U32_MAX = 0xFFFFFFFF
+
+
+def _u32(value) -> int:
+    return min(max(int(value or 0), 0), U32_MAX)
+
+
+class BadgeView:
+    """List-like view of a record's badge mask: O(1) `in`, append() sets a bit"""
+    __slots__ = ("_record",)
+
+    def __init__(self, record: "ProgressRecord"):
+        self._record = record
+
+    def __contains__(self, badge_id) -> bool:
+        bit = BADGE_BITS.get(badge_id)
+        return bit is not None and bool(self._record.badges & bit)
+
+    def __iter__(self) -> Iterator[str]:
+        mask = self._record.badges
+        return (badge_id for badge_id, bit in BADGE_BITS.items() if mask & bit)
+
+    def __len__(self) -> int:
+        return self._record.badges.bit_count()
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def append(self, badge_id: str):
+        self._record.badges |= BADGE_BITS[badge_id]
+
+
+class ProgressRecord:
+    """One user's gamification progress in a few machine words
+
+    Drop-in for gamification.UserProgress: badges_earned, technique_counts
+    and last_intervention_date are properties over the compact fields.
+    Badge order is registry order, not the order they were earned in.
+    """
+    __slots__ = ("user_id", "xp", "total_interventions", "current_streak", "longest_streak",
+                 "last_day", "badges", "techniques", "extra_techniques")
+
+    def __init__(self, user_id: int, level: int = 1, xp: int = 0, total_interventions: int = 0,
+                 current_streak: int = 0, longest_streak: int = 0,
+                 last_intervention_date: Optional[str] = None,
+                 badges_earned: Optional[Iterable[str]] = None,
+                 technique_counts: Optional[Dict[str, int]] = None):
+        self.user_id = user_id
+        self.xp = xp  # `level` is accepted for compatibility; it is derived from xp
+        self.total_interventions = total_interventions
+        self.current_streak = current_streak
+        self.longest_streak = longest_streak
+        self.last_intervention_date = last_intervention_date
+        self.badges = 0
+        for badge_id in badges_earned or ():
+            self.badges |= BADGE_BITS.get(badge_id, 0)
+        self.techniques = array("I", bytes(4 * len(TECHNIQUE_KEYS)))
+        self.extra_techniques: Optional[Dict[str, int]] = None
+        for technique, count in (technique_counts or {}).items():
+            self.add_technique(technique, count)
+
+    @property
+    def level(self) -> int:
+        return level_curve.level(self.xp)
+
+    @property
+    def last_intervention_date(self) -> Optional[str]:
+        return date.fromordinal(self.last_day).isoformat() if self.last_day else None
+
+    @last_intervention_date.setter
+    def last_intervention_date(self, value: Optional[str]):
+        self.last_day = date.fromisoformat(value[:10]).toordinal() if value else 0
+
+    @property
+    def badges_earned(self) -> BadgeView:
+        return BadgeView(self)
+
+    @property
+    def technique_counts(self) -> Dict[str, int]:
+        counts = {key: count for key, count in zip(TECHNIQUE_KEYS, self.techniques) if count}
+        if self.extra_techniques:
+            counts.update(self.extra_techniques)
+        return counts
+
+    def add_technique(self, technique: str, count: int = 1):
+        slot = TECHNIQUE_SLOTS.get(technique)
+        if slot is not None:
+            self.techniques[slot] = _u32(self.techniques[slot] + count)
+        else:
+            if self.extra_techniques is None:
+                self.extra_techniques = {}
+            self.extra_techniques[technique] = self.extra_techniques.get(technique, 0) + count
+
+    # --- bot progress dicts (JSON strings inside, as stored in user_progress) ---
+
+    @classmethod
+    def from_progress(cls, user_id: int, progress: Dict) -> "ProgressRecord":
+        badges = progress.get("badges_earned") or "[]"
+        techniques = progress.get("technique_counts") or "{}"
+        return cls(user_id, xp=progress.get("xp", 0),
+                   total_interventions=progress.get("total_interventions", 0),
+                   current_streak=progress.get("current_streak", 0),
+                   longest_streak=progress.get("longest_streak", 0),
+                   last_intervention_date=progress.get("last_intervention_date"),
+                   badges_earned=json.loads(badges) if isinstance(badges, str) else badges,
+                   technique_counts=json.loads(techniques) if isinstance(techniques, str) else techniques)
+
+    # --- binary form ---
+
+    def to_blob(self) -> bytes:
+        mask_length = (self.badges.bit_length() + 7) // 8
+        blob = BLOB_HEADER.pack(BLOB_VERSION, _u32(self.xp), _u32(self.total_interventions),
+                                _u32(self.current_streak), _u32(self.longest_streak), self.last_day,
+                                mask_length, len(self.techniques))
+        blob += self.badges.to_bytes(mask_length, "little") + self.techniques.tobytes()
+        if self.extra_techniques:
+            blob += json.dumps(self.extra_techniques, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return blob
+
+    @classmethod
+    def from_blob(cls, user_id: int, blob: bytes) -> "ProgressRecord":
+        (version, xp, total, current, longest, last_day,
+         mask_length, slots) = BLOB_HEADER.unpack_from(blob)
+        if version != BLOB_VERSION:
+            raise ValueError(f"Unknown progress blob version {version}")
+        record = cls(user_id, xp=xp, total_interventions=total, current_streak=current,
+                     longest_streak=longest)
+        record.last_day = last_day
+        offset = BLOB_HEADER.size
+        record.badges = int.from_bytes(blob[offset:offset + mask_length], "little")
+        offset += mask_length
+        stored = array("I", blob[offset:offset + 4 * slots])
+        # Slots added to TECHNIQUE_KEYS later start at 0 for old blobs
+        record.techniques[:min(slots, len(TECHNIQUE_KEYS))] = stored[:len(TECHNIQUE_KEYS)]
+        offset += 4 * slots
+        if offset < len(blob):
+            record.extra_techniques = json.loads(blob[offset:].decode("utf-8"))
+        return record
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ProgressRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (f"ProgressRecord(user_id={self.user_id}, xp={self.xp}, level={self.level}, "
+                f"streak={self.current_streak}, badges={len(self.badges_earned)})")
+
+
+def measure_memory(users: int = 10000) -> Dict[str, float]:
+    """Bytes per cached user: bot progress dict vs this record (tracemalloc)"""
+    sample = {"level": 5, "xp": 1280, "total_interventions": 87, "current_streak": 6,
+              "longest_streak": 14, "last_intervention_date": "2026-10-18",
+              "badges_earned": json.dumps(["first_intervention", "interventions_10", "interventions_50",
+                                           "streak_3", "streak_7", "streak_14"]),
+              "technique_counts": json.dumps({"impulse": 60, "emergency": 20, "general": 7}),
+              "weekend_interventions": 0, "late_night_interventions": 0,
+              "early_morning_interventions": 0, "coaching_used": False}
+
+    def per_user(build) -> float:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [build(user_id) for user_id in range(users)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return round((after - before) / users, 1)
+
+    encoded = json.dumps(sample)
+
+    def as_dict(user_id):
+        progress = json.loads(encoded)  # fresh strings per user, as rows from SQLite are
+        progress["xp"] += user_id
+        return progress
+
+    def as_parsed(user_id):
+        progress = as_dict(user_id)
+        progress["badges_earned"] = json.loads(progress["badges_earned"])
+        progress["technique_counts"] = json.loads(progress["technique_counts"])
+        return progress
+
+    def as_record(user_id):
+        record = ProgressRecord.from_progress(user_id, sample)
+        record.xp += user_id
+        return record
+
+    return {
+        "progress_dict_bytes": per_user(as_dict),
+        "parsed_dict_bytes": per_user(as_parsed),
+        "record_bytes": per_user(as_record),
+        "blob_bytes": len(as_record(0).to_blob()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(measure_memory(args.users), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bucketed cache for AI-generated quotes
+Users with similar progress share generated quotes: keys are level band,
+streak band, context and badge rather than exact numbers
+"""
+
+import random
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import registry
+
+# Lower bounds of each band; the last band is open-ended
+LEVEL_BANDS = (1, 3, 5, 8)
+STREAK_BANDS = (0, 1, 3, 7, 14, 30)
+
+cache_lookups = registry.counter("quote_cache_lookups_total", "Quote cache lookups by result")
+
+
+class QuoteBucket(NamedTuple):
+    """Cache key; the band labels are also what the prompt is built from"""
+    level_band: str
+    streak_band: str
+    context: str
+    badge: str = ""
+
+
+def band_label(value: int, bounds: Tuple[int, ...]) -> str:
+    """'3-4' style label of the band containing value ('8+' for the last one)"""
+    index = max(bisect_right(bounds, value) - 1, 0)
+    if index == len(bounds) - 1:
+        return f"{bounds[index]}+"
+    low, high = bounds[index], bounds[index + 1] - 1
+    return str(low) if low == high else f"{low}-{high}"
+
+
+def quote_bucket(user_progress: Dict, context: str = "general", badge: Optional[str] = None) -> QuoteBucket:
+    if badge is None:
+        recent = user_progress.get("recent_badges") or []
+        badge = recent[-1] if recent else ""
+    return QuoteBucket(
+        band_label(user_progress.get("level", 1) or 1, LEVEL_BANDS),
+        band_label(user_progress.get("current_streak", 0) or 0, STREAK_BANDS),
+        context,
+        badge,
+    )
+
+
+def celebration_bucket(user_progress: Dict, badge: str) -> QuoteBucket:
+    """Celebrations depend on the badge and level only, not on the streak"""
+    return QuoteBucket(band_label(user_progress.get("level", 1) or 1, LEVEL_BANDS), "", "achievement", badge)
+
+
+class QuoteCache:
+    """LRU over buckets, TTL per quote, no immediate repeat per user
+
+    Each bucket keeps up to `per_bucket` quotes. A lookup returns a random
+    live quote other than the one this user saw last; if that is the only
+    one left it counts as a miss so the caller generates a fresh quote and
+    put()s it, which grows the bucket's variety over time.
+    """
+
+    def __init__(self, max_buckets: int = 512, per_bucket: int = 8,
+                 ttl: float = 6 * 3600, max_users: int = 10000):
+        self.max_buckets = max_buckets
+        self.per_bucket = per_bucket
+        self.ttl = ttl
+        self.max_users = max_users
+        self._buckets: "OrderedDict[QuoteBucket, List[Tuple[float, str]]]" = OrderedDict()
+        self._last_served: "OrderedDict[object, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        registry.gauge("quote_cache_quotes", "Quotes held in the quote cache", callback=self.size)
+        registry.gauge("quote_cache_hit_ratio", "Share of quote lookups served from the cache",
+                       callback=lambda: self.get_stats()["hit_rate"])
+
+    def size(self) -> int:
+        return sum(len(quotes) for quotes in self._buckets.values())
+
+    def _live(self, bucket: QuoteBucket) -> List[Tuple[float, str]]:
+        quotes = self._buckets.get(bucket)
+        if not quotes:
+            return []
+        now = time.monotonic()
+        live = [(created, quote) for created, quote in quotes if now - created < self.ttl]
+        if len(live) != len(quotes):
+            if live:
+                self._buckets[bucket] = live
+            else:
+                del self._buckets[bucket]
+        return live
+
+    def get(self, bucket: QuoteBucket, user_id=None) -> Optional[str]:
+        live = self._live(bucket)
+        last = self._last_served.get(user_id) if user_id is not None else None
+        candidates = [quote for _, quote in live if quote != last]
+        if not candidates:
+            self.misses += 1
+            cache_lookups.inc(result="miss")
+            return None
+
+        self._buckets.move_to_end(bucket)
+        quote = random.choice(candidates)
+        self._remember(user_id, quote)
+        self.hits += 1
+        cache_lookups.inc(result="hit")
+        return quote
+
+    def put(self, bucket: QuoteBucket, quote: str, user_id=None):
+        quotes = self._buckets.setdefault(bucket, [])
+        if all(existing != quote for _, existing in quotes):
+            quotes.append((time.monotonic(), quote))
+            del quotes[:-self.per_bucket]
+        self._buckets.move_to_end(bucket)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        self._remember(user_id, quote)
+
+    def _remember(self, user_id, quote: str):
+        if user_id is None:
+            return
+        self._last_served[user_id] = quote
+        self._last_served.move_to_end(user_id)
+        while len(self._last_served) > self.max_users:
+            self._last_served.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "buckets": len(self._buckets),
+            "quotes": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Global instance
+quote_cache = QuoteCache()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-user shuffled quote decks for CraveBreaker
+A deck is a seeded Fisher-Yates permutation plus a cursor, so each draw is
+O(1), nothing repeats until the deck is used up, and a user's state is three
+integers in the quote_decks table, written behind in batches. Permutations
+are rebuilt from their seed and shared through a small LRU of their own
+"""
+
+import asyncio
+import logging
+import os
+import random
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Cursor changes made within this window are written in one transaction
+QUOTE_DECK_FLUSH_DELAY = float(os.getenv("QUOTE_DECK_FLUSH_DELAY", "2.0"))
+# Permutations kept in memory (one list of deck-size ints each)
+QUOTE_DECK_ORDER_CACHE = int(os.getenv("QUOTE_DECK_ORDER_CACHE", "1000"))
+
+deck_draws = registry.counter("quote_deck_draws_total", "Quote deck draws by state source")
+deck_flushes = registry.counter("quote_deck_flushes_total", "Write-behind batches written to quote_decks")
+
+
+def permutation(seed: int, size: int) -> List[int]:
+    """The pass with this seed: random.Random(seed).shuffle (Fisher-Yates) of range(size)"""
+    order = list(range(size))
+    random.Random(seed).shuffle(order)
+    return order
+
+
+class DeckState:
+    """Position in one shuffled pass over n quotes: seed, cursor and n
+
+    Every order is equally likely and only the seed needs storing; the
+    order itself is rebuilt from the seed (see Permutations).
+    """
+    __slots__ = ("seed", "cursor", "size")
+
+    def __init__(self, seed: int, cursor: int, size: int):
+        self.seed = seed
+        self.cursor = cursor
+        self.size = size
+
+
+class Permutations:
+    """Bounded LRU of permutations by (seed, size), and the draw logic over it
+
+    A permutation missing from the LRU is rebuilt from its seed in
+    O(size); draws from one that is present are O(1).
+    """
+
+    def __init__(self, max_orders: int = QUOTE_DECK_ORDER_CACHE):
+        self.max_orders = max_orders
+        self._orders: "OrderedDict[Tuple[int, int], List[int]]" = OrderedDict()
+
+    def order(self, seed: int, size: int) -> List[int]:
+        key = (seed, size)
+        order = self._orders.get(key)
+        if order is None:
+            order = self._orders[key] = permutation(seed, size)
+            while len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+        else:
+            self._orders.move_to_end(key)
+        return order
+
+    def shuffled(self, size: int, avoid_first: Optional[int] = None) -> DeckState:
+        """New random pass; its first index differs from `avoid_first`"""
+        while True:
+            state = DeckState(random.getrandbits(63), 0, size)  # fits an SQLite INTEGER
+            if size < 2 or self.order(state.seed, size)[0] != avoid_first:
+                return state  # no repeat across the reshuffle
+
+    def draw(self, state: DeckState) -> int:
+        """Next index of `state`; starts a new pass when this one is exhausted"""
+        if state.cursor >= state.size:
+            fresh = self.shuffled(state.size, avoid_first=self.order(state.seed, state.size)[-1])
+            state.seed, state.cursor = fresh.seed, 0
+        index = self.order(state.seed, state.size)[state.cursor]
+        state.cursor += 1
+        return index
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+
+class QuoteDecks:
+    """Deck states per (user, deck) with a bounded in-memory LRU over the DB
+
+    Only recently active users are kept in memory; everyone else lives in
+    the quote_decks table and is loaded on their next draw. A draw from
+    memory touches no database: changed states are written behind by a
+    flusher `flush_delay` later, one transaction for all of them. A state
+    evicted before it was written is still served from the pending writes.
+    stop() writes whatever is pending (shutdown FLUSH phase).
+
+    Memory: `max_cached` states of three ints each, plus at most
+    `max_orders` permutations of deck-size lists (see Permutations).
+    """
+
+    def __init__(self, db_path: str, max_cached: int = 10000, flush_delay: float = QUOTE_DECK_FLUSH_DELAY,
+                 max_orders: int = QUOTE_DECK_ORDER_CACHE):
+        self.db_path = db_path
+        self.max_cached = max_cached
+        self.flush_delay = flush_delay
+        self._states: "OrderedDict[Tuple[int, str], DeckState]" = OrderedDict()
+        self.permutations = Permutations(max_orders)
+        self._dirty: Dict[Tuple[int, str], Tuple[int, int, int]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def create_table(db):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS quote_decks (
+                user_id INTEGER NOT NULL,
+                deck TEXT NOT NULL,
+                seed INTEGER NOT NULL,
+                cursor INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (user_id, deck)
+            )
+        """)
+
+    async def _load(self, user_id: int, deck: str) -> Optional[DeckState]:
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                "SELECT seed, cursor, size FROM quote_decks WHERE user_id = ? AND deck = ?",
+                (user_id, deck)
+            )
+            row = await cursor.fetchone()
+        return DeckState(*row) if row else None
+
+    async def draw(self, user_id: int, deck: str, quotes: Sequence[str]) -> str:
+        """Next quote of the user's deck over `quotes`"""
+        key = (user_id, deck)
+        state = self._states.get(key)
+        source = "memory"
+        if state is None and key in self._dirty:
+            state = DeckState(*self._dirty[key])
+        elif state is None:
+            loaded = await self._load(user_id, deck)
+            # Another draw for this user may have filled the slot meanwhile
+            state = self._states.get(key) or loaded
+            source = "db"
+        if state is None or state.size != len(quotes):
+            # New user, or the quote list changed: start a fresh deck
+            state = self.permutations.shuffled(len(quotes))
+            source = "new"
+
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_cached:
+            self._states.popitem(last=False)
+
+        index = self.permutations.draw(state)
+        deck_draws.inc(source=source)
+        self._dirty[key] = (state.seed, state.cursor, state.size)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later(), name="quote-deck-flush")
+        return quotes[index]
+
+    async def _flush_later(self):
+        # Draws made while a flush is writing land in _dirty again: keep going
+        while self._dirty:
+            await asyncio.sleep(self.flush_delay)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Writing quote decks failed: {e}")
+
+    async def flush(self):
+        """Write every pending deck state now"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.executemany(
+                    """INSERT INTO quote_decks (user_id, deck, seed, cursor, size) VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(user_id, deck) DO UPDATE SET
+                       seed = excluded.seed, cursor = excluded.cursor, size = excluded.size""",
+                    [(user_id, deck, *state) for (user_id, deck), state in dirty.items()]
+                )
+                await db.commit()
+        except BaseException:
+            # Keep the states for the next flush, unless newer ones arrived meanwhile
+            for key, state in dirty.items():
+                self._dirty.setdefault(key, state)
+            raise
+        deck_flushes.inc()
+
+    async def stop(self):
+        """Flush pending states and stop the flusher"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    def get_stats(self) -> Dict:
+        return {"cached_decks": len(self._states), "max_cached": self.max_cached,
+                "cached_orders": len(self.permutations), "max_orders": self.permutations.max_orders,
+                "pending_writes": len(self._dirty)}
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Background pre-generation pool for AI quotes and celebrations
+Handlers only pop ready quotes; a refill worker tops buckets up within a
+request budget, and an empty pool means the caller uses curated text
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from ai_client import ai_client
+from metrics import registry
+from motivation_quotes import AI_BATCH_SIZE, motivation_generator
+from quote_cache import QuoteBucket, quote_cache
+
+logger = logging.getLogger(__name__)
+
+POOL_LOW_WATER = int(os.getenv("QUOTE_POOL_LOW_WATER", "2"))
+POOL_TARGET = int(os.getenv("QUOTE_POOL_TARGET", "5"))
+# Upper bound on AI requests the refill worker may make per hour
+POOL_BUDGET_PER_HOUR = int(os.getenv("QUOTE_POOL_BUDGET_PER_HOUR", "120"))
+
+pool_takes = registry.counter("quote_pool_takes_total", "Quote pool takes by result")
+pool_generated = registry.counter("quote_pool_generated_total", "Quotes generated by the refill worker")
+pool_budget_waits = registry.counter("quote_pool_budget_exhausted_total",
+                                     "Refill passes cut short by the request budget")
+
+# (bucket, count) -> up to `count` new quotes from one AI request
+GenerateBatch = Callable[[QuoteBucket, int], Awaitable[List[str]]]
+
+
+class QuotePool:
+    """Per-bucket deques of ready quotes with a budgeted refill worker
+
+    take() never waits: it pops a fresh quote, or else reuses one served
+    earlier from quote_cache (TTL-bound, never the user's previous quote),
+    or returns None. Served quotes go into quote_cache. Any bucket that is
+    taken from (or missed) is watched; when it drops below `low_water` the
+    worker is woken and generates quotes up to `target`, asking for up to
+    `batch_size` quotes per request. Generation stops once `budget`
+    requests have been made in the last hour.
+    """
+
+    def __init__(self, generate_batch: GenerateBatch, low_water: int = POOL_LOW_WATER,
+                 target: int = POOL_TARGET, budget: int = POOL_BUDGET_PER_HOUR,
+                 batch_size: int = AI_BATCH_SIZE, max_buckets: int = 128):
+        self.generate_batch = generate_batch
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.target = max(target, low_water + 1)
+        self.budget = budget
+        self.max_buckets = max_buckets
+        self._pools: "OrderedDict[QuoteBucket, Deque[str]]" = OrderedDict()
+        self._requests: Deque[float] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        registry.gauge("quote_pool_ready", "Quotes ready in the pool", callback=self.size)
+
+    def size(self) -> int:
+        return sum(len(quotes) for quotes in self._pools.values())
+
+    def watch(self, bucket: QuoteBucket):
+        """Keep this bucket filled from now on"""
+        if bucket not in self._pools:
+            self._pools[bucket] = deque()
+            while len(self._pools) > self.max_buckets:
+                self._pools.popitem(last=False)
+        self._pools.move_to_end(bucket)
+        if len(self._pools[bucket]) < self.low_water:
+            self._wakeup.set()
+
+    def take(self, bucket: QuoteBucket, user_id=None) -> Optional[str]:
+        """Pop a ready quote for the bucket, or reuse a cached one, or None (use curated text)"""
+        if not ai_client.available:
+            return None
+        self.watch(bucket)
+        quotes = self._pools[bucket]
+        if not quotes:
+            quote = quote_cache.get(bucket, user_id)
+            pool_takes.inc(result="cache" if quote else "empty")
+            return quote
+        quote = quotes.popleft()
+        quote_cache.put(bucket, quote, user_id)
+        if len(quotes) < self.low_water:
+            self._wakeup.set()
+        pool_takes.inc(result="hit")
+        return quote
+
+    def _budget_left(self) -> int:
+        hour_ago = time.monotonic() - 3600
+        while self._requests and self._requests[0] < hour_ago:
+            self._requests.popleft()
+        return self.budget - len(self._requests)
+
+    async def _refill_once(self) -> bool:
+        """One pass over low buckets; False if the budget ran out"""
+        low = [bucket for bucket, quotes in reversed(self._pools.items()) if len(quotes) < self.low_water]
+        for bucket in low:
+            while bucket in self._pools and len(self._pools[bucket]) < self.target:
+                if self._budget_left() <= 0:
+                    pool_budget_waits.inc()
+                    return False
+                self._requests.append(time.monotonic())
+                missing = self.target - len(self._pools[bucket])
+                quotes = await self.generate_batch(bucket, min(missing, self.batch_size))
+                if not quotes:
+                    break  # timeout or API error: try again on the next pass
+                if bucket in self._pools:
+                    self._pools[bucket].extend(quotes)
+                    pool_generated.inc(len(quotes), context=bucket.context)
+        return True
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                if not await self._refill_once():
+                    # Wait for the oldest request to leave the window
+                    await asyncio.sleep(max(self._requests[0] + 3600 - time.monotonic(), 1))
+                    self._wakeup.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Quote pool refill failed: {e}")
+                await asyncio.sleep(5)
+
+    def start(self):
+        """Start the refill worker (only when AI quotes are configured)"""
+        if self._task is None and ai_client.available:
+            self._task = asyncio.create_task(self._run(), name="quote-pool-refill")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "buckets": len(self._pools),
+            "ready": self.size(),
+            "budget_left": self._budget_left(),
+            "running": self._task is not None,
+        }
+
+
+# Global instance
+quote_pool = QuotePool(motivation_generator.generate_batch_for_bucket)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bulk badge and level re-evaluation for CraveBreaker
+Walks user_progress in keyset-paginated chunks after badge rules, XP rewards
+or the level curve change, and writes the corrections chunk by chunk
+
+Usage: python reevaluate_job.py [--db cravebreaker.db] [--chunk-size 500] [--restart]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from badge_rules import BadgeEngine, bot_badge_engine, technique_metrics
+from leaderboard import Leaderboard, add_weekly_xp, week_key
+from level_curve import LevelCurve, level_curve
+from metrics import registry
+from progress_cache import ensure_version_column
+from progress_events import BADGE, XP_ADJUST, ProgressEvent, ProgressEventLog, progress_log
+
+logger = logging.getLogger(__name__)
+
+REEVALUATE_CHUNK_SIZE = int(os.getenv("REEVALUATE_CHUNK_SIZE", "500"))
+
+# Badge metric -> user_progress column holding its lifetime value. Streak
+# badges are checked against longest_streak: a badge stays earned after the
+# streak ends. Metrics without a column (comeback) are never awarded here.
+PROGRESS_METRICS = {
+    "total_interventions": "total_interventions",
+    "current_streak": "longest_streak",
+    "weekend_interventions": "weekend_interventions",
+    "late_night_intervention": "late_night_interventions",
+    "early_morning_intervention": "early_morning_interventions",
+    "used_coaching": "coaching_used",
+}
+
+PROGRESS_COLUMNS = ("user_id", "xp", "level", "badges_earned", "technique_counts",
+                    "total_interventions", "longest_streak", "weekend_interventions",
+                    "late_night_interventions", "early_morning_interventions", "coaching_used")
+
+rows_processed = registry.counter("reevaluate_rows_total", "user_progress rows re-evaluated")
+rows_changed = registry.counter("reevaluate_rows_changed_total", "user_progress rows corrected")
+badges_awarded = registry.counter("reevaluate_badges_awarded_total", "Badges awarded by re-evaluation")
+
+# Called after each committed chunk with the users whose progress it changed
+OnChanged = Callable[[List[int]], Awaitable[None]]
+
+
+class ReevaluateJob:
+    """Re-applies badge rules, XP rewards and the level curve to every user
+
+    Rows are read with `WHERE user_id > last ORDER BY user_id LIMIT n`, so
+    each chunk is an index range scan no matter how far the job has got.
+    Per chunk:
+    - badge rules are evaluated column-wise (BadgeEngine.evaluate_many);
+    - badges whose xp_reward changed since they were awarded are re-priced
+      from user_badges.xp_awarded;
+    - levels are recomputed from the resulting XP.
+    Each chunk is read and written under BEGIN IMMEDIATE, like the streak
+    sweep, so no bot write can land between the read and the write. Only
+    rows that changed are written: level, xp, badges and row_version, plus this week's weekly_xp for the XP they gained. They
+    are written in one transaction together with the checkpoint, so an
+    interrupted run resumes after the last committed chunk without
+    double-awarding XP.
+
+    Run from the command line next to a live bot, the bot's writes stay
+    safe: they compare row_version and re-read on a mismatch (see
+    progress_cache). Its cached progress and achievement screens for the
+    changed users can be up to PROGRESS_CACHE_TTL old, though. Callers in
+    the bot's process pass `on_changed` to invalidate them at once.
+    """
+
+    def __init__(self, db_path: str, engine: BadgeEngine = bot_badge_engine,
+                 curve: LevelCurve = level_curve, chunk_size: int = REEVALUATE_CHUNK_SIZE,
+                 name: str = "badges_levels", on_changed: Optional[OnChanged] = None):
+        self.db_path = db_path
+        self.engine = engine
+        self.curve = curve
+        self.chunk_size = chunk_size
+        self.name = name
+        self.on_changed = on_changed
+        self.rules = {rule.id: rule for rule in engine.rules}
+        self.stats = {"processed": 0, "changed": 0, "badges_awarded": 0, "xp_repriced": 0,
+                      "levels_changed": 0, "total": 0, "rows_per_second": 0.0}
+
+    @staticmethod
+    async def create_table(db):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS job_checkpoints (
+                job TEXT PRIMARY KEY,
+                last_key INTEGER NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    async def _checkpoint(self, db) -> Tuple[int, int]:
+        cursor = await db.execute(
+            "SELECT last_key, processed FROM job_checkpoints WHERE job = ?", (self.name,)
+        )
+        row = await cursor.fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def _columns(self, rows: List[Dict]) -> Dict[str, List[int]]:
+        """One value list per badge metric the engine knows"""
+        columns = {}
+        for metric in self.engine.metrics:
+            column = PROGRESS_METRICS.get(metric)
+            if column is not None:
+                columns[metric] = [int(row[column] or 0) for row in rows]
+        technique = [metric for metric in self.engine.metrics if metric.endswith("_techniques")]
+        if technique:
+            per_row = [technique_metrics(json.loads(row["technique_counts"] or "{}")) for row in rows]
+            for metric in technique:
+                columns[metric] = [values[metric] for values in per_row]
+        return columns
+
+    async def _awarded_xp(self, db, first_key: int, last_key: int) -> Dict[Tuple[int, str], int]:
+        """xp_awarded of every badge row for the chunk's user range"""
+        cursor = await db.execute(
+            "SELECT user_id, badge_id, xp_awarded FROM user_badges WHERE user_id BETWEEN ? AND ?",
+            (first_key, last_key)
+        )
+        return {(user_id, badge_id): xp for user_id, badge_id, xp in await cursor.fetchall()}
+
+    async def _process_chunk(self, db, rows: List[Dict]) -> List[int]:
+        """Write the chunk's corrections (caller commits); returns the users changed"""
+        earned = [json.loads(row["badges_earned"] or "[]") for row in rows]
+        reached = self.engine.evaluate_many(self._columns(rows), [set(ids) for ids in earned])
+        awarded_xp = await self._awarded_xp(db, rows[0]["user_id"], rows[-1]["user_id"])
+
+        new_badges, repriced, progress_updates, events, gains = [], [], [], [], []
+        for row, badge_ids, new_rules in zip(rows, earned, reached):
+            user_id = row["user_id"]
+            xp = row["xp"] or 0
+            for badge_id in badge_ids:
+                rule = self.rules.get(badge_id)
+                awarded = awarded_xp.get((user_id, badge_id))
+                if rule is not None and awarded is not None and awarded != rule.xp_reward:
+                    xp += rule.xp_reward - awarded
+                    repriced.append((rule.xp_reward, user_id, badge_id))
+                    events.append((user_id, ProgressEvent.now(XP_ADJUST, badge_id=badge_id,
+                                                              xp_delta=rule.xp_reward - awarded)))
+            for rule in new_rules:
+                badge_ids.append(rule.id)
+                xp += rule.xp_reward
+                new_badges.append((user_id, rule.id, rule.xp_reward))
+                events.append((user_id, ProgressEvent.now(BADGE, badge_id=rule.id, xp_delta=rule.xp_reward)))
+            xp = max(xp, 0)
+            level = self.curve.level(xp)
+            if new_rules or xp != row["xp"] or level != row["level"]:
+                if level != row["level"]:
+                    self.stats["levels_changed"] += 1
+                progress_updates.append((level, xp, json.dumps(badge_ids), user_id))
+                if xp > (row["xp"] or 0):
+                    gains.append((user_id, xp - (row["xp"] or 0)))
+                self.engine.forget(user_id)  # cached cursors predate these badges
+
+        if new_badges:
+            await db.executemany(
+                "INSERT OR IGNORE INTO user_badges (user_id, badge_id, xp_awarded) VALUES (?, ?, ?)",
+                new_badges
+            )
+        if repriced:
+            await db.executemany(
+                "UPDATE user_badges SET xp_awarded = ? WHERE user_id = ? AND badge_id = ?", repriced
+            )
+        if progress_updates:
+            await db.executemany(
+                """UPDATE user_progress SET level = ?, xp = ?, badges_earned = ?,
+                   row_version = row_version + 1, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?""",
+                progress_updates
+            )
+        if gains:
+            await add_weekly_xp(db, week_key(), gains)
+        await progress_log.append_many(db, events)
+
+        self.stats["badges_awarded"] += len(new_badges)
+        self.stats["xp_repriced"] += len(repriced)
+        self.stats["changed"] += len(progress_updates)
+        badges_awarded.inc(len(new_badges))
+        rows_changed.inc(len(progress_updates))
+        return [update[-1] for update in progress_updates]
+
+    async def run(self, restart: bool = False) -> Dict:
+        """Process every remaining chunk; returns the run statistics"""
+        started = time.monotonic()
+        async with aiosqlite.connect(self.db_path) as db:
+            await self.create_table(db)
+            await ProgressEventLog.create_tables(db)
+            await ensure_version_column(db)
+            await Leaderboard.create_tables(db)
+            if restart:
+                await db.execute("DELETE FROM job_checkpoints WHERE job = ?", (self.name,))
+            await db.commit()
+
+            last_key, processed_before = await self._checkpoint(db)
+            cursor = await db.execute("SELECT COUNT(*) FROM user_progress WHERE user_id > ?", (last_key,))
+            remaining = (await cursor.fetchone())[0]
+            self.stats["total"] = processed_before + remaining
+            if last_key:
+                logger.info(f"Resuming {self.name} after user {last_key} "
+                            f"({processed_before} rows already done)")
+
+            select = (f"SELECT {', '.join(PROGRESS_COLUMNS)} FROM user_progress "
+                      f"WHERE user_id > ? ORDER BY user_id LIMIT ?")
+            processed = 0
+            while True:
+                # IMMEDIATE: the chunk is read and corrected under one write lock
+                await db.execute("BEGIN IMMEDIATE")
+                cursor = await db.execute(select, (last_key, self.chunk_size))
+                rows = [dict(zip(PROGRESS_COLUMNS, values)) for values in await cursor.fetchall()]
+                if not rows:
+                    await db.commit()
+                    break
+
+                changed = await self._process_chunk(db, rows)
+                last_key = rows[-1]["user_id"]
+                processed += len(rows)
+                await db.execute(
+                    """INSERT INTO job_checkpoints (job, last_key, processed) VALUES (?, ?, ?)
+                       ON CONFLICT(job) DO UPDATE SET last_key = excluded.last_key,
+                       processed = excluded.processed, updated_at = CURRENT_TIMESTAMP""",
+                    (self.name, last_key, processed_before + processed)
+                )
+                await db.commit()  # chunk writes and checkpoint land together
+                if changed and self.on_changed is not None:
+                    try:
+                        await self.on_changed(changed)
+                    except Exception as e:
+                        logger.error(f"Re-evaluation change handler failed: {e}")
+
+                rows_processed.inc(len(rows))
+                elapsed = time.monotonic() - started
+                self.stats["processed"] = processed_before + processed
+                self.stats["rows_per_second"] = round(processed / elapsed, 1) if elapsed else 0.0
+                logger.info(f"{self.name}: {self.stats['processed']}/{self.stats['total']} rows, "
+                            f"{self.stats['changed']} corrected, {self.stats['rows_per_second']} rows/s")
+
+            # Finished: the next run starts from the beginning again
+            await db.execute("DELETE FROM job_checkpoints WHERE job = ?", (self.name,))
+            await db.commit()
+
+        self.stats["seconds"] = round(time.monotonic() - started, 3)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.getenv("DATABASE_PATH", "cravebreaker.db"))
+    parser.add_argument("--chunk-size", type=int, default=REEVALUATE_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore a saved checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    job = ReevaluateJob(args.db, chunk_size=args.chunk_size)
+    try:
+        stats = asyncio.run(job.run(restart=args.restart))
+    except KeyboardInterrupt:
+        logger.info(f"Interrupted after {job.stats['processed']} rows; run again to resume")
+        return
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
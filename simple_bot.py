@@ -14,23 +14,115 @@ from datetime import datetime, timedelta
 import random
 import json
 from motivation_quotes_fix import motivation_generator
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+from motivation_quotes import motivation_generator as ai_motivation
+from ai_client import ai_client
+from achievement_view import BOT_CATALOG_TEXT, AchievementScreens
+from live_message import STREAMING_ENABLED, LiveMessage, markdown_safe
+from quote_cache import celebration_bucket, quote_bucket, quote_cache
+from badge_rules import bot_badge_engine
+from level_curve import level_curve
+from leaderboard import WEEKLY_BOARD, Leaderboard
+from progress_events import BADGE, INTERVENTION, ProgressEvent, ProgressEventLog, progress_log
+from progress_cache import ProgressCache, ProgressConflict, ensure_version_column, retry_on_conflict
+from quote_decks import QuoteDecks
+from state_store import StateStore
+from streak_sweep import StreakSweep
+from quote_pool import quote_pool
+from loop_monitor import loop_monitor
+
+# Логирование настраивает точка входа (logging_setup.setup_logging)
 logger = logging.getLogger(__name__)
+# Per-tap debug lines; sampled by the logging pipeline (LOG_SAMPLE_RATES)
+trace_logger = logging.getLogger(f"{__name__}.trace")
 
 class SimpleCraveBreakerBot:
     def __init__(self):
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
         self.db_path = "cravebreaker.db"
+        # Per-user no-repeat quote decks (written behind to quote_decks)
+        self.quote_decks = QuoteDecks(self.db_path)
+        # XP / weekly / streak rankings, updated on every progress write
+        self.leaderboard = Leaderboard(self.db_path)
+        # Conversation states in memory, written behind to user_states
+        self.state_store = StateStore(self.db_path)
+        # Read-through progress cache, written through by update_user_progress
+        self.progress_cache = ProgressCache(self.load_user_progress)
+        # Rendered achievement screens, reused while the progress version holds
+        self.achievement_screens = AchievementScreens(self.db_path, self.progress_cache.version)
+        # Nightly reset of expired streaks (scheduled from main.py)
+        self.streak_sweep = StreakSweep(self.db_path, on_broken=self.streaks_broken)
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
         
+        # Shared HTTP connection pool, opened in startup()
+        self.http_client = None
+        self.db_ready = False
+        
+        # Runtime state for /status
+        self.running = False
+        self.offset = 0
+        self.updates_processed = 0
+        self.last_poll_at = None
+        self.last_update_at = None
+        
+        # Updates being handled right now (drained on shutdown)
+        self.in_flight = set()
+    
+    async def startup(self):
+        """Open the HTTP pool and prepare the database (idempotent)"""
+        import httpx
+        
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        if not self.db_ready:
+            await self.init_db()
+            await self.leaderboard.load()
+            await self.state_store.load()
+            self.db_ready = True
+    
+    async def checkpoint_wal(self):
+        """Fold the WAL back into the main database file"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return await cursor.fetchone()
+    
+    async def aclose(self):
+        """Close the HTTP pool"""
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+    
+    async def get_http_client(self):
+        """Shared httpx client, opening the pool on first use"""
+        if self.http_client is None:
+            await self.startup()
+        return self.http_client
+    
+    def get_runtime_stats(self):
+        """Bot internals for health and status endpoints"""
+        return {
+            "running": self.running,
+            "offset": self.offset,
+            "updates_processed": self.updates_processed,
+            "last_poll_at": self.last_poll_at,
+            "last_update_at": self.last_update_at,
+            "in_flight": len(self.in_flight),
+            "http_pool_open": self.http_client is not None,
+            "streak_sweep": self.streak_sweep.get_stats(),
+            "leaderboard": self.leaderboard.get_stats(),
+            "progress_cache": self.progress_cache.get_stats(),
+            "achievement_screens": self.achievement_screens.get_stats(),
+            "user_states": self.state_store.get_stats(),
+            "quote_decks": self.quote_decks.get_stats()
+        }
+        
     async def init_db(self):
         """Инициализация базы данных"""
         async with aiosqlite.connect(self.db_path) as db:
+            # WAL: readers don't block the writer; checkpointed on shutdown
+            await db.execute("PRAGMA journal_mode=WAL")
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
@@ -107,7 +199,11 @@ class SimpleCraveBreakerBot:
                 )
             """)
             
-
+            await QuoteDecks.create_table(db)
+            await StreakSweep.create_index(db)
+            await Leaderboard.create_tables(db)
+            await ProgressEventLog.create_tables(db)
+            await ensure_version_column(db)
             
             await db.commit()
     
@@ -116,28 +212,15 @@ class SimpleCraveBreakerBot:
     # User state management methods
     async def set_user_state(self, user_id: int, state: str, data: str = ""):
         """Set user conversation state"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO user_states (user_id, state, data, updated_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            """, (user_id, state, data))
-            await db.commit()
+        self.state_store.set(user_id, state, data)
     
     async def get_user_state(self, user_id: int):
         """Get user conversation state"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT state, data FROM user_states WHERE user_id = ?",
-                (user_id,)
-            )
-            result = await cursor.fetchone()
-            return result if result else (None, None)
+        return self.state_store.get(user_id)
     
     async def clear_user_state(self, user_id: int):
         """Clear user conversation state"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM user_states WHERE user_id = ?", (user_id,))
-            await db.commit()
+        self.state_store.clear(user_id)
             
     async def get_total_user_count(self):
         """Get total number of unique users for social proof (URD requirement)"""
@@ -200,12 +283,16 @@ class SimpleCraveBreakerBot:
     
     # Gamification methods
     async def get_user_progress(self, user_id):
-        """Get user gamification progress"""
+        """Get user gamification progress (cached, see progress_cache)"""
+        return await self.progress_cache.get(user_id)
+    
+    async def load_user_progress(self, user_id):
+        """Read user gamification progress from the database"""
         async with aiosqlite.connect(self.db_path) as db:
             cursor = await db.execute(
                 """SELECT level, xp, total_interventions, current_streak, longest_streak,
                    last_intervention_date, badges_earned, technique_counts, weekend_interventions,
-                   late_night_interventions, early_morning_interventions, coaching_used
+                   late_night_interventions, early_morning_interventions, coaching_used, row_version
                    FROM user_progress WHERE user_id = ?""",
                 (user_id,)
             )
@@ -217,34 +304,47 @@ class SimpleCraveBreakerBot:
                     """INSERT INTO user_progress (user_id) VALUES (?)""",
                     (user_id,)
                 )
-                await db.commit()
-                return {
+                progress = {
                     "level": 1, "xp": 0, "total_interventions": 0, "current_streak": 0,
                     "longest_streak": 0, "last_intervention_date": None, "badges_earned": "[]",
                     "technique_counts": "{}", "weekend_interventions": 0,
                     "late_night_interventions": 0, "early_morning_interventions": 0,
-                    "coaching_used": False
+                    "coaching_used": False, "row_version": 0
                 }
+                await self.leaderboard.record(db, user_id, progress)
+                await db.commit()
+                return progress
             
-            return {
+            progress = {
                 "level": result[0], "xp": result[1], "total_interventions": result[2],
                 "current_streak": result[3], "longest_streak": result[4],
                 "last_intervention_date": result[5], "badges_earned": result[6],
                 "technique_counts": result[7], "weekend_interventions": result[8],
                 "late_night_interventions": result[9], "early_morning_interventions": result[10],
-                "coaching_used": bool(result[11])
+                "coaching_used": bool(result[11]), "row_version": result[12]
             }
+            # Строка могла измениться вне бота (reevaluate_job): подтянуть рейтинги
+            self.leaderboard.observe(user_id, progress)
+            return progress
     
-    async def update_user_progress(self, user_id, progress_data):
-        """Update user gamification progress"""
+    async def update_user_progress(self, user_id, progress_data, events=()):
+        """Update user gamification progress
+        
+        `events` (progress_events.ProgressEvent) are the changes behind this
+        write; they are appended to the event log in the same transaction.
+        Raises ProgressConflict if another process wrote the row since
+        `progress_data` was read (see progress_cache).
+        """
+        row_version = progress_data.get("row_version", 0)
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
+            cursor = await db.execute(
                 """UPDATE user_progress SET 
                    level = ?, xp = ?, total_interventions = ?, current_streak = ?,
                    longest_streak = ?, last_intervention_date = ?, badges_earned = ?,
                    technique_counts = ?, weekend_interventions = ?, late_night_interventions = ?,
-                   early_morning_interventions = ?, coaching_used = ?, updated_at = CURRENT_TIMESTAMP
-                   WHERE user_id = ?""",
+                   early_morning_interventions = ?, coaching_used = ?,
+                   row_version = row_version + 1, updated_at = CURRENT_TIMESTAMP
+                   WHERE user_id = ? AND row_version = ?""",
                 (
                     progress_data.get("level", 1),
                     progress_data.get("xp", 0),
@@ -258,62 +358,79 @@ class SimpleCraveBreakerBot:
                     progress_data.get("late_night_interventions", 0),
                     progress_data.get("early_morning_interventions", 0),
                     progress_data.get("coaching_used", False),
-                    user_id
+                    user_id, row_version
                 )
             )
+            if cursor.rowcount == 0:
+                # Строку изменил другой процесс (sweep, reevaluate_job): перечитать
+                self.progress_cache.invalidate(user_id)
+                raise ProgressConflict(f"user_progress of {user_id} changed since it was read")
+            await progress_log.append(db, user_id, events, progress_data)
+            await self.leaderboard.record(db, user_id, progress_data)
             await db.commit()
+        progress_data["row_version"] = row_version + 1
+        self.progress_cache.put(user_id, progress_data)
+    
+    async def streaks_broken(self, broken):
+        """StreakSweep callback: streaks were reset directly in the table"""
+        for streak in broken:
+            self.progress_cache.invalidate(streak.user_id)
+        await self.leaderboard.streaks_broken(broken)
+    
+    async def check_and_award_badges(self, user_id, intervention_type="general", changed=None):
+        """Check for new badge achievements and award them
+        
+        `changed` maps metric -> new value (see badge_rules); only those
+        metrics are checked. Without it every metric the bot tracks is checked.
+        """
+        newly_earned, changed = await retry_on_conflict(lambda: self._award_badges(user_id, changed))
+        # Курсоры движка сдвигаются только после того, как награды сохранены
+        bot_badge_engine.commit(user_id, changed)
+        return newly_earned
     
-    async def check_and_award_badges(self, user_id, intervention_type="general"):
-        """Check for new badge achievements and award them"""
+    async def _award_badges(self, user_id, changed):
         progress = await self.get_user_progress(user_id)
         badges_earned = json.loads(progress["badges_earned"])
-        technique_counts = json.loads(progress["technique_counts"])
         newly_earned = []
+        events = []
         
-        # Define badge requirements
-        badge_checks = [
-            ("first_intervention", "🌱 Первый шаг", lambda p: p["total_interventions"] >= 1, 25),
-            ("interventions_10", "🎯 Новичок", lambda p: p["total_interventions"] >= 10, 75),
-            ("interventions_50", "🚀 Энтузиаст", lambda p: p["total_interventions"] >= 50, 150),
-            ("interventions_100", "💎 Эксперт", lambda p: p["total_interventions"] >= 100, 300),
-            ("streak_3", "🔥 Тепло", lambda p: p["current_streak"] >= 3, 50),
-            ("streak_7", "⚡ Неделя силы", lambda p: p["current_streak"] >= 7, 100),
-            ("streak_14", "💪 Двухнедельный воин", lambda p: p["current_streak"] >= 14, 200),
-        ]
+        if changed is None:
+            changed = {metric: progress[metric] for metric in bot_badge_engine.metrics}
         
-        for badge_id, badge_name, condition, xp_reward in badge_checks:
-            if badge_id not in badges_earned and condition(progress):
-                badges_earned.append(badge_id)
-                progress["xp"] += xp_reward
-                newly_earned.append((badge_name, xp_reward))
-                
-                # Add badge to database
-                async with aiosqlite.connect(self.db_path) as db:
-                    await db.execute(
-                        """INSERT OR IGNORE INTO user_badges (user_id, badge_id, xp_awarded) VALUES (?, ?, ?)""",
-                        (user_id, badge_id, xp_reward)
-                    )
-                    await db.commit()
+        for rule in bot_badge_engine.evaluate(user_id, changed, badges_earned):
+            badges_earned.append(rule.id)
+            progress["xp"] += rule.xp_reward
+            newly_earned.append((rule.name, rule.xp_reward))
+            events.append(ProgressEvent.now(BADGE, badge_id=rule.id, xp_delta=rule.xp_reward))
+            
+            # Add badge to database
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.execute(
+                    """INSERT OR IGNORE INTO user_badges (user_id, badge_id, xp_awarded) VALUES (?, ?, ?)""",
+                    (user_id, rule.id, rule.xp_reward)
+                )
+                await db.commit()
         
         # Update progress with new badges and XP
         if newly_earned:
             progress["badges_earned"] = json.dumps(badges_earned)
             progress["level"] = self.calculate_level(progress["xp"])
-            await self.update_user_progress(user_id, progress)
-        
-        return newly_earned
+            await self.update_user_progress(user_id, progress, events)
+        return newly_earned, changed
     
     def calculate_level(self, xp):
         """Calculate user level based on XP"""
-        level_thresholds = [0, 100, 250, 500, 1000, 1750, 2750, 4000, 5500, 7500, 10000]
-        for level, threshold in enumerate(level_thresholds):
-            if xp < threshold:
-                return level
-        return len(level_thresholds)
+        return level_curve.level(xp)
     
     async def process_intervention_success(self, user_id, intervention_type="general"):
         """Process successful intervention and update gamification"""
+        changed = await retry_on_conflict(lambda: self._record_intervention(user_id, intervention_type))
+        return await self.check_and_award_badges(user_id, intervention_type, changed)
+    
+    async def _record_intervention(self, user_id, intervention_type):
+        """Count the intervention; returns the badge metrics it changed"""
         progress = await self.get_user_progress(user_id)
+        previous_streak = progress["current_streak"]
         
         # Update intervention count
         progress["total_interventions"] += 1
@@ -348,17 +465,17 @@ class SimpleCraveBreakerBot:
         progress["level"] = self.calculate_level(progress["xp"])
         
         # Update progress
-        await self.update_user_progress(user_id, progress)
-        
-        # Check for new badges
-        new_badges = await self.check_and_award_badges(user_id, intervention_type)
+        event = ProgressEvent.now(INTERVENTION, technique=intervention_type, xp_delta=10)
+        await self.update_user_progress(user_id, progress, [event])
         
-        return new_badges
+        # Check for new badges (only the metrics this event changed)
+        changed = {"total_interventions": progress["total_interventions"]}
+        if progress["current_streak"] != previous_streak:
+            changed["current_streak"] = progress["current_streak"]
+        return changed
     
     async def send_message(self, chat_id, text, reply_markup=None):
         """Отправка сообщения через Telegram API"""
-        import httpx
-        
         url = f"{self.base_url}/sendMessage"
         data = {
             "chat_id": chat_id,
@@ -369,13 +486,13 @@ class SimpleCraveBreakerBot:
         if reply_markup:
             data["reply_markup"] = reply_markup
             
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, json=data)
-                return response.json()
-            except Exception as e:
-                logger.error(f"Ошибка отправки сообщения: {e}")
-                return None
+        client = await self.get_http_client()
+        try:
+            response = await client.post(url, json=data)
+            return response.json()
+        except Exception as e:
+            logger.error(f"Ошибка отправки сообщения: {e}")
+            return None
     
     async def get_updates(self, offset=0):
         """Получение обновлений от Telegram"""
@@ -387,28 +504,28 @@ class SimpleCraveBreakerBot:
             "timeout": 10
         }
         
-        async with httpx.AsyncClient(timeout=30) as client:
-            try:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 409:
-                    # Handle 409 Conflict - usually means webhook is active or multiple instances
-                    logger.warning("409 Conflict detected - attempting to resolve...")
-                    # Try to delete webhook and wait a bit
-                    await self.delete_webhook()
-                    await asyncio.sleep(2)
-                    return {"ok": True, "result": []}
-                else:
-                    logger.error(f"HTTP error {e.response.status_code}: {e}")
-                    return {"ok": False, "result": []}
-            except httpx.TimeoutException:
-                logger.debug("Timeout получения обновлений (это нормально)")
+        client = await self.get_http_client()
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 409:
+                # Handle 409 Conflict - usually means webhook is active or multiple instances
+                logger.warning("409 Conflict detected - attempting to resolve...")
+                # Try to delete webhook and wait a bit
+                await self.delete_webhook()
+                await asyncio.sleep(2)
                 return {"ok": True, "result": []}
-            except Exception as e:
-                logger.error(f"Ошибка получения обновлений: {e}")
+            else:
+                logger.error(f"HTTP error {e.response.status_code}: {e}")
                 return {"ok": False, "result": []}
+        except httpx.TimeoutException:
+            logger.debug("Timeout получения обновлений (это нормально)")
+            return {"ok": True, "result": []}
+        except Exception as e:
+            logger.error(f"Ошибка получения обновлений: {e}")
+            return {"ok": False, "result": []}
     
     def get_main_menu_keyboard(self):
         """Клавиатура главного меню"""
@@ -762,7 +879,7 @@ class SimpleCraveBreakerBot:
         message_id = callback_query["message"]["message_id"]
         
         # DEBUG: Log ALL callback data to trace the routing issue
-        logger.info(f"CALLBACK DEBUG: user_id={user_id}, callback_data='{data}'")
+        trace_logger.debug("CALLBACK DEBUG: user_id=%s, callback_data=%r", user_id, data)
         
         # Ответ на callback query
         await self.answer_callback_query(callback_query["id"])
@@ -790,22 +907,22 @@ class SimpleCraveBreakerBot:
         
         elif data.startswith("impulse_failed"):
             # DEBUG: Log the callback data to understand the issue
-            logger.info(f"IMPULSE_FAILED DEBUG: callback_data='{data}'")
+            trace_logger.debug("IMPULSE_FAILED DEBUG: callback_data=%r", data)
             parts = data.split("_")
-            logger.info(f"IMPULSE_FAILED DEBUG: parts={parts}")
+            trace_logger.debug("IMPULSE_FAILED DEBUG: parts=%s", parts)
             
             if len(parts) >= 3:
                 # Extract impulse type from callback data: impulse_failed_[TYPE]
                 impulse_type = parts[2]
-                logger.info(f"IMPULSE_FAILED DEBUG: extracted impulse_type='{impulse_type}'")
+                trace_logger.debug("IMPULSE_FAILED DEBUG: extracted impulse_type=%r", impulse_type)
             else:
                 # Fallback - should never happen with correct button creation
                 impulse_type = "sweets"
-                logger.warning(f"IMPULSE_FAILED DEBUG: Using fallback impulse_type='sweets', parts={parts}")
+                logger.warning("IMPULSE_FAILED DEBUG: Using fallback impulse_type='sweets', parts=%s", parts)
             
             # Store current impulse context to maintain routing
             await self.set_user_state(user_id, "current_impulse", impulse_type)
-            logger.info(f"IMPULSE_FAILED DEBUG: stored impulse_type='{impulse_type}' for user {user_id}")
+            trace_logger.debug("IMPULSE_FAILED DEBUG: stored impulse_type=%r for user %s", impulse_type, user_id)
             
             text = f"""😌 **Эта техника не подошла**
 
@@ -848,30 +965,14 @@ class SimpleCraveBreakerBot:
             # Process successful intervention with gamification
             new_badges = await self.process_intervention_success(user_id, "impulse")
             
-            text = """🎉 **Отлично! Техника сработала!**
+            header = """🎉 **Отлично! Техника сработала!**
 
 Поздравляю! Вы успешно справились с импульсом.
 
 💎 **+10 XP**
 
 """
-            
-            # Add badge notifications if any
-            if new_badges:
-                text += "🏆 **НОВЫЕ ДОСТИЖЕНИЯ!**\n"
-                for badge_name, xp_reward in new_badges:
-                    text += f"• {badge_name} (+{xp_reward} XP)\n"
-                    # Try AI-enhanced achievement celebration first
-                    progress = await self.get_user_progress(user_id)
-                    ai_celebration = await motivation_generator.get_ai_achievement_celebration(badge_name, progress)
-                    if ai_celebration:
-                        text += f"\n💫 *{ai_celebration}*\n"
-                    else:
-                        # Fallback to curated achievement quote
-                        achievement_quote = motivation_generator.get_achievement_quote(badge_name, xp_reward)
-                        text += f"\n💫 *{achievement_quote}*\n"
-            
-            text += """
+            footer = """
 • Успешно справились с желанием
 
 📈 **Ваш мозг учится:** каждая победа укрепляет нейронные пути самоконтроля.
@@ -885,7 +986,60 @@ class SimpleCraveBreakerBot:
                     [{"text": "🏠 Главное меню", "callback_data": "back_to_menu"}]
                 ]
             }
-            await self.edit_message(chat_id, message_id, text, keyboard)
+            
+            # Add badge notifications if any
+            celebrations = []  # [badge_name, xp_reward, celebration text]
+            streamed = []  # indexes of celebrations that will be streamed in
+            streaming = STREAMING_ENABLED and ai_client.available
+            if new_badges:
+                progress = await self.get_user_progress(user_id)
+                for badge_name, xp_reward in new_badges:
+                    # Pre-generated AI celebration if one is ready
+                    celebration = quote_pool.take(celebration_bucket(progress, badge_name), user_id)
+                    if celebration is None and streaming:
+                        streamed.append(len(celebrations))
+                        celebration = "…"
+                    elif celebration is None:
+                        # Fallback to curated achievement quote
+                        celebration = (await motivation_generator.get_ai_achievement_celebration(badge_name, progress)
+                                       or motivation_generator.get_achievement_quote(badge_name, xp_reward))
+                    celebrations.append([badge_name, xp_reward, celebration])
+            
+            def render():
+                text = header
+                if celebrations:
+                    text += "🏆 **НОВЫЕ ДОСТИЖЕНИЯ!**\n"
+                    for badge_name, xp_reward, celebration in celebrations:
+                        text += f"• {badge_name} (+{xp_reward} XP)\n"
+                        text += f"\n💫 *{celebration}*\n"
+                return text + footer
+            
+            if not streamed:
+                await self.edit_message(chat_id, message_id, render(), keyboard)
+            else:
+                # Show the screen right away and let the AI celebrations type themselves in
+                live = LiveMessage(self, chat_id, message_id, keyboard)
+                live.update(render())
+                
+                async def stream_celebrations():
+                    for index in streamed:
+                        badge_name, xp_reward, _ = celebrations[index]
+                        received = ""
+                        async for delta in ai_motivation.stream_achievement_celebration(badge_name, progress):
+                            received += delta
+                            celebrations[index][2] = markdown_safe(received) + "…"
+                            live.update(render())
+                        if received.strip():
+                            # Готовый текст пригодится другим пользователям с тем же значком
+                            quote_cache.put(celebration_bucket(progress, badge_name), received.strip(), user_id)
+                        celebrations[index][2] = (
+                            markdown_safe(received).strip()
+                            or await motivation_generator.get_ai_achievement_celebration(badge_name, progress)
+                            or motivation_generator.get_achievement_quote(badge_name, xp_reward))
+                    await live.finish(render())
+                
+                # Поток идёт фоновой задачей: обработчик не держит очередь обновлений
+                self.track(stream_celebrations(), f"celebration-{user_id}")
             
         elif data.startswith("impulse_"):
             impulse_type = data.replace("impulse_", "")
@@ -939,7 +1093,7 @@ class SimpleCraveBreakerBot:
             
             # DEBUG: Log button creation
             failed_callback = f"impulse_failed_{impulse_type}"
-            logger.info(f"BUTTON DEBUG: Creating 'Не сработало' button with callback_data='{failed_callback}'")
+            trace_logger.debug("BUTTON DEBUG: Creating 'Не сработало' button with callback_data=%r", failed_callback)
             
             keyboard = {
                 "inline_keyboard": [
@@ -1011,7 +1165,7 @@ class SimpleCraveBreakerBot:
             
         elif data.startswith("outcome_"):
             # DEBUG: Log outcome callback
-            logger.info(f"OUTCOME DEBUG: callback_data='{data}'")
+            trace_logger.debug("OUTCOME DEBUG: callback_data=%r", data)
             success = data == "outcome_success"
             
             # Record result in interventions table
@@ -1052,70 +1206,54 @@ class SimpleCraveBreakerBot:
             await self.edit_message(chat_id, message_id, text, keyboard)
         
         elif data == "achievements":
-            progress = await self.get_user_progress(user_id)
-            badges_earned = json.loads(progress["badges_earned"])
-            
-            text = f"""🏆 **МОИ ДОСТИЖЕНИЯ**
-            
-🌟 **Уровень:** {progress["level"]}
-💎 **Опыт:** {progress["xp"]} XP
-📈 **Интервенций:** {progress["total_interventions"]}
-🔥 **Текущая серия:** {progress["current_streak"]} дней
-🎯 **Лучшая серия:** {progress["longest_streak"]} дней
-🏅 **Достижений:** {len(badges_earned)}
-
-**🏆 ЗАРАБОТАННЫЕ ЗНАЧКИ:**"""
-            
-            if badges_earned:
-                badge_names = {
-                    "first_intervention": "🌱 Первый шаг",
-                    "interventions_10": "🎯 Новичок", 
-                    "interventions_50": "🚀 Энтузиаст",
-                    "interventions_100": "💎 Эксперт",
-                    "streak_3": "🔥 Тепло",
-                    "streak_7": "⚡ Неделя силы", 
-                    "streak_14": "💪 Двухнедельный воин"
-                }
-                
-                for badge_id in badges_earned:
-                    if badge_id in badge_names:
-                        text += f"\n• {badge_names[badge_id]}"
-            else:
-                text += "\nПока нет достижений. Начни использовать техники!"
-            
-            # Calculate XP for next level
-            level_thresholds = [0, 100, 250, 500, 1000, 1750, 2750, 4000, 5500, 7500, 10000]
-            current_level = progress["level"]
-            if current_level < len(level_thresholds):
-                xp_needed = level_thresholds[current_level] - progress["xp"]
-                text += f"\n\n⬆️ **До следующего уровня:** {xp_needed} XP"
-            else:
-                text += "\n\n👑 **МАКСИМАЛЬНЫЙ УРОВЕНЬ ДОСТИГНУТ!**"
+            # Прогресс и значки одним запросом; готовый текст берется из кэша,
+            # пока версия прогресса пользователя не изменилась
+            text = await self.achievement_screens.render(user_id)
+            
+            # Место в рейтинге: O(log n) по дереву Фенвика, без COUNT по таблице
+            rank = self.leaderboard.rank("xp", user_id)
+            if rank is not None:
+                text += f"\n🏅 **Место в рейтинге:** {rank} из {self.leaderboard.size('xp')}"
             
             keyboard = {
                 "inline_keyboard": [
                     [{"text": "🎯 Доступные достижения", "callback_data": "available_badges"}],
+                    [{"text": "🏅 Рейтинг", "callback_data": "leaderboard"}],
                     [{"text": "📊 Моя статистика", "callback_data": "show_stats"}],
                     [{"text": "🏠 Главное меню", "callback_data": "back_to_menu"}]
                 ]
             }
             await self.edit_message(chat_id, message_id, text, keyboard)
             
+        elif data == "leaderboard":
+            boards = [("xp", "💎 ПО ОПЫТУ", "XP"), (WEEKLY_BOARD, "📅 ЗА НЕДЕЛЮ", "XP"),
+                      ("streak", "🔥 ПО СЕРИИ", "дн.")]
+            tops = {board: await self.leaderboard.top(board, 5) for board, _, _ in boards}
+            
+            text = "🏅 **РЕЙТИНГ**"
+            for board, title, unit in boards:
+                text += f"\n\n**{title}:**"
+                top = tops[board]
+                if not top:
+                    text += "\nПока пусто"
+                for place, (uid, score) in enumerate(top, start=1):
+                    # Только анонимные метки: чужие имена в рейтинге не показываем
+                    who = "Вы" if uid == user_id else f"Участник {place}"
+                    text += f"\n{place}. {who} - {score} {unit}"
+                rank = self.leaderboard.rank(board, user_id)
+                if rank is not None and rank > len(top):
+                    text += f"\n… вы на {rank} месте"
+            
+            keyboard = {
+                "inline_keyboard": [
+                    [{"text": "🏆 Мои достижения", "callback_data": "achievements"}],
+                    [{"text": "🏠 Главное меню", "callback_data": "back_to_menu"}]
+                ]
+            }
+            await self.edit_message(chat_id, message_id, text, keyboard)
+            
         elif data == "available_badges":
-            text = """🎯 **ДОСТУПНЫЕ ДОСТИЖЕНИЯ**
-
-**🔥 СЕРИИ:**
-• 🌱 Первый шаг - Первая интервенция (+25 XP)
-• 🔥 Тепло - 3 дня подряд (+50 XP)  
-• ⚡ Неделя силы - 7 дней подряд (+100 XP)
-• 💪 Двухнедельный воин - 14 дней подряд (+200 XP)
-
-**🎯 РУБЕЖИ:**
-• 🎯 Новичок - 10 интервенций (+75 XP)
-• 🚀 Энтузиаст - 50 интервенций (+150 XP) 
-• 💎 Эксперт - 100 интервенций (+300 XP)
-
-**💡 Совет:** Используйте техники регулярно, чтобы заработать больше достижений!"""
+            text = BOT_CATALOG_TEXT
             
             keyboard = {
                 "inline_keyboard": [
@@ -1128,8 +1266,10 @@ class SimpleCraveBreakerBot:
         elif data == "daily_motivation":
             progress = await self.get_user_progress(user_id)
             
-            # Get AI-enhanced personalized quote
-            enhanced_quote = motivation_generator.get_enhanced_personalized_quote(progress, "morning")
+            # Get AI-enhanced personalized quote (pre-generated, or curated if the pool is empty)
+            enhanced_quote = (quote_pool.take(quote_bucket(progress, "morning"), user_id)
+                              or await self.quote_decks.draw(user_id, "morning",
+                                                             motivation_generator.get_quote_pool("morning")))
             
             # Get daily challenge
             daily_challenge = motivation_generator.get_daily_challenge_quote()
@@ -1159,7 +1299,9 @@ class SimpleCraveBreakerBot:
             progress = await self.get_user_progress(user_id)
             
             # Get AI-enhanced evening reflection quote
-            reflection_quote = motivation_generator.get_enhanced_personalized_quote(progress, "evening_reflection")
+            reflection_quote = (quote_pool.take(quote_bucket(progress, "evening_reflection"), user_id)
+                                or await self.quote_decks.draw(user_id, "evening_reflection",
+                                                               motivation_generator.get_quote_pool("evening_reflection")))
             
             text = f"""🌅 **ВЕЧЕРНЯЯ РЕФЛЕКСИЯ**
 
@@ -1490,33 +1632,43 @@ class SimpleCraveBreakerBot:
     
     async def answer_callback_query(self, callback_query_id):
         """Ответ на callback query"""
-        import httpx
-        
         url = f"{self.base_url}/answerCallbackQuery"
         data = {"callback_query_id": callback_query_id}
         
-        async with httpx.AsyncClient() as client:
-            await client.post(url, json=data)
+        client = await self.get_http_client()
+        await client.post(url, json=data)
     
     async def delete_webhook(self):
         """Delete any active webhook to resolve 409 conflicts"""
-        import httpx
-        
         url = f"{self.base_url}/deleteWebhook"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url)
-                logger.info("Webhook deleted to resolve conflict")
-                return response.json()
-            except Exception as e:
-                logger.error(f"Error deleting webhook: {e}")
-                return None
+        client = await self.get_http_client()
+        try:
+            response = await client.post(url)
+            logger.info("Webhook deleted to resolve conflict")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error deleting webhook: {e}")
+            return None
+    
+    async def set_webhook(self, webhook_url, secret_token=None):
+        """Register a webhook so Telegram pushes updates instead of polling"""
+        url = f"{self.base_url}/setWebhook"
+        data = {"url": webhook_url}
+        if secret_token:
+            data["secret_token"] = secret_token
+        
+        client = await self.get_http_client()
+        try:
+            response = await client.post(url, json=data)
+            logger.info(f"Webhook set to {webhook_url}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error setting webhook: {e}")
+            return None
     
     async def edit_message(self, chat_id, message_id, text, reply_markup=None):
         """Редактирование сообщения"""
-        import httpx
-        
         url = f"{self.base_url}/editMessageText"
         data = {
             "chat_id": chat_id,
@@ -1528,13 +1680,13 @@ class SimpleCraveBreakerBot:
         if reply_markup:
             data["reply_markup"] = reply_markup
             
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, json=data)
-                return response.json()
-            except Exception as e:
-                logger.error(f"Ошибка редактирования сообщения: {e}")
-                return None
+        client = await self.get_http_client()
+        try:
+            response = await client.post(url, json=data)
+            return response.json()
+        except Exception as e:
+            logger.error(f"Ошибка редактирования сообщения: {e}")
+            return None
     
     async def run_bot(self):
         """Запуск бота для app.py"""
@@ -1543,28 +1695,87 @@ class SimpleCraveBreakerBot:
             return
         
         logger.info("Запуск Simple CraveBreaker Bot...")
-        await self.init_db()
+        await self.startup()
         
-        offset = 0
-        
-        while True:
-            try:
-                updates = await self.get_updates(offset)
-                
-                if updates.get("ok"):
-                    for update in updates.get("result", []):
-                        offset = update["update_id"] + 1
-                        
-                        if "message" in update:
-                            await self.handle_message(update["message"])
-                        elif "callback_query" in update:
-                            await self.handle_callback_query(update["callback_query"])
-                
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"Ошибка в основном цикле: {e}")
-                await asyncio.sleep(5)
+        self.running = True
+        try:
+            while self.running:
+                try:
+                    updates = await self.get_updates(self.offset)
+                    self.last_poll_at = datetime.now().isoformat()
+                    
+                    if updates.get("ok"):
+                        for update in updates.get("result", []):
+                            if not self.running:
+                                break
+                            self.offset = update["update_id"] + 1
+                            # Shielded: stopping the poll loop never cuts a handler short
+                            await asyncio.shield(self.dispatch(update))
+                    
+                    await asyncio.sleep(1)
+                    
+                except Exception as e:
+                    logger.error(f"Ошибка в основном цикле: {e}")
+                    await asyncio.sleep(5)
+        finally:
+            self.running = False
+    
+    @staticmethod
+    def update_route(update):
+        """Короткое имя маршрута для диагностики: команда или callback без id"""
+        if "callback_query" in update:
+            data = update["callback_query"].get("data", "")
+            return "callback:" + data.rstrip("0123456789_")
+        text = update.get("message", {}).get("text", "")
+        return "message:" + (text.split()[0] if text.startswith("/") else "text")
+    
+    async def process_update(self, update):
+        """Обработка одного обновления (polling или webhook)"""
+        if "message" in update:
+            handler, payload = self.handle_message, update["message"]
+        elif "callback_query" in update:
+            handler, payload = self.handle_callback_query, update["callback_query"]
+        else:
+            handler = payload = None
+        try:
+            if handler is not None:
+                with loop_monitor.step(self.update_route(update), handler.__qualname__):
+                    await handler(payload)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        self.updates_processed += 1
+        self.last_update_at = datetime.now().isoformat()
+    
+    def dispatch(self, update):
+        """Запустить обработку обновления как отслеживаемую задачу"""
+        return self.track(self.process_update(update))
+    
+    def track(self, coro, name=None):
+        """Фоновая задача в in_flight: drain() при остановке дождётся её"""
+        task = asyncio.create_task(self._logged(coro), name=name)
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        return task
+    
+    @staticmethod
+    async def _logged(coro):
+        try:
+            await coro
+        except Exception as e:
+            logger.error(f"Фоновая задача завершилась с ошибкой: {e}")
+    
+    async def drain(self, timeout=10.0):
+        """Дождаться обработки текущих обновлений; вернуть число незавершённых"""
+        if not self.in_flight:
+            return 0
+        done, pending = await asyncio.wait(set(self.in_flight), timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} updates still running after {timeout}s drain")
+        return len(pending)
+    
+    def stop(self):
+        """Остановить приём новых обновлений"""
+        self.running = False
     
     async def run(self):
         """Запуск бота (совместимость с прямым запуском)"""
@@ -1575,6 +1786,8 @@ async def main():
     await bot.run()
 
 if __name__ == "__main__":
+    from logging_setup import setup_logging
+    setup_logging()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
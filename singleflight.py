@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Request coalescing for CraveBreaker
+Concurrent calls with the same key share one in-flight coroutine and its result
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+from metrics import registry
+
+T = TypeVar("T")
+
+requests_saved = registry.counter("singleflight_requests_saved_total",
+                                  "Calls served by joining an in-flight request")
+flight_fanout = registry.histogram("singleflight_fanout", "Callers sharing one flight",
+                                   (1, 2, 3, 5, 10, 20, 50, 100))
+
+
+class SingleFlight:
+    """Group of keyed flights
+
+    The first caller for a key starts `fn()` as its own task; callers that
+    arrive while it runs await the same task. Each caller waits through
+    asyncio.shield, so a caller that times out or is cancelled does not
+    cancel the flight for the others. The key is forgotten as soon as the
+    flight finishes - results are not cached.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, List] = {}  # key -> [task, callers]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.create_task(fn())
+            flight = self._flights[key] = [task, 1]
+            task.add_done_callback(lambda t: self._finish(key, flight))
+        else:
+            flight[1] += 1
+            requests_saved.inc(group=self.name)
+        return await asyncio.shield(flight[0])
+
+    def _finish(self, key: Hashable, flight: List):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        flight_fanout.observe(flight[1])
+        task = flight[0]
+        if not task.cancelled():
+            task.exception()  # retrieved here even if every caller gave up
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
@@ -9,15 +9,7 @@ import sys
 import logging
 from main import main
 
-# Configure production logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
+# Production logging is configured by main (queued JSON/text to stdout)
 logger = logging.getLogger(__name__)
 
 def check_environment():
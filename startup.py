@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Startup helpers for CraveBreaker entry points
+Background loading of heavy modules and import-time budget reporting
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Modules that are not needed to answer a health probe
+HEAVY_MODULES = (
+    "httpx",
+    "aiosqlite",
+    "motivation_quotes_fix",
+    "simple_bot",
+)
+
+# Entry points checked by the importtime report
+ENTRY_MODULES = ("main", "start_production", "wsgi")
+
+DEFAULT_IMPORT_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "300"))
+
+_preload_thread: Optional[threading.Thread] = None
+_preload_done = threading.Event()
+preload_timings: Dict[str, float] = {}
+preload_errors: Dict[str, str] = {}
+
+
+def _preload(modules: Iterable[str]):
+    """Import modules one by one, recording how long each took"""
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            preload_errors[name] = str(e)
+            logger.warning(f"Background import of {name} failed: {e}")
+        preload_timings[name] = (time.perf_counter() - started) * 1000
+    _preload_done.set()
+    logger.info(f"Heavy modules loaded in {sum(preload_timings.values()):.0f} ms")
+
+
+def preload_heavy_modules(modules: Iterable[str] = HEAVY_MODULES) -> threading.Thread:
+    """Start loading heavy modules in a daemon thread (idempotent)"""
+    global _preload_thread
+    if _preload_thread is None:
+        _preload_thread = threading.Thread(
+            target=_preload, args=(tuple(modules),), name="preload", daemon=True
+        )
+        _preload_thread.start()
+    return _preload_thread
+
+
+def heavy_modules_ready() -> bool:
+    """True once the background import has finished"""
+    return _preload_done.is_set()
+
+
+def wait_for_heavy_modules(timeout: Optional[float] = None) -> bool:
+    """Block until the background import has finished"""
+    if _preload_thread is None:
+        preload_heavy_modules()
+    return _preload_done.wait(timeout)
+
+
+def measure_import_time(module: str) -> Tuple[int, List[Tuple[str, int]]]:
+    """Import a module in a fresh interpreter with -X importtime
+
+    Returns the cumulative import time of the module in microseconds and the
+    list of (module, cumulative_us) for every import it triggered.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()[-2000:]}")
+
+    entries = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        cumulative_us = int(parts[1].strip())
+        name = parts[2].rstrip()
+        entries.append((name.strip(), cumulative_us))
+        # Children are listed before their parent and top-level imports are
+        # indented by a single space, so anything before another top-level
+        # import (site, encodings) belongs to interpreter startup
+        if not name.startswith("  "):
+            if name.strip() == module:
+                total_us = cumulative_us
+                break
+            entries.clear()
+    return total_us, entries
+
+
+def importtime_report(modules: Iterable[str] = ENTRY_MODULES,
+                      budget_ms: int = DEFAULT_IMPORT_BUDGET_MS,
+                      top: int = 10) -> int:
+    """Print import time of each entry point; return 1 if any is over budget"""
+    exit_code = 0
+    for module in modules:
+        try:
+            total_us, entries = measure_import_time(module)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            exit_code = 1
+            continue
+
+        total_ms = total_us / 1000
+        verdict = "OK" if total_ms <= budget_ms else "OVER BUDGET"
+        print(f"{module}: {total_ms:.1f} ms (budget {budget_ms} ms) - {verdict}")
+        for name, cumulative_us in sorted(entries, key=lambda e: e[1], reverse=True)[:top]:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+        if total_ms > budget_ms:
+            exit_code = 1
+    return exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python startup.py importtime [modules...]"""
+    parser = argparse.ArgumentParser(description="CraveBreaker startup tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("importtime", help="check entry point import time")
+    report.add_argument("modules", nargs="*", default=list(ENTRY_MODULES))
+    report.add_argument("--budget-ms", type=int, default=DEFAULT_IMPORT_BUDGET_MS)
+    report.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    return importtime_report(args.modules, args.budget_ms, args.top)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
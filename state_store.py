@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-memory conversation state for CraveBreaker
+Per-user routing context lives in a bounded dict with TTL; reads never hit
+SQLite, and changes are written behind to user_states for crash recovery
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import aiosqlite
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+USER_STATE_TTL = float(os.getenv("USER_STATE_TTL", "3600"))
+USER_STATE_MAX_USERS = int(os.getenv("USER_STATE_MAX_USERS", "50000"))
+# USER_STATE_PERSIST=0 keeps states in memory only (lost on restart)
+USER_STATE_PERSIST = os.getenv("USER_STATE_PERSIST", "1").lower() not in ("0", "false", "no")
+# Changes made within this window are written in one transaction
+USER_STATE_FLUSH_DELAY = float(os.getenv("USER_STATE_FLUSH_DELAY", "1.0"))
+
+state_evictions = registry.counter("user_state_evictions_total", "Conversation states dropped by reason")
+state_flushes = registry.counter("user_state_flushes_total", "Write-behind batches written to user_states")
+
+
+class StateStore:
+    """user_id -> (state, data, expires_at), least recently set first
+
+    get() only looks at memory. set() and clear() change memory at once
+    and, when persistence is on, mark the user dirty; a flusher writes
+    all dirty users `flush_delay` later in one transaction, so a burst of
+    state changes costs one commit. flush() writes immediately (shutdown
+    FLUSH phase). load() restores unexpired states after a restart.
+    """
+
+    def __init__(self, db_path: str, ttl: float = USER_STATE_TTL, max_users: int = USER_STATE_MAX_USERS,
+                 persist: bool = USER_STATE_PERSIST, flush_delay: float = USER_STATE_FLUSH_DELAY):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_users = max_users
+        self.persist = persist
+        self.flush_delay = flush_delay
+        self._states: "OrderedDict[int, Tuple[str, str, float]]" = OrderedDict()
+        self._dirty: Dict[int, Optional[Tuple[str, str]]] = {}  # None = delete
+        self._flusher: Optional[asyncio.Task] = None
+        self.size_bytes = 0
+        registry.gauge("user_state_entries", "Conversation states held in memory", callback=lambda: len(self._states))
+        registry.gauge("user_state_bytes", "Size of state and data strings held in memory",
+                       callback=lambda: self.size_bytes)
+
+    def _drop(self, user_id: int, reason: str):
+        state, data, _ = self._states.pop(user_id)
+        self.size_bytes -= len(state) + len(data)
+        state_evictions.inc(reason=reason)
+
+    def _mark(self, user_id: int, value: Optional[Tuple[str, str]]):
+        if not self.persist:
+            return
+        self._dirty[user_id] = value
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later(), name="user-state-flush")
+
+    def get(self, user_id: int) -> Tuple[Optional[str], Optional[str]]:
+        entry = self._states.get(user_id)
+        if entry is None:
+            return None, None
+        if entry[2] <= time.monotonic():
+            self._drop(user_id, "ttl")
+            self._mark(user_id, None)
+            return None, None
+        return entry[0], entry[1]
+
+    def set(self, user_id: int, state: str, data: str = ""):
+        data = data or ""
+        if user_id in self._states:
+            self._drop(user_id, "replaced")
+        self._states[user_id] = (state, data, time.monotonic() + self.ttl)
+        self.size_bytes += len(state) + len(data)
+        self._mark(user_id, (state, data))
+        while len(self._states) > self.max_users:
+            evicted = next(iter(self._states))
+            self._drop(evicted, "size")
+            self._mark(evicted, None)
+
+    def clear(self, user_id: int):
+        if user_id in self._states:
+            self._drop(user_id, "cleared")
+        self._mark(user_id, None)
+
+    async def _flush_later(self):
+        # Changes made while a flush is writing land in _dirty again: keep going
+        while self._dirty:
+            await asyncio.sleep(self.flush_delay)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Writing user states failed: {e}")
+
+    async def flush(self):
+        """Write every pending change to user_states now"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        upserts = [(user_id, value[0], value[1]) for user_id, value in dirty.items() if value is not None]
+        deletes = [(user_id,) for user_id, value in dirty.items() if value is None]
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                if upserts:
+                    await db.executemany(
+                        """INSERT OR REPLACE INTO user_states (user_id, state, data, updated_at)
+                           VALUES (?, ?, ?, CURRENT_TIMESTAMP)""",
+                        upserts
+                    )
+                if deletes:
+                    await db.executemany("DELETE FROM user_states WHERE user_id = ?", deletes)
+                await db.commit()
+        except BaseException:
+            # Failed or cancelled mid-write: keep the changes for the next
+            # flush, unless newer ones arrived meanwhile
+            for user_id, value in dirty.items():
+                self._dirty.setdefault(user_id, value)
+            raise
+        state_flushes.inc()
+
+    async def load(self):
+        """Restore states younger than the TTL and drop the rest from the table"""
+        if not self.persist:
+            return
+        now = time.monotonic()
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                """SELECT user_id, state, data, (julianday('now') - julianday(updated_at)) * 86400
+                   FROM user_states ORDER BY updated_at"""
+            )
+            rows = await cursor.fetchall()
+            expired = []
+            for user_id, state, data, age in rows:
+                if state is None or age is None or age >= self.ttl:
+                    expired.append((user_id,))
+                    continue
+                self._states[user_id] = (state, data or "", now + self.ttl - age)
+                self.size_bytes += len(state) + len(data or "")
+            if expired:
+                await db.executemany("DELETE FROM user_states WHERE user_id = ?", expired)
+                await db.commit()
+        while len(self._states) > self.max_users:
+            self._drop(next(iter(self._states)), "size")
+        logger.info(f"Restored {len(self._states)} conversation states ({len(expired)} expired)")
+
+    async def stop(self):
+        """Flush pending changes and stop the flusher"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    def get_stats(self) -> Dict:
+        return {"users": len(self._states), "bytes": self.size_bytes, "pending_writes": len(self._dirty),
+                "persist": self.persist, "ttl": self.ttl}
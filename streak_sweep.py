@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Nightly streak expiry for CraveBreaker
+Resets streaks of users who missed a day with chunked set-based UPDATEs and
+reports the streaks just broken, so readers never see a stale current_streak
+
+Usage: python streak_sweep.py [--db cravebreaker.db] [--chunk-size 1000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import aiosqlite
+
+from metrics import registry
+from progress_cache import ensure_version_column
+from progress_events import STREAK_RESET, ProgressEvent, ProgressEventLog, progress_log
+
+logger = logging.getLogger(__name__)
+
+STREAK_SWEEP_CHUNK_SIZE = int(os.getenv("STREAK_SWEEP_CHUNK_SIZE", "1000"))
+# Local time of the nightly run, HH:MM
+STREAK_SWEEP_AT = os.getenv("STREAK_SWEEP_AT", "00:05")
+
+streaks_reset = registry.counter("streak_sweep_streaks_reset_total", "Expired streaks reset by the sweep")
+sweep_seconds = registry.histogram("streak_sweep_seconds", "Duration of a full streak sweep",
+                                   buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120))
+
+
+class BrokenStreak(NamedTuple):
+    user_id: int
+    streak: int
+    last_intervention_date: str
+
+
+# Called once per sweep with every streak it broke (e.g. to queue reminders)
+OnBroken = Callable[[List[BrokenStreak]], Awaitable[None]]
+
+
+class StreakSweep:
+    """Set-based reset of streaks whose last intervention is before yesterday
+
+    Matches the lazy rule in process_intervention_success: a streak survives
+    while the last intervention was today or yesterday. Expired rows are
+    found through a partial index on last_intervention_date covering only
+    current_streak > 0, and reset `chunk_size` at a time, each chunk in its
+    own short write transaction. Reset rows leave the index, so the next
+    chunk is again the head of it and no key needs to be carried over.
+    """
+
+    def __init__(self, db_path: str, chunk_size: int = STREAK_SWEEP_CHUNK_SIZE,
+                 run_at: str = STREAK_SWEEP_AT, on_broken: Optional[OnBroken] = None):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        hour, minute = run_at.split(":")
+        self.run_at = (int(hour), int(minute))
+        self.on_broken = on_broken
+        self.last_run: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def create_index(db):
+        await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_user_progress_active_streak
+            ON user_progress (last_intervention_date) WHERE current_streak > 0
+        """)
+
+    async def sweep(self, today: Optional[date] = None) -> List[BrokenStreak]:
+        """Reset every expired streak now; returns the streaks broken"""
+        started = time.monotonic()
+        cutoff = ((today or datetime.now().date()) - timedelta(days=1)).isoformat()
+        broken: List[BrokenStreak] = []
+        chunks = 0
+        async with aiosqlite.connect(self.db_path) as db:
+            await self.create_index(db)
+            await ProgressEventLog.create_tables(db)
+            await ensure_version_column(db)
+            await db.commit()
+            while True:
+                # IMMEDIATE: the chunk is read and reset under one write lock,
+                # so a success landing in between cannot be overwritten.
+                # RETURNING would only see the zeroed streak, hence the SELECT
+                await db.execute("BEGIN IMMEDIATE")
+                cursor = await db.execute(
+                    """SELECT user_id, current_streak, last_intervention_date FROM user_progress
+                       WHERE current_streak > 0 AND last_intervention_date < ?
+                       ORDER BY last_intervention_date LIMIT ?""",
+                    (cutoff, self.chunk_size)
+                )
+                rows = await cursor.fetchall()
+                if not rows:
+                    await db.commit()
+                    break
+                # One statement for the whole chunk
+                await db.execute(
+                    """UPDATE user_progress SET current_streak = 0, row_version = row_version + 1,
+                       updated_at = CURRENT_TIMESTAMP
+                       WHERE user_id IN (SELECT value FROM json_each(?))""",
+                    (json.dumps([row[0] for row in rows]),)
+                )
+                reset = ProgressEvent.now(STREAK_RESET)
+                await progress_log.append_many(db, ((row[0], reset) for row in rows))
+                await db.commit()
+                broken.extend(BrokenStreak(*row) for row in rows)
+                chunks += 1
+                await asyncio.sleep(0)  # let handlers waiting on the DB in between chunks
+
+        elapsed = time.monotonic() - started
+        streaks_reset.inc(len(broken))
+        sweep_seconds.observe(elapsed)
+        self.last_run = {"finished_at": datetime.now().isoformat(timespec="seconds"), "cutoff": cutoff,
+                         "broken": len(broken), "chunks": chunks, "seconds": round(elapsed, 3)}
+        logger.info(f"Streak sweep reset {len(broken)} streaks in {chunks} chunks ({elapsed:.2f}s)")
+
+        if broken and self.on_broken is not None:
+            try:
+                await self.on_broken(broken)
+            except Exception as e:
+                logger.error(f"Broken streak handler failed: {e}")
+        return broken
+
+    def _seconds_until_next_run(self) -> float:
+        now = datetime.now()
+        next_run = now.replace(hour=self.run_at[0], minute=self.run_at[1], second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._seconds_until_next_run())
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Streak sweep failed: {e}")
+
+    def start(self):
+        """Schedule the nightly sweep"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="streak-sweep")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        return {"scheduled": self._task is not None,
+                "run_at": "%02d:%02d" % self.run_at, "last_run": self.last_run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.getenv("DATABASE_PATH", "cravebreaker.db"))
+    parser.add_argument("--chunk-size", type=int, default=STREAK_SWEEP_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    broken = asyncio.run(StreakSweep(args.db, args.chunk_size).sweep())
+    print(json.dumps([streak._asdict() for streak in broken], ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
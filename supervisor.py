@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bot runtime supervisor for CraveBreaker
+Owns the single polling/webhook runtime: cross-process lock, restarts with
+crash-loop backoff and draining of in-flight updates on stop
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks
+    fcntl = None
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_FILE = os.getenv("BOT_LOCK_FILE", "/tmp/cravebreaker-bot.lock")
+
+restarts_total = registry.counter("bot_restarts_total", "Bot runtime restarts after a crash")
+
+
+class InstanceLock:
+    """Exclusive advisory lock on a file, held for the life of the runtime
+
+    flock() works across processes on one host (gunicorn workers, a second
+    `python main.py`) and across replicas only when the file is on a shared
+    filesystem that supports it.
+    """
+
+    def __init__(self, path: str = DEFAULT_LOCK_FILE):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try to take the lock without blocking"""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            logger.warning("fcntl unavailable, single-instance lock disabled")
+            self._fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+
+class BotSupervisor:
+    """Runs exactly one bot runtime and restarts it when it crashes
+
+    `runner` is a coroutine function that runs the bot until it is cancelled
+    (or returns when there is nothing to run, e.g. no token). Exceptions are
+    treated as crashes: the runner is restarted after an exponential backoff
+    that resets once a run has stayed up for `stable_after` seconds.
+    """
+
+    def __init__(self, bot, runner: Callable[[], Awaitable[None]],
+                 lock: Optional[InstanceLock] = None,
+                 min_backoff: float = 1.0, max_backoff: float = 300.0,
+                 stable_after: float = 60.0, lock_retry: float = 15.0):
+        self.bot = bot
+        self.runner = runner
+        self.lock = lock or InstanceLock()
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.lock_retry = lock_retry
+
+        self.state = "stopped"
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self._backoff = min_backoff
+        self._task: Optional[asyncio.Task] = None
+        self._runtime: Optional[asyncio.Task] = None
+        self._control = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start supervising; does nothing if already running"""
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._supervise(), name="bot-supervisor")
+
+    async def _supervise(self):
+        try:
+            while not self.lock.acquire():
+                self.state = "standby"
+                logger.info(f"Another instance holds {self.lock.path}, retrying in {self.lock_retry:.0f}s")
+                await asyncio.sleep(self.lock_retry)
+
+            while True:
+                self.state = "running"
+                started = time.monotonic()
+                self._runtime = asyncio.create_task(self.runner(), name="bot-runtime")
+                try:
+                    await self._runtime
+                    logger.info("Bot runtime finished")
+                    self.state = "finished"
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.last_error = str(e)
+                    self.restarts += 1
+                    restarts_total.inc()
+
+                    if time.monotonic() - started >= self.stable_after:
+                        self._backoff = self.min_backoff
+                    delay = self._backoff * random.uniform(0.8, 1.2)
+                    self._backoff = min(self._backoff * 2, self.max_backoff)
+
+                    self.state = "backoff"
+                    logger.error(f"Bot runtime crashed: {e}; restarting in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            if self._runtime is not None and not self._runtime.done():
+                self._runtime.cancel()
+                await asyncio.gather(self._runtime, return_exceptions=True)
+            self.lock.release()
+
+    async def stop(self, drain_timeout: float = 10.0) -> int:
+        """Stop intake, drain in-flight updates, then stop the runtime
+
+        Returns the number of updates that did not finish within the deadline.
+        """
+        async with self._control:
+            if self._task is None:
+                return 0
+            self.state = "draining"
+            self.bot.stop()
+            pending = await self.bot.drain(drain_timeout)
+
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self.state = "stopped"
+            return pending
+
+    async def restart(self, drain_timeout: float = 10.0):
+        """Stop the current runtime (if any) and start a fresh one"""
+        await self.stop(drain_timeout)
+        self._backoff = self.min_backoff
+        self.start()
+
+    def get_stats(self):
+        return {
+            "state": self.state,
+            "lock_held": self.lock.held,
+            "lock_file": self.lock.path,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "next_backoff_seconds": round(self._backoff, 1),
+        }
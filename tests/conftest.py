@@ -0,0 +1,42 @@
+"""Shared fixtures: a SQLite file with the bot's progress tables"""
+
+import sqlite3
+
+import pytest
+
+PROGRESS_SCHEMA = """
+CREATE TABLE user_progress (
+    user_id INTEGER PRIMARY KEY,
+    level INTEGER DEFAULT 1,
+    xp INTEGER DEFAULT 0,
+    total_interventions INTEGER DEFAULT 0,
+    current_streak INTEGER DEFAULT 0,
+    longest_streak INTEGER DEFAULT 0,
+    last_intervention_date TEXT,
+    badges_earned TEXT DEFAULT '[]',
+    technique_counts TEXT DEFAULT '{}',
+    weekend_interventions INTEGER DEFAULT 0,
+    late_night_interventions INTEGER DEFAULT 0,
+    early_morning_interventions INTEGER DEFAULT 0,
+    coaching_used BOOLEAN DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE user_badges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    badge_id TEXT,
+    earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    xp_awarded INTEGER DEFAULT 0,
+    UNIQUE(user_id, badge_id)
+);
+"""
+
+
+@pytest.fixture
+def progress_db(tmp_path):
+    """Path of a fresh database with user_progress and user_badges"""
+    path = str(tmp_path / "progress.db")
+    with sqlite3.connect(path) as db:
+        db.executescript(PROGRESS_SCHEMA)
+    return path
@@ -0,0 +1,47 @@
+"""AchievementScreens: screens reused per progress version, expired after the TTL"""
+
+import asyncio
+import sqlite3
+
+from achievement_view import AchievementScreens
+
+
+def set_xp(path, xp):
+    with sqlite3.connect(path) as db:
+        db.execute("INSERT OR REPLACE INTO user_progress (user_id, xp) VALUES (1, ?)", (xp,))
+
+
+def test_screen_is_reused_until_the_version_changes(progress_db):
+    set_xp(progress_db, 10)
+    versions = {1: 1}
+    screens = AchievementScreens(progress_db, lambda user_id: versions.get(user_id, 0), ttl=60)
+
+    async def scenario():
+        first = await screens.render(1)
+        set_xp(progress_db, 20)  # written by another process: same version
+        cached = await screens.render(1)
+        versions[1] = 2
+        return first, cached, await screens.render(1)
+
+    first, cached, fresh = asyncio.run(scenario())
+    assert "10 XP" in first and cached == first
+    assert "20 XP" in fresh
+
+
+def test_screens_expire_after_the_ttl(progress_db):
+    set_xp(progress_db, 10)
+    screens = AchievementScreens(progress_db, lambda user_id: 1, ttl=0)
+
+    async def scenario():
+        await screens.render(1)
+        set_xp(progress_db, 20)
+        return await screens.render(1)
+
+    assert "20 XP" in asyncio.run(scenario())
+
+
+def test_untracked_users_are_not_stored(progress_db):
+    set_xp(progress_db, 10)
+    screens = AchievementScreens(progress_db, lambda user_id: 0)
+    asyncio.run(screens.render(1))
+    assert screens.get_stats()["users"] == 0
@@ -0,0 +1,73 @@
+"""BadgeEngine: per-metric cursors, deferred commit, bulk evaluation"""
+
+import random
+
+from badge_rules import BADGE_RULES, BadgeEngine, BadgeRule, badge_engine
+
+
+def rule(badge_id, metric, threshold):
+    return BadgeRule(badge_id, badge_id, "", "milestone", "common", metric, threshold, 10)
+
+
+ENGINE_RULES = (rule("a1", "a", 1), rule("a5", "a", 5), rule("a10", "a", 10), rule("b3", "b", 3))
+
+
+def ids(rules):
+    return [r.id for r in rules]
+
+
+def test_evaluate_returns_crossed_thresholds_of_changed_metrics_only():
+    engine = BadgeEngine(ENGINE_RULES)
+    assert ids(engine.evaluate(1, {"a": 5}, [])) == ["a1", "a5"]
+    assert ids(engine.evaluate(2, {"b": 7}, [])) == ["b3"]
+    assert engine.evaluate(3, {"c": 100}, []) == []
+
+
+def test_earned_badges_are_skipped():
+    engine = BadgeEngine(ENGINE_RULES)
+    assert ids(engine.evaluate(1, {"a": 10}, ["a1", "a10"])) == ["a5"]
+
+
+def test_uncommitted_awards_are_offered_again():
+    engine = BadgeEngine(ENGINE_RULES)
+    assert ids(engine.evaluate(1, {"a": 5}, [])) == ["a1", "a5"]
+    # The write failed: nothing was committed and nothing was earned
+    assert ids(engine.evaluate(1, {"a": 5}, [])) == ["a1", "a5"]
+
+
+def test_commit_moves_the_cursor_past_reached_thresholds():
+    engine = BadgeEngine(ENGINE_RULES)
+    engine.evaluate(1, {"a": 5}, [])
+    engine.commit(1, {"a": 5})
+    assert engine.evaluate(1, {"a": 6}, ["a1", "a5"]) == []
+    assert engine.next_threshold(1, "a", ["a1", "a5"]).id == "a10"
+    assert ids(engine.evaluate(1, {"a": 10}, ["a1", "a5"])) == ["a10"]
+
+
+def test_commit_for_unknown_user_is_a_no_op():
+    engine = BadgeEngine(ENGINE_RULES)
+    engine.commit(99, {"a": 10})
+    assert ids(engine.evaluate(99, {"a": 10}, [])) == ["a1", "a5", "a10"]
+
+
+def test_cursors_are_rebuilt_from_earned_after_eviction():
+    engine = BadgeEngine(ENGINE_RULES, max_users=1)
+    engine.evaluate(1, {"a": 1}, [])
+    engine.commit(1, {"a": 1})
+    engine.evaluate(2, {"a": 1}, [])  # evicts user 1
+    assert ids(engine.evaluate(1, {"a": 5}, ["a1"])) == ["a5"]
+
+
+def test_evaluate_many_matches_brute_force():
+    rng = random.Random(7)
+    metrics = sorted({r.metric for r in BADGE_RULES})
+    rows = 200
+    columns = {metric: [rng.randrange(0, 130) for _ in range(rows)] for metric in metrics}
+    earned = [set(rng.sample([r.id for r in BADGE_RULES], 3)) for _ in range(rows)]
+
+    result = badge_engine.evaluate_many(columns, earned)
+
+    for row in range(rows):
+        expected = {r.id for r in BADGE_RULES
+                    if columns[r.metric][row] >= r.threshold and r.id not in earned[row]}
+        assert set(ids(result[row])) == expected
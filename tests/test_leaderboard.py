@@ -0,0 +1,65 @@
+"""Leaderboard: Fenwick ranks and top-N against brute force, weekly XP rollup"""
+
+import asyncio
+import random
+
+import aiosqlite
+
+from leaderboard import WEEKLY_BOARD, Board, FenwickTree, Leaderboard
+
+
+def brute_rank(scores, user_id):
+    return 1 + sum(score > scores[user_id] for score in scores.values())
+
+
+def brute_top(scores, limit):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def test_fenwick_counts_grow_past_the_initial_size():
+    tree = FenwickTree(size=4)
+    tree.load([0, 3, 3])
+    tree.add(100)
+    tree.add(3, -1)
+    assert [tree.count_le(score) for score in (0, 2, 3, 99, 100, 5000)] == [1, 1, 2, 2, 3, 3]
+    assert tree.total == 3
+
+
+def test_board_matches_brute_force_under_random_updates():
+    rng = random.Random(7)
+    board = Board("xp", top_n=5)
+    scores = {user_id: rng.randrange(50) for user_id in range(30)}
+    board.load(scores.items())
+    for _ in range(2000):
+        user_id, score = rng.randrange(40), rng.randrange(3000)
+        if rng.random() < 0.3:
+            score = rng.randrange(20)  # drops push members out of the top list
+        board.set(user_id, score)
+        scores[user_id] = score
+        probe = rng.choice(list(scores))
+        assert board.rank(probe) == brute_rank(scores, probe)
+        assert board.top(5) == brute_top(scores, 5)
+    assert board.rank(999) is None
+
+
+def test_record_credits_only_the_bots_own_gain_to_the_week(progress_db):
+    async def scenario():
+        leaderboard = Leaderboard(progress_db, top_n=10)
+        async with aiosqlite.connect(progress_db) as db:
+            await Leaderboard.create_tables(db)
+            await db.commit()
+        await leaderboard.load()
+        async with aiosqlite.connect(progress_db) as db:
+            await leaderboard.record(db, 1, {"xp": 30, "current_streak": 1, "total_interventions": 3})
+            # Read back after reevaluate_job added 100 XP (and credited them itself)
+            leaderboard.observe(1, {"xp": 130, "current_streak": 1, "total_interventions": 3})
+            await leaderboard.record(db, 1, {"xp": 140, "current_streak": 2, "total_interventions": 4})
+            await db.commit()
+            cursor = await db.execute("SELECT xp FROM weekly_xp WHERE user_id = 1")
+            weekly = (await cursor.fetchone())[0]
+        return leaderboard, weekly, await leaderboard.top("xp", 1)
+
+    leaderboard, weekly, top = asyncio.run(scenario())
+    assert weekly == 40
+    assert leaderboard.rank(WEEKLY_BOARD, 1) == 1
+    assert top == [(1, 140)]
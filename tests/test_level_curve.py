@@ -0,0 +1,103 @@
+"""LevelCurve: parity with the original linear scan, max level, extension, batch lookups"""
+
+import pytest
+
+import level_curve as level_curve_module
+from level_curve import DEFAULT_THRESHOLDS, LevelCurve, LevelInfo
+
+BOUNDARY_XP = (-50, -1, 0, 1, 99, 100, 101, 249, 250, 999, 1000, 7499, 7500, 9999, 10000, 10001, 10 ** 9)
+
+
+def old_level(xp, thresholds=DEFAULT_THRESHOLDS):
+    """GamificationSystem.calculate_level before the bisect rewrite"""
+    for level, threshold in enumerate(thresholds):
+        if xp < threshold:
+            return level
+    return len(thresholds)
+
+
+def old_xp_for_next_level(xp, thresholds=DEFAULT_THRESHOLDS):
+    """GamificationSystem.get_xp_for_next_level before the rewrite: (to_next, in_level)"""
+    level = old_level(xp, thresholds)
+    if level >= len(thresholds):
+        return 0, 0
+    start = thresholds[level - 1] if level > 0 else 0
+    return thresholds[level] - xp, xp - start
+
+
+@pytest.mark.parametrize("xp", BOUNDARY_XP)
+def test_level_matches_old_scan(xp):
+    assert LevelCurve().level(xp) == old_level(xp)
+
+
+def test_boundaries():
+    curve = LevelCurve()
+    assert curve.level(0) == 1
+    assert curve.level(99) == 1
+    assert curve.level(100) == 2
+    assert curve.level(10000) == 11 == curve.max_level
+    assert curve.level(-1) == 0
+
+
+@pytest.mark.parametrize("xp", [xp for xp in BOUNDARY_XP if xp < DEFAULT_THRESHOLDS[-1]])
+def test_info_matches_old_progress_below_max(xp):
+    info = LevelCurve().info(xp)
+    assert (info.xp_to_next, info.xp_in_level) == old_xp_for_next_level(xp)
+    assert info.level_span == info.xp_to_next + info.xp_in_level
+    assert not info.is_max
+
+
+def test_info_at_max_level():
+    curve = LevelCurve()
+    assert curve.info(10000) == LevelInfo(11, 0, 0, 0, True)
+    assert curve.info(12345) == LevelInfo(11, 2345, 0, 0, True)
+
+
+def test_extra_levels_grow_the_last_gap():
+    curve = LevelCurve(extra_levels=3, growth=1.5)
+    # Last default gap is 2500: 3750, 5625, 8438 (rounded)
+    assert curve.thresholds[:len(DEFAULT_THRESHOLDS)] == DEFAULT_THRESHOLDS
+    assert curve.thresholds[len(DEFAULT_THRESHOLDS):] == (13750, 19375, 27813)
+    assert curve.max_level == 14
+    assert curve.level(10000) == 11
+    assert curve.level(13749) == 11
+    assert curve.level(13750) == 12
+    assert curve.info(27813).is_max
+    assert curve.info(20000) == LevelInfo(13, 625, 7813, 8438, False)
+
+
+def test_extra_levels_keep_parity_with_old_scan():
+    curve = LevelCurve((0, 10, 30), extra_levels=4, growth=2)
+    assert curve.thresholds == (0, 10, 30, 70, 150, 310, 630)
+    for xp in range(-5, 700):
+        assert curve.level(xp) == old_level(xp, curve.thresholds)
+
+
+@pytest.mark.parametrize("thresholds", [(), (0, 100, 100), (0, 250, 100)])
+def test_rejects_unsorted_or_repeated_thresholds(thresholds):
+    with pytest.raises(ValueError):
+        LevelCurve(thresholds)
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("LEVEL_THRESHOLDS", "0,50,150")
+    monkeypatch.setenv("LEVEL_EXTRA_LEVELS", "1")
+    monkeypatch.setenv("LEVEL_GROWTH", "2")
+    assert LevelCurve.from_env().thresholds == (0, 50, 150, 350)
+
+
+def test_levels_without_numpy(monkeypatch):
+    monkeypatch.setattr(level_curve_module, "numpy", None)
+    curve = LevelCurve(extra_levels=2)
+    assert curve._array is None
+    assert curve.levels(list(BOUNDARY_XP)) == [curve.level(xp) for xp in BOUNDARY_XP]
+    assert curve.levels([]) == []
+
+
+def test_levels_with_numpy():
+    pytest.importorskip("numpy")
+    curve = LevelCurve(extra_levels=2)
+    assert curve._array is not None
+    levels = curve.levels(list(BOUNDARY_XP))
+    assert levels == [curve.level(xp) for xp in BOUNDARY_XP]
+    assert all(type(level) is int for level in levels)
@@ -0,0 +1,119 @@
+"""ProgressCache: read-through, versions vs. racing loads, TTL; conflict retries"""
+
+import asyncio
+
+import pytest
+
+from progress_cache import ProgressCache, ProgressConflict, retry_on_conflict
+
+
+class Table:
+    """Stand-in user_progress: a dict read by an async loader"""
+
+    def __init__(self):
+        self.rows = {}
+        self.loads = 0
+        self.gate = None
+
+    async def load(self, user_id):
+        self.loads += 1
+        row = dict(self.rows.get(user_id, {"xp": 0}))
+        if self.gate is not None:
+            await self.gate.wait()
+        return row
+
+
+def test_reads_are_cached_and_copied():
+    table = Table()
+    table.rows[1] = {"xp": 10}
+
+    async def scenario():
+        cache = ProgressCache(table.load)
+        first = await cache.get(1)
+        first["xp"] = 99  # callers modify what they read
+        return cache, await cache.get(1)
+
+    cache, second = asyncio.run(scenario())
+    assert second == {"xp": 10}
+    assert table.loads == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_concurrent_misses_share_one_load():
+    table = Table()
+
+    async def scenario():
+        cache = ProgressCache(table.load)
+        return await asyncio.gather(*(cache.get(1) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"xp": 0}] * 5
+    assert table.loads == 1
+
+
+def test_load_started_before_a_put_does_not_replace_it():
+    table = Table()
+
+    async def scenario():
+        cache = ProgressCache(table.load)
+        table.gate = asyncio.Event()
+        slow_read = asyncio.ensure_future(cache.get(1))
+        while not table.loads:
+            await asyncio.sleep(0)
+        table.rows[1] = {"xp": 50}
+        cache.put(1, {"xp": 50})  # write committed after the read saw the old row
+        table.gate.set()
+        await slow_read
+        table.gate = None
+        return await cache.get(1)
+
+    assert asyncio.run(scenario()) == {"xp": 50}
+
+
+def test_put_and_invalidate_change_the_version():
+    async def scenario():
+        cache = ProgressCache(Table().load)
+        await cache.get(1)
+        versions = [cache.version(1)]
+        cache.put(1, {"xp": 5})
+        versions.append(cache.version(1))
+        cache.invalidate(1)
+        versions.append(cache.version(1))
+        return versions
+
+    versions = asyncio.run(scenario())
+    assert versions[0] < versions[1] < versions[2]
+
+
+def test_expired_and_evicted_entries_are_reloaded():
+    table = Table()
+
+    async def scenario():
+        cache = ProgressCache(table.load, max_users=1, ttl=0)
+        await cache.get(1)
+        await cache.get(1)  # ttl 0: expired at once
+        cache.ttl = 60
+        await cache.get(2)  # evicts user 1
+        await cache.get(1)
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert table.loads == 4
+    assert cache.get_stats()["users"] == 1
+
+
+def test_retry_on_conflict_retries_then_gives_up():
+    calls = []
+
+    async def conflicting_twice():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ProgressConflict("row changed")
+        return "written"
+
+    assert asyncio.run(retry_on_conflict(conflicting_twice, attempts=3)) == "written"
+
+    async def always_conflicting():
+        raise ProgressConflict("row changed")
+
+    with pytest.raises(ProgressConflict):
+        asyncio.run(retry_on_conflict(always_conflicting, attempts=2))
@@ -0,0 +1,51 @@
+"""ProgressEventLog: snapshot + tail folding and rebuilding the progress row"""
+
+import asyncio
+import json
+
+import aiosqlite
+
+from progress_cache import ensure_version_column
+from progress_events import (BADGE, INTERVENTION, STREAK_RESET, ProgressEvent, ProgressEventLog,
+                             apply_event, normalize)
+
+
+def event(event_type, day, **fields):
+    return ProgressEvent(event_type, created_at=f"2026-03-{day:02d}T10:00:00", **fields)
+
+
+HISTORY = [event(INTERVENTION, 1, technique="breathing", xp_delta=10),
+           event(INTERVENTION, 2, technique="game", xp_delta=10),
+           event(BADGE, 2, badge_id="first_intervention", xp_delta=25),
+           event(INTERVENTION, 3, technique="breathing", xp_delta=10),
+           event(STREAK_RESET, 5),
+           event(INTERVENTION, 6, technique="breathing", xp_delta=10)]
+
+
+def test_rebuild_folds_the_log_into_the_row(progress_db):
+    async def scenario():
+        log = ProgressEventLog(snapshot_every=2)
+        async with aiosqlite.connect(progress_db) as db:
+            await ProgressEventLog.create_tables(db)
+            await ensure_version_column(db)
+            await db.execute("INSERT INTO user_progress (user_id) VALUES (1)")
+            # The bot appends with the progress row each write produced
+            progress = None
+            for day_event in HISTORY:
+                progress = apply_event(normalize(progress or {}), day_event)
+                await log.append(db, 1, [day_event], progress)
+            await db.execute("UPDATE user_progress SET xp = 0, badges_earned = '[]'")  # damaged row
+            state = await log.rebuild(db, 1)
+            await db.commit()
+            cursor = await db.execute(
+                """SELECT xp, total_interventions, current_streak, longest_streak, badges_earned,
+                   technique_counts FROM user_progress WHERE user_id = 1"""
+            )
+            return state, await cursor.fetchone()
+
+    state, row = asyncio.run(scenario())
+    assert (state["xp"], state["total_interventions"], state["current_streak"], state["longest_streak"]) == \
+        (65, 4, 1, 3)
+    assert row[:4] == (65, 4, 1, 3)
+    assert json.loads(row[4]) == ["first_intervention"]
+    assert json.loads(row[5]) == {"breathing": 3, "game": 1}
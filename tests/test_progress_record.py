@@ -0,0 +1,21 @@
+"""ProgressRecord: blob round trip and clamping"""
+
+from progress_record import U32_MAX, ProgressRecord
+
+PROGRESS = {"xp": 340, "total_interventions": 25, "current_streak": 4, "longest_streak": 9,
+            "last_intervention_date": "2026-03-01", "badges_earned": '["first_intervention", "streak_3"]',
+            "technique_counts": '{"breathing": 20, "custom": 5}'}
+
+
+def test_blob_round_trip():
+    record = ProgressRecord.from_progress(7, PROGRESS)
+    assert ProgressRecord.from_blob(7, record.to_blob()) == record
+    assert record.technique_counts == {"breathing": 20, "custom": 5}
+
+
+def test_out_of_range_counters_are_clamped():
+    record = ProgressRecord(1, xp=-50, total_interventions=U32_MAX + 10)
+    record.add_technique("breathing", -3)
+    restored = ProgressRecord.from_blob(1, record.to_blob())
+    assert (restored.xp, restored.total_interventions) == (0, U32_MAX)
+    assert restored.technique_counts == {}
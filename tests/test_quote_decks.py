@@ -0,0 +1,69 @@
+"""QuoteDecks: no repeats within a pass or across a reshuffle, write-behind and reload"""
+
+import asyncio
+
+import aiosqlite
+
+from quote_decks import DeckState, Permutations, QuoteDecks, permutation
+
+QUOTES = [f"quote {i}" for i in range(7)]
+
+
+def test_permutation_is_a_seeded_shuffle():
+    assert sorted(permutation(42, 10)) == list(range(10))
+    assert permutation(42, 10) == permutation(42, 10)
+
+
+def test_passes_have_no_repeats_within_or_across_a_reshuffle():
+    permutations = Permutations(max_orders=1)  # orders keep being rebuilt from seeds
+    state = permutations.shuffled(len(QUOTES))
+    draws = [permutations.draw(state) for _ in range(len(QUOTES) * 50)]
+    for start in range(0, len(draws), len(QUOTES)):
+        assert sorted(draws[start:start + len(QUOTES)]) == list(range(len(QUOTES)))
+    assert all(previous != current for previous, current in zip(draws, draws[1:]))
+
+
+def test_single_quote_deck():
+    permutations = Permutations()
+    state = DeckState(1, 0, 1)
+    assert [permutations.draw(state) for _ in range(3)] == [0, 0, 0]
+
+
+def test_decks_survive_flush_and_reload(tmp_path):
+    path = str(tmp_path / "decks.db")
+
+    async def scenario():
+        async with aiosqlite.connect(path) as db:
+            await QuoteDecks.create_table(db)
+            await db.commit()
+        decks = QuoteDecks(path, flush_delay=0.01)
+        first = [await decks.draw(1, "morning", QUOTES) for _ in range(3)]
+        other_user = await decks.draw(2, "morning", QUOTES)
+        await asyncio.sleep(0.05)  # written behind
+        assert decks.get_stats()["pending_writes"] == 0
+
+        restarted = QuoteDecks(path, flush_delay=60)
+        rest = [await restarted.draw(1, "morning", QUOTES) for _ in range(len(QUOTES) - 3)]
+        await restarted.stop()
+        return first, rest, other_user
+
+    first, rest, other_user = asyncio.run(scenario())
+    assert sorted(first + rest) == sorted(QUOTES)
+    assert other_user in QUOTES
+
+
+def test_evicted_state_is_served_from_pending_writes(tmp_path):
+    path = str(tmp_path / "decks.db")
+
+    async def scenario():
+        async with aiosqlite.connect(path) as db:
+            await QuoteDecks.create_table(db)
+            await db.commit()
+        decks = QuoteDecks(path, max_cached=1, flush_delay=60)
+        drawn = [await decks.draw(1, "morning", QUOTES) for _ in range(3)]
+        await decks.draw(2, "morning", QUOTES)  # evicts user 1 before any flush
+        drawn += [await decks.draw(1, "morning", QUOTES) for _ in range(len(QUOTES) - 3)]
+        await decks.stop()
+        return drawn
+
+    assert sorted(asyncio.run(scenario())) == sorted(QUOTES)
@@ -0,0 +1,114 @@
+"""ReevaluateJob: chunked corrections, checkpoint/resume, idempotent re-runs"""
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from badge_rules import BadgeEngine, BadgeRule
+from level_curve import level_curve
+from reevaluate_job import ReevaluateJob
+
+RULES = (BadgeRule("first", "First", "", "milestone", "common", "total_interventions", 1, 25),
+         BadgeRule("ten", "Ten", "", "milestone", "common", "total_interventions", 10, 100))
+
+USERS = {1: 0, 2: 3, 3: 12, 4: 40, 5: 10}  # user_id -> total_interventions
+
+
+def fill(path):
+    with sqlite3.connect(path) as db:
+        db.executemany("INSERT INTO user_progress (user_id, xp, total_interventions) VALUES (?, ?, ?)",
+                       [(user_id, total * 10, total) for user_id, total in USERS.items()])
+
+
+def progress(path):
+    with sqlite3.connect(path) as db:
+        rows = db.execute("""SELECT user_id, level, xp, badges_earned, row_version
+                             FROM user_progress ORDER BY user_id""").fetchall()
+    return {row[0]: dict(zip(("level", "xp", "badges_earned", "row_version"), row[1:])) for row in rows}
+
+
+def job(path, **kwargs):
+    return ReevaluateJob(path, engine=BadgeEngine(RULES), chunk_size=2, **kwargs)
+
+
+def expected_xp(total):
+    return total * 10 + (25 if total >= 1 else 0) + (100 if total >= 10 else 0)
+
+
+def test_run_awards_badges_and_keeps_derived_data_in_step(progress_db):
+    fill(progress_db)
+    changed = []
+
+    async def on_changed(user_ids):
+        changed.extend(user_ids)
+
+    stats = asyncio.run(job(progress_db, on_changed=on_changed).run())
+    assert stats["processed"] == stats["total"] == len(USERS)
+    assert changed == [2, 3, 4, 5]
+
+    rows = progress(progress_db)
+    for user_id, total in USERS.items():
+        row = rows[user_id]
+        assert row["xp"] == expected_xp(total)
+        assert row["level"] == level_curve.level(row["xp"])
+        assert row["row_version"] == (1 if user_id in changed else 0)
+    assert json.loads(rows[4]["badges_earned"]) == ["first", "ten"]
+
+    with sqlite3.connect(progress_db) as db:
+        weekly = dict(db.execute("SELECT user_id, xp FROM weekly_xp").fetchall())
+        checkpoints = db.execute("SELECT COUNT(*) FROM job_checkpoints").fetchone()[0]
+    assert weekly == {2: 25, 3: 125, 4: 125, 5: 125}
+    assert checkpoints == 0  # finished runs start over next time
+
+
+def test_second_run_changes_nothing(progress_db):
+    fill(progress_db)
+    asyncio.run(job(progress_db).run())
+    before = progress(progress_db)
+    stats = asyncio.run(job(progress_db).run())
+    assert (stats["changed"], stats["badges_awarded"]) == (0, 0)
+    assert progress(progress_db) == before
+
+
+def test_interrupted_run_resumes_after_the_last_committed_chunk(progress_db):
+    fill(progress_db)
+    interrupted = job(progress_db)
+    process_chunk = interrupted._process_chunk
+
+    async def fail_on_second_chunk(db, rows):
+        if rows[0]["user_id"] > 2:
+            await process_chunk(db, rows)  # written, but never committed
+            raise RuntimeError("killed")
+        return await process_chunk(db, rows)
+
+    interrupted._process_chunk = fail_on_second_chunk
+    with pytest.raises(RuntimeError):
+        asyncio.run(interrupted.run())
+
+    with sqlite3.connect(progress_db) as db:
+        assert db.execute("SELECT last_key, processed FROM job_checkpoints").fetchone() == (2, 2)
+    assert progress(progress_db)[3]["xp"] == USERS[3] * 10  # second chunk rolled back
+
+    resumed = asyncio.run(job(progress_db).run())
+    assert resumed["processed"] == len(USERS)
+    assert resumed["changed"] == 3  # users 3, 4 and 5 only
+    assert {user_id: row["xp"] for user_id, row in progress(progress_db).items()} == \
+        {user_id: expected_xp(total) for user_id, total in USERS.items()}
+    with sqlite3.connect(progress_db) as db:
+        assert db.execute("SELECT COUNT(*) FROM user_badges").fetchone()[0] == 7
+
+
+def test_changed_rewards_are_repriced(progress_db):
+    fill(progress_db)
+    asyncio.run(job(progress_db).run())
+    with sqlite3.connect(progress_db) as db:
+        db.execute("UPDATE user_badges SET xp_awarded = 40 WHERE user_id = 4 AND badge_id = 'ten'")
+
+    stats = asyncio.run(job(progress_db).run())
+    assert stats["xp_repriced"] == 1
+    assert progress(progress_db)[4]["xp"] == expected_xp(40) + 60
+    with sqlite3.connect(progress_db) as db:
+        assert db.execute("SELECT xp_awarded FROM user_badges WHERE user_id = 4 AND badge_id = 'ten'"
+                          ).fetchone() == (100,)
@@ -0,0 +1,110 @@
+"""SingleFlight: coalescing, cancellation isolation, no result caching"""
+
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Backend:
+    """Counts calls; each call blocks until `release` is set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        call = self.calls
+        await self.release.wait()
+        return f"result-{call}"
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        group, backend = SingleFlight("test"), Backend()
+        callers = [asyncio.create_task(group.do("key", backend.fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert group.in_flight == 1
+        backend.release.set()
+        results = await asyncio.gather(*callers)
+        return backend.calls, results, group.in_flight
+
+    calls, results, in_flight = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["result-1"] * 5
+    assert in_flight == 0
+
+
+def test_different_keys_do_not_coalesce():
+    async def scenario():
+        group, backend = SingleFlight("test"), Backend()
+        callers = [asyncio.create_task(group.do(key, backend.fetch)) for key in ("a", "b", "a")]
+        await asyncio.sleep(0)
+        backend.release.set()
+        results = await asyncio.gather(*callers)
+        return backend.calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 2
+    assert results[0] == results[2]
+
+
+def test_results_are_not_cached():
+    async def scenario():
+        group, backend = SingleFlight("test"), Backend()
+        backend.release.set()
+        return await group.do("key", backend.fetch), await group.do("key", backend.fetch)
+
+    assert asyncio.run(scenario()) == ("result-1", "result-2")
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        group, backend = SingleFlight("test"), Backend()
+        first = asyncio.create_task(group.do("key", backend.fetch))
+        second = asyncio.create_task(group.do("key", backend.fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert group.in_flight == 1
+        backend.release.set()
+        return first.cancelled(), await second, backend.calls
+
+    cancelled, result, calls = asyncio.run(scenario())
+    assert cancelled
+    assert result == "result-1"
+    assert calls == 1
+
+
+def test_timed_out_caller_leaves_the_flight_running_for_late_joiners():
+    async def scenario():
+        group, backend = SingleFlight("test"), Backend()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(group.do("key", backend.fetch), timeout=0.01)
+        late = asyncio.create_task(group.do("key", backend.fetch))
+        await asyncio.sleep(0)
+        backend.release.set()
+        return await late, backend.calls
+
+    assert asyncio.run(scenario()) == ("result-1", 1)
+
+
+def test_errors_reach_every_caller_and_clear_the_key():
+    async def scenario():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        callers = [asyncio.create_task(group.do("key", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*callers, return_exceptions=True), group.in_flight
+
+    results, in_flight = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert in_flight == 0
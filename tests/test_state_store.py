@@ -0,0 +1,93 @@
+"""StateStore: memory reads, TTL/size eviction, write-behind to user_states"""
+
+import asyncio
+import sqlite3
+
+from state_store import StateStore
+
+
+def make_db(path):
+    with sqlite3.connect(path) as db:
+        db.execute("""CREATE TABLE user_states (user_id INTEGER PRIMARY KEY, state TEXT, data TEXT,
+                      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+    return str(path)
+
+
+def stored(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT user_id, state FROM user_states ORDER BY user_id").fetchall()
+
+
+def test_get_set_clear_in_memory(tmp_path):
+    store = StateStore(str(tmp_path / "unused.db"), persist=False)
+    assert store.get(1) == (None, None)
+    store.set(1, "awaiting_trigger", "x")
+    assert store.get(1) == ("awaiting_trigger", "x")
+    store.clear(1)
+    assert store.get(1) == (None, None)
+    assert store.size_bytes == 0
+
+
+def test_expired_and_oldest_states_are_dropped(tmp_path):
+    store = StateStore(str(tmp_path / "unused.db"), ttl=0, persist=False)
+    store.set(1, "a")
+    assert store.get(1) == (None, None)
+
+    store = StateStore(str(tmp_path / "unused.db"), max_users=2, persist=False)
+    for user_id in (1, 2, 3):
+        store.set(user_id, "a")
+    assert store.get(1) == (None, None)
+    assert store.get(3) == ("a", "")
+
+
+def test_burst_is_written_in_one_flush(tmp_path):
+    path = make_db(tmp_path / "states.db")
+
+    async def scenario():
+        store = StateStore(path, flush_delay=0.01)
+        store.set(1, "a")
+        store.set(2, "b")
+        store.clear(2)
+        await asyncio.sleep(0.1)
+        return store
+
+    store = asyncio.run(scenario())
+    assert stored(path) == [(1, "a")]
+    assert store.get_stats()["pending_writes"] == 0
+
+
+def test_set_during_flush_gets_persisted(tmp_path):
+    path = make_db(tmp_path / "states.db")
+
+    async def scenario():
+        store = StateStore(path, flush_delay=0.01)
+        flush = store.flush
+
+        async def flush_with_concurrent_set():
+            await flush()
+            if not store.get(2)[0]:
+                store.set(2, "b")  # arrives while the flusher task is still running
+
+        store.flush = flush_with_concurrent_set
+        store.set(1, "a")
+        await asyncio.sleep(0.1)
+        return store
+
+    store = asyncio.run(scenario())
+    assert stored(path) == [(1, "a"), (2, "b")]
+    assert store.get_stats()["pending_writes"] == 0
+
+
+def test_stop_writes_pending_changes_and_load_restores_them(tmp_path):
+    path = make_db(tmp_path / "states.db")
+
+    async def scenario():
+        store = StateStore(path, flush_delay=60)
+        store.set(1, "a", "data")
+        await store.stop()
+        restored = StateStore(path)
+        await restored.load()
+        return restored
+
+    restored = asyncio.run(scenario())
+    assert restored.get(1) == ("a", "data")
@@ -0,0 +1,97 @@
+"""StreakSweep: yesterday cutoff, chunked resets, broken-streak callback"""
+
+import asyncio
+import sqlite3
+from datetime import date
+
+from streak_sweep import BrokenStreak, StreakSweep
+
+TODAY = date(2024, 3, 10)
+
+USERS = {  # user_id -> (current_streak, last_intervention_date)
+    1: (5, "2024-03-10"),   # today
+    2: (3, "2024-03-09"),   # yesterday: still alive
+    3: (7, "2024-03-08"),
+    4: (2, "2024-03-01"),
+    5: (9, "2024-02-20"),
+    6: (1, "2023-12-31"),
+    7: (4, "2024-03-07"),
+    8: (0, "2024-01-01"),   # already reset
+}
+EXPIRED = {3, 4, 5, 6, 7}
+
+
+def fill(path):
+    with sqlite3.connect(path) as db:
+        db.executemany("INSERT INTO user_progress (user_id, current_streak, last_intervention_date) VALUES (?, ?, ?)",
+                       [(user_id, streak, day) for user_id, (streak, day) in USERS.items()])
+
+
+def streaks(path):
+    with sqlite3.connect(path) as db:
+        return dict(db.execute("SELECT user_id, current_streak FROM user_progress"))
+
+
+def test_sweep_resets_only_streaks_older_than_yesterday(progress_db):
+    fill(progress_db)
+    broken = asyncio.run(StreakSweep(progress_db).sweep(today=TODAY))
+
+    assert {streak.user_id for streak in broken} == EXPIRED
+    after = streaks(progress_db)
+    for user_id, (streak, _) in USERS.items():
+        assert after[user_id] == (0 if user_id in EXPIRED else streak)
+
+
+def test_sweep_reports_old_streaks_and_bumps_versions(progress_db):
+    fill(progress_db)
+    broken = asyncio.run(StreakSweep(progress_db).sweep(today=TODAY))
+
+    assert sorted(broken) == sorted(BrokenStreak(user_id, *USERS[user_id]) for user_id in EXPIRED)
+    with sqlite3.connect(progress_db) as db:
+        versions = dict(db.execute("SELECT user_id, row_version FROM user_progress"))
+        resets = [row[0] for row in db.execute(
+            "SELECT user_id FROM progress_events WHERE event_type = 'streak_reset'")]
+    assert {user_id for user_id, version in versions.items() if version} == EXPIRED
+    assert sorted(resets) == sorted(EXPIRED)
+
+
+def test_sweep_works_through_several_chunks(progress_db):
+    fill(progress_db)
+    sweep = StreakSweep(progress_db, chunk_size=2)
+    broken = asyncio.run(sweep.sweep(today=TODAY))
+
+    assert len(broken) == len(EXPIRED)
+    assert sweep.last_run["chunks"] == 3
+    assert sweep.last_run["cutoff"] == "2024-03-09"
+    # Oldest first, chunk after chunk
+    assert [streak.last_intervention_date for streak in broken] == sorted(USERS[u][1] for u in EXPIRED)
+    # Nothing left for a second run
+    assert asyncio.run(sweep.sweep(today=TODAY)) == []
+    assert sweep.last_run["chunks"] == 0
+
+
+def test_on_broken_gets_every_broken_streak_once(progress_db):
+    fill(progress_db)
+    calls = []
+
+    async def on_broken(broken):
+        calls.append(list(broken))
+
+    sweep = StreakSweep(progress_db, chunk_size=2, on_broken=on_broken)
+    asyncio.run(sweep.sweep(today=TODAY))
+    asyncio.run(sweep.sweep(today=TODAY))  # nothing broken: no call
+
+    assert len(calls) == 1
+    assert {streak.user_id for streak in calls[0]} == EXPIRED
+
+
+def test_failing_on_broken_does_not_undo_the_sweep(progress_db):
+    fill(progress_db)
+
+    async def on_broken(broken):
+        raise RuntimeError("reminder queue down")
+
+    broken = asyncio.run(StreakSweep(progress_db, on_broken=on_broken).sweep(today=TODAY))
+
+    assert len(broken) == len(EXPIRED)
+    assert all(streaks(progress_db)[user_id] == 0 for user_id in EXPIRED)
@@ -0,0 +1,106 @@
+"""TimerWheel: firing order and lateness, cancellation, long delays, stop()"""
+
+import asyncio
+import time
+
+from timer_wheel import TimerWheel
+
+TICK = 0.01
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_timers_fire_in_order_and_never_early():
+    async def scenario():
+        wheel = TimerWheel(tick=TICK, slots=16)
+        fired = []
+        started = time.monotonic()
+        for delay in (0.05, 0.01, 0.03):
+            wheel.schedule(delay, lambda delay=delay: fired.append((delay, time.monotonic() - started)))
+        await asyncio.sleep(0.12)
+        await wheel.stop()
+        return fired
+
+    fired = run(scenario)
+    assert [delay for delay, _ in fired] == [0.01, 0.03, 0.05]
+    assert all(elapsed >= delay for delay, elapsed in fired)
+
+
+def test_delays_longer_than_one_revolution():
+    async def scenario():
+        wheel = TimerWheel(tick=TICK, slots=4)  # one revolution is 0.04 s
+        fired = []
+        wheel.schedule(0.09, fired.append, "late")
+        wheel.schedule(0.01, fired.append, "early")
+        await asyncio.sleep(0.05)
+        halfway = list(fired)
+        await asyncio.sleep(0.08)
+        await wheel.stop()
+        return halfway, fired
+
+    halfway, fired = run(scenario)
+    assert halfway == ["early"]
+    assert fired == ["early", "late"]
+
+
+def test_cancel_and_cancel_key():
+    async def scenario():
+        wheel = TimerWheel(tick=TICK, slots=16)
+        fired = []
+        single = wheel.schedule(0.02, fired.append, "single")
+        for step in range(3):
+            wheel.schedule(0.02 + step * TICK, fired.append, f"step{step}", key=("exercise", 1))
+        wheel.schedule(0.02, fired.append, "other", key=("exercise", 2))
+        assert wheel.pending(("exercise", 1)) == 3
+        assert wheel.cancel(single) and not wheel.cancel(single)
+        assert wheel.cancel_key(("exercise", 1)) == 3
+        assert wheel.pending() == 1
+        await asyncio.sleep(0.08)
+        await wheel.stop()
+        return fired
+
+    assert run(scenario) == ["other"]
+
+
+def test_coroutine_callbacks_and_failures_do_not_stop_the_wheel():
+    async def scenario():
+        wheel = TimerWheel(tick=TICK, slots=16)
+        fired = []
+
+        async def send(text):
+            await asyncio.sleep(0.02)
+            fired.append(text)
+
+        def broken():
+            raise RuntimeError("boom")
+
+        wheel.schedule(0.01, broken)
+        wheel.schedule(0.01, send, "slow")
+        wheel.schedule(0.02, fired.append, "next")
+        await asyncio.sleep(0.06)
+        await wheel.stop()
+        return fired
+
+    assert run(scenario) == ["next", "slow"]
+
+
+def test_stop_drops_pending_timers_and_waits_for_running_callbacks():
+    async def scenario():
+        wheel = TimerWheel(tick=TICK, slots=16)
+        fired = []
+
+        async def send():
+            await asyncio.sleep(0.03)
+            fired.append("sent")
+
+        wheel.schedule(0.01, send)
+        wheel.schedule(5, fired.append, "never")
+        await asyncio.sleep(0.02)
+        await wheel.stop()
+        return wheel, fired
+
+    wheel, fired = run(scenario)
+    assert fired == ["sent"]
+    assert wheel.get_stats()["pending"] == 0
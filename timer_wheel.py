@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hashed timer wheel for CraveBreaker
+Delayed callbacks (exercise steps, reminders) for any number of users driven
+by one sleeping task; timers can be cancelled one by one or by key
+"""
+
+import asyncio
+import inspect
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Timer resolution: a timer fires up to one tick late, never early
+TIMER_WHEEL_TICK = float(os.getenv("TIMER_WHEEL_TICK", "0.25"))
+TIMER_WHEEL_SLOTS = int(os.getenv("TIMER_WHEEL_SLOTS", "512"))
+
+timers_fired = registry.counter("timer_wheel_fired_total", "Timers that ran their callback")
+timers_cancelled = registry.counter("timer_wheel_cancelled_total", "Timers cancelled before firing")
+callback_errors = registry.counter("timer_wheel_callback_errors_total", "Timer callbacks that raised")
+
+
+class Timer:
+    __slots__ = ("deadline", "slot", "callback", "args", "key", "cancelled")
+
+    def __init__(self, deadline: int, slot: int, callback: Callable, args: tuple, key: Optional[Hashable]):
+        self.deadline = deadline  # tick number
+        self.slot = slot
+        self.callback = callback
+        self.args = args
+        self.key = key
+        self.cancelled = False
+
+
+class TimerWheel:
+    """`slots` buckets of timers, one bucket per tick, wrapping around
+
+    A timer due at tick t sits in bucket t % slots; each tick the runner
+    looks at one bucket and fires the timers in it whose tick has come,
+    so scheduling, cancelling and firing are O(1) no matter how many
+    timers are pending. Timers further out than one revolution stay in
+    their bucket and are skipped until their round comes. The runner
+    sleeps until the next tick only while timers are pending and waits on
+    an event otherwise. Coroutine callbacks run as their own tasks, so a
+    slow send never delays other timers.
+    """
+
+    def __init__(self, tick: float = TIMER_WHEEL_TICK, slots: int = TIMER_WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = slots
+        self._buckets: List[Set[Timer]] = [set() for _ in range(slots)]
+        self._keys: Dict[Hashable, Set[Timer]] = {}
+        self._pending = 0
+        self._origin = time.monotonic()
+        self._current = 0  # last tick processed
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        registry.gauge("timer_wheel_pending", "Timers waiting to fire", callback=lambda: self._pending)
+
+    def _now_tick(self) -> int:
+        return int((time.monotonic() - self._origin) / self.tick)
+
+    def schedule(self, delay: float, callback: Callable, *args, key: Optional[Hashable] = None) -> Timer:
+        """Run callback(*args) after `delay` seconds; `key` groups timers for cancel_key()"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()  # bound to the running loop
+            self._current = max(self._current, self._now_tick())
+            self._task = asyncio.create_task(self._run(), name="timer-wheel")
+        # First tick boundary at or after the due time, and never one already processed
+        due = time.monotonic() - self._origin + delay
+        deadline = max(math.ceil(due / self.tick), self._current + 1)
+        timer = Timer(deadline, deadline % self.slots, callback, args, key)
+        self._buckets[timer.slot].add(timer)
+        if key is not None:
+            self._keys.setdefault(key, set()).add(timer)
+        self._pending += 1
+        self._wakeup.set()
+        return timer
+
+    def _remove(self, timer: Timer):
+        self._buckets[timer.slot].discard(timer)
+        if timer.key is not None:
+            timers = self._keys.get(timer.key)
+            if timers is not None:
+                timers.discard(timer)
+                if not timers:
+                    del self._keys[timer.key]
+        self._pending -= 1
+
+    def cancel(self, timer: Timer) -> bool:
+        if timer.cancelled or timer not in self._buckets[timer.slot]:
+            return False
+        timer.cancelled = True
+        self._remove(timer)
+        timers_cancelled.inc()
+        return True
+
+    def cancel_key(self, key: Hashable) -> int:
+        """Cancel every pending timer scheduled with `key`"""
+        timers = list(self._keys.get(key, ()))
+        for timer in timers:
+            self.cancel(timer)
+        return len(timers)
+
+    def pending(self, key: Optional[Hashable] = None) -> int:
+        return self._pending if key is None else len(self._keys.get(key, ()))
+
+    def _fire(self, timer: Timer):
+        timers_fired.inc()
+        try:
+            result = timer.callback(*timer.args)
+        except Exception as e:
+            callback_errors.inc()
+            logger.error(f"Timer callback {timer.callback!r} failed: {e}")
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._running.add(task)
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            callback_errors.inc()
+            logger.error(f"Timer callback failed: {task.exception()}")
+
+    def _advance(self):
+        """Process every tick up to now (more than one if the loop lagged)"""
+        now = self._now_tick()
+        # After a long stall every bucket is visited once, not once per missed tick
+        first = max(self._current + 1, now - self.slots + 1)
+        for tick in range(first, now + 1):
+            bucket = self._buckets[tick % self.slots]
+            due = [timer for timer in bucket if timer.deadline <= now]
+            for timer in due:
+                self._remove(timer)
+                self._fire(timer)
+        self._current = max(self._current, now)
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                # Idle time is skipped: nothing was scheduled in it
+                self._current = max(self._current, self._now_tick() - 1)
+                continue
+            next_tick = self._origin + (self._current + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            self._advance()
+
+    async def stop(self):
+        """Stop the runner, drop pending timers and wait for running callbacks"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        dropped = self._pending
+        for bucket in self._buckets:
+            bucket.clear()
+        self._keys.clear()
+        self._pending = 0
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if dropped:
+            logger.info(f"Timer wheel stopped with {dropped} pending timers dropped")
+
+    def get_stats(self) -> Dict:
+        return {"pending": self._pending, "running_callbacks": len(self._running),
+                "tick": self.tick, "slots": self.slots}
+
+
+# Global instance
+timer_wheel = TimerWheel()
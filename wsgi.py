@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """
-WSGI entry point for production deployment
-Compatible with Gunicorn and other WSGI servers
+WSGI entry point kept for platforms configured with `wsgi:application`
+
+The bot is not started here. It needs the asyncio server in main.py (one
+loop for the bot, the webhook, /metrics, /diagnostics and /restart, and
+the shutdown phases on SIGTERM), which a synchronous WSGI worker cannot
+host. Served by Gunicorn or any other WSGI server, this module only
+answers health checks; deployments start the bot with `python main.py`.
 """
 
 import os
@@ -10,13 +15,35 @@ import sys
 # Add current directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from main import app, start_bot_in_thread
+from flask import Flask, jsonify
+
+import main
+
+app = Flask(__name__)
+
+main.logger.warning("wsgi:application serves health checks only; run `python main.py` to start the bot")
+
+
+@app.route('/')
+def health_check():
+    """Health check endpoint"""
+    return jsonify(main.health_payload()), 200
+
+
+@app.route('/health')
+def health():
+    """Alternative health check endpoint"""
+    return jsonify({'status': 'ok', 'bot_running': main.bot_is_running()}), 200
+
+
+@app.route('/status')
+def status():
+    """Detailed bot status endpoint"""
+    return jsonify(main.status_payload()), 200
 
-# Start the Telegram bot when the WSGI application loads
-start_bot_in_thread()
 
 # WSGI callable
 application = app
 
 if __name__ == "__main__":
-    application.run()
\ No newline at end of file
+    application.run()